@@ -1,17 +1,27 @@
+import contextvars
+import time
 from abc import ABC, abstractmethod
 from concurrent.futures import Future
-from typing import Any, Iterator, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import py_trees
 
-from behavioral.conversation import ConversationBehaviourTree
+from behavioral.blackboard import BlackBoard, BlackBoardSnapshot
+from behavioral.blackboard.blackboard import (SEPARATOR,
+                                              ensure_namespace_separator)
+from behavioral.conversation import ChatMessage, ConversationBehaviourTree
 from behavioral.guards import BehaviorGuard
-from behavioral.utils import PartialPromptParams
+from behavioral.utils import PartialPromptParams, compile_prompt
+from behavioral.utils.rate_limiter import queue_wait_observer
 
 
 class Behavior(py_trees.behaviour.Behaviour, ABC):
     """A base class for all behaviors."""
 
+    # Pure behaviors only compute their status from the tree inputs and have no
+    # side effects, allowing incremental ticks to reuse their settled status.
+    pure = False
+
     def __init__(
         self,
         name: str,
@@ -21,6 +31,8 @@ class Behavior(py_trees.behaviour.Behaviour, ABC):
         super().__init__(name)
         self.guard = guard
         self.prompt_params = prompt_params
+        # The last output of every prompt template rendered by the behavior.
+        self._prompt_memo: Dict[Any, tuple] = {}
 
     def setup(
         self,
@@ -34,6 +46,15 @@ class Behavior(py_trees.behaviour.Behaviour, ABC):
 
     def tick(self) -> Iterator[py_trees.behaviour.Behaviour]:
         self.logger.debug("Behavior.tick()")
+        conversation_tree = getattr(self, "conversation_tree", None)
+        if conversation_tree is None or not (
+            conversation_tree.incremental_tick or conversation_tree.profiler
+        ):
+            yield from self.guarded_tick()
+            return
+        yield from conversation_tree.tick_node(self)
+
+    def guarded_tick(self) -> Iterator[py_trees.behaviour.Behaviour]:
         if self.guard is not None:
             guard_enter_status = self.guard.check_enter(self)
             if guard_enter_status is not None:
@@ -43,9 +64,15 @@ class Behavior(py_trees.behaviour.Behaviour, ABC):
                 yield self
                 return
 
+        conversation_tree = getattr(self, "conversation_tree", None)
+        profiler = conversation_tree.profiler if conversation_tree else None
+        if profiler is not None:
+            update_start = time.perf_counter()
         for node in super().tick():
             if node is not self:
                 yield node
+        if profiler is not None:
+            profiler.record(self, "update", time.perf_counter() - update_start)
 
         if self.status == py_trees.common.Status.RUNNING:
             yield self
@@ -62,20 +89,57 @@ class Behavior(py_trees.behaviour.Behaviour, ABC):
         self.feedback_message = f"guard exit status: {guard_exit_status}"
         # Restart if exit guard is running
         if guard_exit_status == py_trees.common.Status.RUNNING:
-            for node in self.tick():
+            for node in self.guarded_tick():
                 yield node
             return
         self.status = guard_exit_status
         yield self
 
+    def resumable(self) -> bool:
+        """True if ticking the behavior again would only return its status.
+
+        Incremental ticks skip the traversal while the inputs are unchanged
+        and every behavior ticked last is resumable, see
+        `ConversationBehaviourTree`.
+        """
+        return self.pure
+
+    @property
+    def blackboard(self) -> Union[BlackBoard, BlackBoardSnapshot]:
+        """The blackboard of the tree as seen by this behavior."""
+        return self.conversation_tree.bb
+
     def format_prompt(self, prompt: str) -> str:
-        # Add global bb
-        bb_params = PartialPromptParams(self.conversation_tree.bb.to_dict())
-        # Add local bb
-        bb_params.update(self.conversation_tree.bb.to_dict(self.namespace))
-        # Add Behavior params
-        bb_params.update(self.prompt_params)
-        return bb_params.format_with_eval(prompt)
+        return compile_prompt(prompt).render(_PromptParams(self), self._prompt_memo)
+
+
+class _PromptParams:
+    """The prompt parameters of a behavior, looked up by `PromptTemplate`.
+
+    The parameters of the behavior come first, then the keys of its namespace
+    and then the keys of the global namespace, relative to the namespaces.
+    """
+
+    def __init__(self, behavior: Behavior):
+        self.blackboard = behavior.blackboard
+        self.namespace, _ = ensure_namespace_separator(namespace=behavior.namespace)
+        self.prompt_params = behavior.prompt_params
+
+    def __getitem__(self, key: str):
+        if key in self.prompt_params:
+            return self.prompt_params[key]
+        if not key.startswith(SEPARATOR):
+            value = self.blackboard.get_value(self.namespace + key)
+            if value is None and self.namespace != SEPARATOR:
+                value = self.blackboard.get_value(SEPARATOR + key)
+            if value is not None:
+                return value
+        raise KeyError(key)
+
+
+# The behavior, blackboard snapshot and chat history length pinned by the
+# running async task, see `AsyncBehavior`.
+_pinned: contextvars.ContextVar = contextvars.ContextVar("pinned", default=None)
 
 
 class AsyncBehavior(Behavior, ABC):
@@ -84,6 +148,10 @@ class AsyncBehavior(Behavior, ABC):
     This behavior starts an async function in the background and returns RUNNING
     until the function completes. Once completed, it returns SUCCESS or FAILURE
     based on the result of the async function.
+
+    The blackboard and the chat history are pinned when the function starts:
+    within it, `blackboard` is a snapshot that only reflects the writes of the
+    function itself and `active_chat_history()` ignores newer messages.
     """
 
     def __init__(
@@ -108,6 +176,64 @@ class AsyncBehavior(Behavior, ABC):
         self.num_errors = 0
         self.task: Optional[Future] = None
 
+    @property
+    def blackboard(self) -> Union[BlackBoard, BlackBoardSnapshot]:
+        pinned = _pinned.get()
+        if pinned is not None and pinned[0] is self:
+            return pinned[1]
+        return self.conversation_tree.bb
+
+    def pinned_messages(self) -> int:
+        """The number of chat messages when the task started."""
+        pinned = _pinned.get()
+        if pinned is not None and pinned[0] is self:
+            return pinned[2]
+        return len(self.conversation_tree.chat_history)
+
+    def active_chat_history(
+        self, token_budget: Optional[int] = None
+    ) -> List[ChatMessage]:
+        """The active chat history when the task started.
+
+        Args:
+            token_budget: The maximum tokens of the history, see
+                `ConversationBehaviourTree.history_window()`.
+        """
+        tree = self.conversation_tree
+        return tree.history_window(
+            tree.chat_history[: self.pinned_messages()], token_budget
+        )
+
+    async def summarized_chat_history(
+        self, token_budget: Optional[int] = None
+    ) -> Tuple[Optional[str], List[ChatMessage]]:
+        """The summary and active chat history when the task started.
+
+        See `ConversationBehaviourTree.summarized_history()`.
+        """
+        tree = self.conversation_tree
+        return await tree.summarized_history(
+            tree.chat_history[: self.pinned_messages()], token_budget
+        )
+
+    def create_task(self) -> Future:
+        """Start `async_update()` with a pinned blackboard and chat history."""
+        tree = self.conversation_tree
+        snapshot = tree.bb.snapshot()
+        context = contextvars.copy_context()
+        context.run(_pinned.set, (self, snapshot, len(tree.chat_history)))
+        context.run(queue_wait_observer.set, self._record_queue_wait)
+        # Tasks run in a copy of the context they are created in.
+        task = context.run(tree.loop.create_task, self.async_update())
+        task.add_done_callback(lambda _: snapshot.release())
+        return task
+
+    def _record_queue_wait(self, seconds: float):
+        """Profile the time the model calls of the task waited for a slot."""
+        profiler = self.conversation_tree.profiler
+        if profiler is not None:
+            profiler.record(self, "queue_wait", seconds)
+
     def initialise(self) -> None:
         self.feedback_message = ""
         self.num_errors = 0
@@ -117,7 +243,7 @@ class AsyncBehavior(Behavior, ABC):
         """Update the behavior status based on the async task state."""
         if self.task is None:
             try:
-                self.task = self.conversation_tree.loop.create_task(self.async_update())
+                self.task = self.create_task()
                 self.task.add_done_callback(self.callback)
                 return py_trees.common.Status.RUNNING
             except Exception as e:
@@ -139,6 +265,14 @@ class AsyncBehavior(Behavior, ABC):
                 return py_trees.common.Status.FAILURE
         return py_trees.common.Status.RUNNING
 
+    def resumable(self) -> bool:
+        # Until the task is done, ticking again only returns RUNNING.
+        return (
+            self.status == py_trees.common.Status.RUNNING
+            and self.task is not None
+            and not self.task.done()
+        )
+
     def callback(self, fut):
         self.logger.debug(f"Async Callback for behavior: {self.name}")
         self.conversation_tree.wakeup()
@@ -7,7 +7,8 @@ from pydantic import BaseModel
 
 from behavioral.base import AsyncBehavior
 from behavioral.guards import BehaviorGuard
-from behavioral.utils import PartialPromptParams, ainvoke
+from behavioral.utils import (PartialPromptParams, ResponseCache, SingleFlight,
+                              ainvoke)
 
 
 class AIToBlackboard(AsyncBehavior):
@@ -23,6 +24,9 @@ class AIToBlackboard(AsyncBehavior):
         guard: Optional[BehaviorGuard] = None,
         prompt_params: PartialPromptParams = PartialPromptParams(),
         retry_errors: int = 3,
+        history_token_budget: Optional[int] = None,
+        response_cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
     ):
         super().__init__(
             name=name,
@@ -41,6 +45,9 @@ class AIToBlackboard(AsyncBehavior):
         self.formatted_prompt = None
         self.captured_state = None
         self.last_captured_message = 0
+        self.history_token_budget = history_token_budget
+        self.response_cache = response_cache
+        self.single_flight = single_flight
 
     def initialise(self):
         super().initialise()
@@ -64,19 +71,25 @@ class AIToBlackboard(AsyncBehavior):
         return py_trees.common.Status.SUCCESS
 
     async def _capture_state(self):
+        summary, chat_history = await self.summarized_chat_history(
+            self.history_token_budget
+        )
         self.captured_state = await ainvoke(
             chat_model=self.conversation_tree.chat_model,
             tools=self.tools,
             extra_chain_runnables=self.extra_chain_runnables,
             conversation_goal_prompt=self.conversation_tree.conversation_goal_prompt,
             prompt=self.format_prompt(prompt=self.prompt),
-            chat_history=self.conversation_tree.get_active_chat_history(),
+            chat_history=chat_history,
             structured_output=self.capture_state_type,
+            summary=summary,
+            response_cache=self.response_cache,
+            single_flight=self.single_flight,
         )
         print(f"State:{self.name} -> {self.captured_state}")
-        self.conversation_tree.bb.set_value(
+        self.blackboard.set_value(
             key=self.state_key,
             value=self.captured_state,
             namespace=self.namespace,
         )
-        self.last_captured_message = len(self.conversation_tree.chat_history)
+        self.last_captured_message = self.pinned_messages()
@@ -3,6 +3,7 @@ import operator
 import py_trees
 
 from behavioral.base import Behavior
+from behavioral.blackboard import BlackBoardPath
 
 
 class CheckBlackboardVariableValue(Behavior):
@@ -27,14 +28,14 @@ class CheckBlackboardVariableValue(Behavior):
         The python `operator module`_ includes many useful comparison operations.
     """
 
+    pure = True
+
     def __init__(self, name: str, check: py_trees.common.ComparisonExpression):
         super().__init__(name=name)
         self.check = check
-        name_components = self.check.variable.split(".")
-        self.key = name_components[0]
-        self.key_attributes = ".".join(
-            name_components[1:]
-        )  # empty string if no other parts
+        self.path = BlackBoardPath(self.check.variable)
+        self.key = self.path.key
+        self.key_attributes = ".".join(self.path.attributes)
 
     def update(self) -> py_trees.common.Status:
         """
@@ -46,18 +47,14 @@ class CheckBlackboardVariableValue(Behavior):
         """
         self.logger.debug("%s.update()" % self.__class__.__name__)
         try:
-            value = self.conversation_tree.bb.get_value(
-                key=self.key, namespace=self.namespace
-            )
-            if self.key_attributes:
-                try:
-                    value = operator.attrgetter(self.key_attributes)(value)
-                except AttributeError:
-                    self.feedback_message = (
-                        "blackboard key-value pair exists, but the value does not "
-                        f"have the requested nested attributes [{self.key}]"
-                    )
-                    return py_trees.common.Status.FAILURE
+            try:
+                value = self.path.resolve(self.blackboard, self.namespace)
+            except AttributeError:
+                self.feedback_message = (
+                    "blackboard key-value pair exists, but the value does not "
+                    f"have the requested nested attributes [{self.key}]"
+                )
+                return py_trees.common.Status.FAILURE
         except KeyError:
             self.feedback_message = (
                 "key '{}' does not yet exist on the blackboard".format(
@@ -88,11 +85,9 @@ class RespondToUserFromBlackboard(Behavior):
     def __init__(self, name: str, bb_variable: str):
         super().__init__(name=name)
         self.bb_variable = bb_variable
-        name_components = self.bb_variable.split(".")
-        self.key = name_components[0]
-        self.key_attributes = ".".join(
-            name_components[1:]
-        )  # empty string if no other parts
+        self.path = BlackBoardPath(self.bb_variable)
+        self.key = self.path.key
+        self.key_attributes = ".".join(self.path.attributes)
 
     def update(self) -> py_trees.common.Status:
         self.logger.debug("%s.update()" % self.__class__.__name__)
@@ -101,18 +96,14 @@ class RespondToUserFromBlackboard(Behavior):
             self.logger.debug("Not sending message during state capture.")
             return py_trees.common.Status.RUNNING
         try:
-            value = self.conversation_tree.bb.get_value(
-                key=self.key, namespace=self.namespace
-            )
-            if self.key_attributes:
-                try:
-                    value = operator.attrgetter(self.key_attributes)(value)
-                except AttributeError:
-                    self.feedback_message = (
-                        "blackboard key-value pair exists, but the value does not "
-                        f"have the requested nested attributes [{self.key}]"
-                    )
-                    return py_trees.common.Status.FAILURE
+            try:
+                value = self.path.resolve(self.blackboard, self.namespace)
+            except AttributeError:
+                self.feedback_message = (
+                    "blackboard key-value pair exists, but the value does not "
+                    f"have the requested nested attributes [{self.key}]"
+                )
+                return py_trees.common.Status.FAILURE
         except KeyError:
             self.feedback_message = (
                 "key '{}' does not yet exist on the blackboard".format(
@@ -146,14 +137,29 @@ class RemoveBlackboardVariable(Behavior):
 
 
 class IncrementBlackboardVariable(Behavior):
+    """
+    Increment a blackboard variable by one.
+
+    A missing key is initialised to 1. With nested attributes, e.g.
+    "state.count", the key must exist and the incremented attribute is
+    written back on copies of the objects along the attribute chain, so the
+    value stored under the key is replaced rather than mutated in place.
+
+    Args:
+        name: name of the behaviour
+        bb_variable: the key, optionally followed by dot separated attributes
+
+    .. note::
+        Before attributes were written back, incrementing an immutable
+        attribute such as an int left the blackboard unchanged.
+    """
+
     def __init__(self, name: str, bb_variable: str):
         super().__init__(name=name)
         self.bb_variable = bb_variable
-        name_components = self.bb_variable.split(".")
-        self.key = name_components[0]
-        self.key_attributes = ".".join(
-            name_components[1:]
-        )  # empty string if no other parts
+        self.path = BlackBoardPath(self.bb_variable)
+        self.key = self.path.key
+        self.key_attributes = ".".join(self.path.attributes)
 
     def update(self) -> py_trees.common.Status:
         """
@@ -162,25 +168,26 @@ class IncrementBlackboardVariable(Behavior):
         Returns:
              :data:`~py_trees.common.Status.SUCCESS`
         """
-        value = self.conversation_tree.bb.get_value(self.key, self.namespace)
+        bb = self.blackboard
         if self.key_attributes == "":
+            value = self.path.get(bb, self.namespace)
             if value is None:
                 value = 0
             value += 1
         else:
-            if value is None:
+            if bb.get_value(self.key, self.namespace) is None:
                 self.feedback_message = (
                     "key '{}' does not yet exist on the blackboard".format(self.key)
                 )
                 return py_trees.common.Status.FAILURE
             try:
-                operator.iadd(operator.attrgetter(self.key_attributes)(value), 1)
+                value = operator.iadd(self.path.resolve(bb, self.namespace), 1)
             except AttributeError:
                 self.feedback_message = (
                     "blackboard key-value pair exists, but the value does not "
                     f"have the requested nested attributes [{self.key}]"
                 )
                 return py_trees.common.Status.FAILURE
-        self.conversation_tree.bb.set_value(self.key, value, self.namespace)
+        self.path.set(bb, value, self.namespace)
         self.feedback_message = f"[{value}]"
         return py_trees.common.Status.SUCCESS
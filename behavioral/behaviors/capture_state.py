@@ -7,7 +7,8 @@ from pydantic import BaseModel
 
 from behavioral.base import AsyncBehavior
 from behavioral.guards import BehaviorGuard
-from behavioral.utils import PartialPromptParams, capture_conversation_state
+from behavioral.utils import (PartialPromptParams, ResponseCache, SingleFlight,
+                              capture_conversation_state)
 
 
 class CaptureConversationState(AsyncBehavior):
@@ -22,6 +23,9 @@ class CaptureConversationState(AsyncBehavior):
         guard: Optional[BehaviorGuard] = None,
         prompt_params: PartialPromptParams = PartialPromptParams(),
         retry_errors: int = 3,
+        history_token_budget: Optional[int] = None,
+        response_cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
     ):
         super().__init__(
             name=name,
@@ -36,66 +40,88 @@ class CaptureConversationState(AsyncBehavior):
         self.state_key = state_key
         self.last_captured_message = 0
         self.captured_state = None
+        self.history_token_budget = history_token_budget
+        self.response_cache = response_cache
+        self.single_flight = single_flight
+        # Kept apart from `task`, which is cancelled once the behavior stops.
+        self.capture_task = None
 
     def update(self) -> py_trees.common.Status:
         self.feedback_message = ""
-        if self.task is not None:
-            self.logger.debug("Already Capturing state")
-            status = super().update()
-            if status == py_trees.common.Status.RUNNING:
-                self.logger.debug("State cpture not finished yet.")
+        if self.capture_task is not None:
+            if not self.capture_task.done():
+                self.logger.debug("State capture not finished yet.")
+                # The pinned snapshot keeps the reads of the capture consistent,
+                # replies still wait for the state of the new messages.
                 self.conversation_tree.capture_state_running = True
-            super().initialise()
+                return py_trees.common.Status.SUCCESS
+            self.capture_task = None
+
+        if not self._has_uncaptured_messages():
             return py_trees.common.Status.SUCCESS
+        self.logger.debug("Capturing state")
+        self.conversation_tree.capture_state_running = True
+        status = super().update()
+        # A single capture runs until it is done, later messages are captured
+        # by the next one.
+        self.capture_task, self.task = self.task, None
+        return status
 
+    def _has_uncaptured_messages(self) -> bool:
+        chat_history = self.conversation_tree.chat_history
+        if len(chat_history) == 0:
+            return True
         # Already captured all messages
-        if (
-            len(self.conversation_tree.chat_history) <= self.last_captured_message
-            and len(self.conversation_tree.chat_history) > 0
-        ):
-            self.logger.debug(
-                f"Already captured all messages {len(self.conversation_tree.chat_history)} <= {self.last_captured_message}"
+        if len(chat_history) <= self.last_captured_message:
+            return False
+        uncaptured = chat_history[self.last_captured_message :]
+        return any(m.role == "user" for m in uncaptured) or (
+            self.capture_assistant_message
+            and any(
+                m.role == "assistant" and m.metadata["completed"] for m in uncaptured
             )
-            return py_trees.common.Status.SUCCESS
-        has_not_captured_user_message = any(
-            m.role == "user"
-            for m in self.conversation_tree.chat_history[self.last_captured_message :]
-        )
-        has_not_captured_assistant_message = any(
-            m.role == "assistant" and m.metadata["completed"]
-            for m in self.conversation_tree.chat_history[self.last_captured_message :]
-        )
-        self.logger.debug(
-            f"has_not_captured_user_message: {has_not_captured_user_message}, has_not_captured_assistant_message: {has_not_captured_assistant_message}, capture_assistant_message: {self.capture_assistant_message}"
         )
-        if (
-            len(self.conversation_tree.chat_history) == 0
-            or has_not_captured_user_message
-            or (has_not_captured_assistant_message and self.capture_assistant_message)
-        ):
-            self.logger.debug("Capturing state")
-            self.conversation_tree.capture_state_running = True
-            return super().update()
-        return py_trees.common.Status.SUCCESS
+
+    def resumable(self) -> bool:
+        # While capturing or with nothing to capture, ticking again only
+        # returns SUCCESS.
+        if self.status != py_trees.common.Status.SUCCESS:
+            return False
+        if self.capture_task is not None:
+            return not self.capture_task.done()
+        return not self._has_uncaptured_messages()
 
     async def capture_state(self) -> py_trees.common.Status:
         try:
-            self.captured_state = await capture_conversation_state(
+            summary, chat_history = await self.summarized_chat_history(
+                self.history_token_budget
+            )
+            extractor = self.conversation_tree.state_extractor
+            capture = (
+                capture_conversation_state
+                if extractor is None
+                else extractor.capture_conversation_state
+            )
+            self.captured_state = await capture(
                 chat_model=self.conversation_tree.chat_model,
                 extra_chain_runnables=self.extra_chain_runnables,
                 tools=self.tools,
-                chat_history=self.conversation_tree.get_active_chat_history(),
-                non_captured_messages=len(self.conversation_tree.chat_history)
+                chat_history=chat_history,
+                summary=summary,
+                response_cache=self.response_cache,
+                single_flight=self.single_flight,
+                non_captured_messages=self.pinned_messages()
                 - self.last_captured_message,
                 previous_state=self.captured_state,
                 state_type=self.capture_state_type,
             )
-            self.conversation_tree.bb.set_value(
+            self.blackboard.set_value(
                 key=self.state_key,
                 value=self.captured_state,
                 namespace=self.namespace,
             )
-            self.last_captured_message = len(self.conversation_tree.chat_history)
+            # Messages received while capturing are captured next time.
+            self.last_captured_message = self.pinned_messages()
         except Exception as e:
             self.feedback_message = f"Error: {e}"
             self.logger.error(f"Error while capturing state: {e}")
@@ -1,4 +1,4 @@
-import time
+import math
 
 import py_trees
 
@@ -6,6 +6,8 @@ from behavioral.base import Behavior
 
 
 class CheckUserIsActive(Behavior):
+    pure = True
+
     def __init__(self, time_since_last_message: float):
         super().__init__(name="IsUserActive")
         self.time_since_last_message = time_since_last_message
@@ -14,12 +16,12 @@ class CheckUserIsActive(Behavior):
         self.feedback_message = ""
         if len(self.conversation_tree.chat_history) == 0:
             return py_trees.common.Status.SUCCESS
-        current_time = time.time()
+        current_time = self.conversation_tree.clock.time()
         self.feedback_message = "Time since last user message: {current_time - self.conversation_tree.last_message_time}s"
-        if (
-            current_time - self.conversation_tree.last_message_time
-            > self.time_since_last_message
-        ):
+        deadline = (
+            self.conversation_tree.last_message_time + self.time_since_last_message
+        )
+        if current_time > deadline:
             self.logger.debug(
                 f"User is inactive. Time since last message: {current_time - self.conversation_tree.last_message_time}s"
             )
@@ -27,10 +29,14 @@ class CheckUserIsActive(Behavior):
         self.logger.debug(
             f"User is active. Time since last message: {current_time - self.conversation_tree.last_message_time}s"
         )
+        # Just after the deadline, when the user counts as inactive.
+        self.conversation_tree.wakeup_at(math.nextafter(deadline, math.inf))
         return py_trees.common.Status.SUCCESS
 
 
 class CheckNoPendingUserMessage(Behavior):
+    pure = True
+
     def __init__(self):
         super().__init__(name="HasPendingUserMessage")
 
@@ -41,6 +47,8 @@ class CheckNoPendingUserMessage(Behavior):
 
 
 class CheckHasPendingUserMessage(Behavior):
+    pure = True
+
     def __init__(self):
         super().__init__(name="HasPendingUserMessage")
 
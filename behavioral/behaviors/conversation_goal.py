@@ -1,4 +1,3 @@
-import time
 from typing import List, Optional
 
 import py_trees
@@ -8,8 +7,8 @@ from pydantic import BaseModel, Field
 
 from behavioral.base import AsyncBehavior
 from behavioral.guards import BehaviorGuard
-from behavioral.utils import (PartialPromptParams, capture_goal_state,
-                              respond_to_user)
+from behavioral.utils import (PartialPromptParams, ResponseCache, SingleFlight,
+                              capture_goal_state, respond_to_user)
 
 
 class ConversationGoalState(BaseModel):
@@ -54,6 +53,9 @@ class ConversationGoal(AsyncBehavior):
         seconds_since_last_message: float = 60,
         memory: bool = True,
         initialize_after_user_messages: int = 2,
+        history_token_budget: Optional[int] = None,
+        response_cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
     ):
         super().__init__(
             name=name,
@@ -74,6 +76,9 @@ class ConversationGoal(AsyncBehavior):
         self.memory = memory
         self.initialize_after_user_messages = initialize_after_user_messages
         self.last_captured_message = 0
+        self.history_token_budget = history_token_budget
+        self.response_cache = response_cache
+        self.single_flight = single_flight
 
     def goal_achieved(self) -> bool:
         if self.captured_state is None:
@@ -127,7 +132,7 @@ class ConversationGoal(AsyncBehavior):
             return py_trees.common.Status.SUCCESS
         if self.goal_failed():
             return py_trees.common.Status.FAILURE
-        current_time = time.time()
+        current_time = self.conversation_tree.clock.time()
         if (
             not self.conversation_tree.has_pending_user_message()
             and not self.respond_without_user_message
@@ -138,6 +143,7 @@ class ConversationGoal(AsyncBehavior):
             and current_time < self.next_message_time
             and not self.conversation_tree.has_pending_user_message()
         ):
+            self.conversation_tree.wakeup_at(self.next_message_time)
             return py_trees.common.Status.RUNNING
 
         return super().update()
@@ -156,36 +162,57 @@ class ConversationGoal(AsyncBehavior):
 
     async def _respond_to_user(self):
         try:
+            # The window is taken without the placeholder of the response.
+            messages = list(self.conversation_tree.chat_history)
+            response_message = self.conversation_tree.add_assistant_message()
+            summary, chat_history = await self.conversation_tree.summarized_history(
+                messages, token_budget=self.history_token_budget
+            )
             await respond_to_user(
                 chat_model=self.conversation_tree.chat_model,
                 extra_chain_runnables=self.extra_chain_runnables,
                 tools=self.tools,
-                response_message=self.conversation_tree.add_assistant_message(),
+                response_message=response_message,
                 conversation_goal_prompt=self.conversation_tree.conversation_goal_prompt,
                 current_goal_prompt=self.format_prompt(prompt=self.goal_prompt),
-                chat_history=self.conversation_tree.get_active_chat_history(),
+                chat_history=chat_history,
+                summary=summary,
             )
             self.messages_sent += 1
-            self.next_message_time = time.time() + self.seconds_since_last_message
+            self.next_message_time = (
+                self.conversation_tree.clock.time() + self.seconds_since_last_message
+            )
         except Exception as e:
             self.feedback_message = f"Error {e}"
             self.logger.error(f"Error responding to user: {e}")
 
     async def _capture_state(self):
         try:
-            self.captured_state = await capture_goal_state(
+            summary, chat_history = await self.summarized_chat_history(
+                self.history_token_budget
+            )
+            extractor = self.conversation_tree.state_extractor
+            capture = (
+                capture_goal_state
+                if extractor is None
+                else extractor.capture_goal_state
+            )
+            self.captured_state = await capture(
                 chat_model=self.conversation_tree.chat_model,
                 extra_chain_runnables=self.extra_chain_runnables,
                 tools=self.tools,
                 goal_prompt=self.format_prompt(prompt=self.goal_prompt),
-                chat_history=self.conversation_tree.get_active_chat_history(),
-                non_captured_messages=len(self.conversation_tree.chat_history)
+                chat_history=chat_history,
+                summary=summary,
+                response_cache=self.response_cache,
+                single_flight=self.single_flight,
+                non_captured_messages=self.pinned_messages()
                 - self.last_captured_message,
                 previous_state=self.captured_state,
                 state_type=self.capture_state_type,
             )
-            self.last_captured_message = len(self.conversation_tree.chat_history)
-            self.conversation_tree.bb.set_value(
+            self.last_captured_message = self.pinned_messages()
+            self.blackboard.set_value(
                 key=self.name,
                 value=self.captured_state,
                 namespace=self.namespace,
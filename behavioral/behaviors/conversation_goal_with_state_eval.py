@@ -6,7 +6,7 @@ from pydantic import BaseModel
 
 from behavioral.behaviors.conversation_goal import ConversationGoal
 from behavioral.guards import BehaviorGuard
-from behavioral.utils import PartialPromptParams
+from behavioral.utils import PartialPromptParams, ResponseCache, SingleFlight
 
 
 class ConversationGoalWithStateEval(ConversationGoal):
@@ -25,6 +25,9 @@ class ConversationGoalWithStateEval(ConversationGoal):
         respond_without_user_message: bool = False,
         max_messages_sent: int = -1,
         seconds_since_last_message: float = 60,
+        history_token_budget: Optional[int] = None,
+        response_cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
     ):
         super().__init__(
             name=name,
@@ -38,6 +41,9 @@ class ConversationGoalWithStateEval(ConversationGoal):
             respond_without_user_message=respond_without_user_message,
             max_messages_sent=max_messages_sent,
             seconds_since_last_message=seconds_since_last_message,
+            history_token_budget=history_token_budget,
+            response_cache=response_cache,
+            single_flight=single_flight,
         )
         self.goal_achieved_eval_check = goal_achieved_eval_check
         self.goal_failed_eval_check = goal_failed_eval_check
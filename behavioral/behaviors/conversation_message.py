@@ -1,4 +1,3 @@
-import time
 from typing import List, Optional
 
 import py_trees
@@ -23,6 +22,7 @@ class ConversationMessage(AsyncBehavior):
         respond_without_user_message: bool = False,
         max_messages_sent: int = -1,
         seconds_since_last_message: float = 0.0,
+        history_token_budget: Optional[int] = None,
     ):
         super().__init__(
             name=name,
@@ -39,6 +39,7 @@ class ConversationMessage(AsyncBehavior):
         self.max_messages_sent = max_messages_sent
         self.seconds_since_last_message = seconds_since_last_message
         self.next_message_time = None
+        self.history_token_budget = history_token_budget
 
     def initialise(self):
         super().initialise()
@@ -65,30 +66,40 @@ class ConversationMessage(AsyncBehavior):
             self.feedback_message = "No pending user message"
             return py_trees.common.Status.FAILURE
 
-        current_time = time.time()
+        current_time = self.conversation_tree.clock.time()
         if (
             self.next_message_time and current_time < self.next_message_time
             # and not self.conversation_tree.has_pending_user_message()
         ):
             self.logger.debug("Next message time not reached")
             self.feedback_message = "Next message time not reached"
+            self.conversation_tree.wakeup_at(self.next_message_time)
             return py_trees.common.Status.FAILURE
         self.logger.debug("Sending message")
         return super().update()
 
     async def async_update(self) -> py_trees.common.Status:
         self.logger.debug("async_update()")
+        # The window is taken without the placeholder of the response.
+        messages = list(self.conversation_tree.chat_history)
+        response_message = self.conversation_tree.add_assistant_message()
+        summary, chat_history = await self.conversation_tree.summarized_history(
+            messages, token_budget=self.history_token_budget
+        )
         await respond_to_user(
             chat_model=self.conversation_tree.chat_model,
             extra_chain_runnables=self.extra_chain_runnables,
             tools=self.tools,
-            response_message=self.conversation_tree.add_assistant_message(),
+            response_message=response_message,
             conversation_goal_prompt=self.conversation_tree.conversation_goal_prompt,
             current_goal_prompt=self.format_prompt(prompt=self.message_prompt),
-            chat_history=self.conversation_tree.get_active_chat_history(),
+            chat_history=chat_history,
+            summary=summary,
         )
         self.messages_sent += 1
-        self.next_message_time = time.time() + self.seconds_since_last_message
+        self.next_message_time = (
+            self.conversation_tree.clock.time() + self.seconds_since_last_message
+        )
         return py_trees.common.Status.SUCCESS
 
     def terminate(self, new_status: py_trees.common.Status) -> None:
@@ -4,6 +4,7 @@ from typing import Callable, Optional
 import py_trees
 
 from behavioral.base import Behavior
+from behavioral.blackboard import BlackBoardPath
 from behavioral.guards import BehaviorGuard
 from behavioral.utils import PartialPromptParams
 
@@ -27,10 +28,10 @@ class ExpandTree(Behavior):
             prompt_params=prompt_params,
         )
         self.expand_on_state_variable = expand_on_state_variable
-        name_components = self.expand_on_state_variable.split(".")
-        self.expand_on_state_key = name_components[0]
+        self.expand_on_state_path = BlackBoardPath(expand_on_state_variable)
+        self.expand_on_state_key = self.expand_on_state_path.key
         self.expand_on_state_attribute = ".".join(
-            name_components[1:]
+            self.expand_on_state_path.attributes
         )  # empty string if no other parts
         self.expand_target = expand_target
         self.expand_prompt_param_key = expand_prompt_param_key
@@ -52,11 +53,7 @@ class ExpandTree(Behavior):
     def expand(self):
         try:
             self.logger.debug("Expanding")
-            items = self.conversation_tree.bb.get_value(
-                key=self.expand_on_state_key, namespace=self.namespace
-            )
-            if self.expand_on_state_attribute:
-                items = getattr(items, self.expand_on_state_attribute)
+            items = self.expand_on_state_path.resolve(self.blackboard, self.namespace)
             if isinstance(items, str):
                 items = [items]
             for item in items:
@@ -97,6 +94,8 @@ class ExpandTree(Behavior):
                     conversation_tree=self.conversation_tree,
                 )
                 self.expand_target.add_child(behavior)
+                self.conversation_tree.own_namespace(new_namespace, behavior)
+            self.conversation_tree.structure_changed()
 
             return py_trees.common.Status.SUCCESS
         except Exception as e:
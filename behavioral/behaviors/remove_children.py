@@ -23,6 +23,7 @@ class RemoveChildren(Behavior):
             )
             if callable(remove_all_children):
                 remove_all_children()
+                self.conversation_tree.structure_changed()
             else:
                 self.logger.error(
                     f"node does not have 'remove_all_children' [{type(self.remove_target)}]"
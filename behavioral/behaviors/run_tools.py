@@ -47,23 +47,22 @@ class RunTools(AsyncBehavior):
 
     async def async_update(self) -> py_trees.common.Status:
         self.logger.debug("Calling tools")
-        tool_calls = self.conversation_tree.bb.get_value(
-            key=self.invoke_bb_key, namespace=self.namespace
-        ).tool_calls
-        tool_output = self.conversation_tree.bb.get_value(
-            key=self.tools_bb_output, namespace=self.namespace
+        bb = self.blackboard
+        values = bb.get_many(
+            [self.invoke_bb_key, self.tools_bb_output], namespace=self.namespace
         )
+        tool_calls = values[self.invoke_bb_key].tool_calls
+        tool_output = values[self.tools_bb_output]
         if tool_output is None:
             tool_output = ToolExecutions()
-            self.conversation_tree.bb.set_value(
-                key=self.tools_bb_output, value=tool_output, namespace=self.namespace
-            )
         if tool_output.num_runs >= self.max_runs:
             self.feedback_message = "Max tool runs reached"
             return py_trees.common.Status.FAILURE
         if len(tool_output.tool_executions) >= self.max_tool_calls:
             self.feedback_message = "Max tool calls reached"
             return py_trees.common.Status.FAILURE
+        # Copy on write, blackboard snapshots may still hold the current value.
+        tool_output = self._copy(tool_output)
         tool_output.num_runs += 1
 
         tasks = []
@@ -76,13 +75,27 @@ class RunTools(AsyncBehavior):
             tasks.append(asyncio.create_task(selected_tool.ainvoke(tool_call["args"])))
             if len(tool_output.tool_executions) >= self.max_tool_calls:
                 break
+        # Published before the calls, so that a cancelled run still counts.
+        bb.set_value(
+            key=self.tools_bb_output, value=tool_output, namespace=self.namespace
+        )
         results = await asyncio.gather(*tasks, return_exceptions=True)
         self.logger.debug("Results: {results}")
+        tool_output = self._copy(tool_output)
         for i in range(len(results)):
             tool_output.tool_executions[tool_calls[i]["id"]] = ToolExecution(
                 tool_call=str(tool_calls[i]), tool_output=str(results[i])
             )
+        bb.set_value(
+            key=self.tools_bb_output, value=tool_output, namespace=self.namespace
+        )
         if len(tool_output.tool_executions) >= self.max_tool_calls:
             self.feedback_message = "Max tool calls reached"
             return py_trees.common.Status.FAILURE
         return py_trees.common.Status.SUCCESS
+
+    @staticmethod
+    def _copy(tool_output: ToolExecutions) -> ToolExecutions:
+        return tool_output.model_copy(
+            update={"tool_executions": dict(tool_output.tool_executions)}
+        )
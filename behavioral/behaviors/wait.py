@@ -1,4 +1,3 @@
-import asyncio
 from typing import Optional
 
 import py_trees
@@ -22,5 +21,5 @@ class Wait(AsyncBehavior):
         self.delay = delay
 
     async def async_update(self) -> py_trees.common.Status:
-        await asyncio.sleep(delay=self.delay)
+        await self.conversation_tree.clock.sleep(self.delay)
         return py_trees.common.Status.SUCCESS
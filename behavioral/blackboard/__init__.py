@@ -1,3 +1,22 @@
-from .blackboard import BlackBoard
+from .blackboard import (BlackBoard, BlackBoardDelta, BlackBoardEvent,
+                         BlackBoardSnapshot, BlackBoardTransaction,
+                         Subscription)
+from .checkpoint import BlackBoardCheckpointer
+from .memory_policy import MemoryPolicy
+from .path import BlackBoardPath, blackboard_path
+from .storage import BlackBoardStorage, SQLiteStorage
 
-__all__ = ["BlackBoard"]
+__all__ = [
+    "BlackBoard",
+    "BlackBoardCheckpointer",
+    "BlackBoardDelta",
+    "BlackBoardEvent",
+    "BlackBoardPath",
+    "BlackBoardSnapshot",
+    "BlackBoardStorage",
+    "BlackBoardTransaction",
+    "MemoryPolicy",
+    "SQLiteStorage",
+    "Subscription",
+    "blackboard_path",
+]
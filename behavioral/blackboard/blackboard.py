@@ -1,17 +1,71 @@
+import asyncio
+import functools
 import importlib
 import json
+import pickle
 import uuid
-from typing import Dict, Set, Union
+import weakref
+from contextlib import contextmanager
+from typing import (TYPE_CHECKING, Any, AsyncIterator, Callable, Dict,
+                    Iterable, Iterator, List, Optional, Set, Union)
 
 from pydantic import BaseModel, SerializeAsAny, TypeAdapter
 
+if TYPE_CHECKING:
+    from .memory_policy import MemoryPolicy
+    from .storage import BlackBoardStorage
+
 SEPARATOR = "/"
+SNAPSHOT_FORMAT = 1
 
 
 class BlackBoardSerializableDict(BaseModel):
     data: Dict[str, Union[SerializeAsAny[BaseModel], int, float, str, bool]]
 
 
+@functools.lru_cache(maxsize=None)
+def type_adapter(module: str, qualname: str) -> TypeAdapter:
+    """The validator of a serialized type, resolved once per process."""
+    t = importlib.import_module(module)
+    for name in qualname.split("."):
+        t = getattr(t, name)
+    return TypeAdapter(t)
+
+
+@functools.lru_cache(maxsize=None)
+def _type_name(t: type) -> tuple[str, str]:
+    return t.__module__, t.__qualname__
+
+
+def check_value(value):
+    """Raise a ValueError unless the value can be set in a blackboard."""
+    if not isinstance(value, (BaseModel, int, float, str, bool)):
+        raise ValueError(
+            f"Value must be an instance of BaseModel or a primitive type, got {type(value)}"
+        )
+
+
+def value_size(value) -> int:
+    """The approximate size of a blackboard value in bytes, once serialized."""
+    if isinstance(value, BaseModel):
+        return len(value.model_dump_json())
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 8
+
+
+class BlackBoardDelta(BaseModel):
+    """The changes of a blackboard since the previous delta.
+
+    A full delta holds every value and replaces the whole blackboard.
+    """
+
+    full: bool = False
+    types: Dict[str, tuple[str, str]] = {}
+    data: Dict[str, Union[SerializeAsAny[BaseModel], int, float, str, bool]] = {}
+    removed: List[str] = []
+
+
 class KeyMetaData(object):
     """Stores the aggregated metadata for a key on the blackboard."""
 
@@ -46,6 +100,40 @@ def absolute_name(namespace: str, key: str, separator: str = None) -> str:
     return "{}{}".format(namespace, key)
 
 
+def _join(namespace: str, key: str) -> str:
+    """`absolute_name()` of a namespace that already has its separators."""
+    if key.startswith(SEPARATOR):
+        return key
+    return namespace + key.strip(SEPARATOR)
+
+
+def parent_namespaces(abs_key: str, separator: str = None) -> Iterator[str]:
+    """The namespaces that contain an absolute key, from the root down.
+
+    **Examples**
+
+    .. code-block:: python
+
+        '/foo/bar/baz' -> '/', '/foo/', '/foo/bar/'
+    """
+    if separator is None:
+        separator = SEPARATOR
+    end = abs_key.find(separator)
+    while end != -1:
+        yield abs_key[: end + 1]
+        end = abs_key.find(separator, end + 1)
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_parent_namespaces(namespace: str) -> tuple[str, ...]:
+    return tuple(parent_namespaces(namespace))
+
+
+def key_namespaces(abs_key: str) -> tuple[str, ...]:
+    """`parent_namespaces()` of a key, cached by the namespace of the key."""
+    return _cached_parent_namespaces(abs_key[: abs_key.rfind(SEPARATOR) + 1])
+
+
 def ensure_namespace_separator(
     namespace: str, separator: str = None
 ) -> tuple[str, str]:
@@ -70,18 +158,459 @@ def ensure_namespace_separator(
     return namespace, separator
 
 
+class BlackBoardEvent:
+    """The keys changed by a write to the blackboard.
+
+    Args:
+        keys: The absolute keys that were set or removed.
+        version: The version of the blackboard after the write.
+    """
+
+    def __init__(self, keys: List[str], version: int):
+        self.keys = keys
+        self.version = version
+
+    def __repr__(self) -> str:
+        return f"BlackBoardEvent(keys={self.keys}, version={self.version})"
+
+
+class Subscription:
+    """A callback registered with `BlackBoard.subscribe()`."""
+
+    def __init__(
+        self,
+        blackboard: "BlackBoard",
+        callback: Callable[[BlackBoardEvent], None],
+        key: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ):
+        self.blackboard = blackboard
+        self.callback = callback
+        self.key = key
+        self.namespace = namespace
+
+    def unsubscribe(self):
+        self.blackboard._remove_subscription(self)
+
+
+_MISSING = object()
+
+
+class BlackBoardSnapshot:
+    """A read-only view of a blackboard as it was when the snapshot was taken.
+
+    Taking a snapshot is O(1), the blackboard saves the previous value of a
+    key in its live snapshots on the first write to the key. Values must thus
+    be replaced with `set_value()` rather than mutated in place. Writes made
+    through the snapshot go to the blackboard and are visible in the snapshot.
+
+    Release a snapshot once it is no longer needed, or use it as a context
+    manager, to stop saving previous values.
+    """
+
+    def __init__(self, blackboard: "BlackBoard"):
+        self.blackboard = blackboard
+        self.version = blackboard.version
+        # The values of the keys when the snapshot was taken, _MISSING for the
+        # keys created later.
+        self._before: Dict[str, object] = {}
+
+    def __enter__(self) -> "BlackBoardSnapshot":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def release(self):
+        self.blackboard._snapshots.discard(self)
+        self._before = {}
+
+    def get_value(self, key: str, namespace: str = None):
+        abs_key = absolute_name(namespace=namespace, key=key)
+        value = self._before.get(abs_key, None)
+        if value is None:
+            return self.blackboard._peek(abs_key)
+        return None if value is _MISSING else value
+
+    def set_value(self, key: str, value, namespace: str = None):
+        self.blackboard.set_value(key, value, namespace)
+        self._before.pop(absolute_name(namespace=namespace, key=key), None)
+
+    def remove_key(self, key: str, namespace: str = None):
+        removed = self.blackboard.remove_key(key, namespace)
+        abs_key = absolute_name(namespace=namespace, key=key)
+        if abs_key in self._before:
+            self._before[abs_key] = _MISSING
+        return removed
+
+    def _abs_keys(self, namespace: str) -> List[str]:
+        live = self.blackboard._namespace_keys(namespace)
+        if not self._before:
+            return list(live)
+        keys = [k for k in live if self._before.get(k) is not _MISSING]
+        keys += [
+            k
+            for k, v in self._before.items()
+            if v is not _MISSING and k not in live and k.startswith(namespace)
+        ]
+        return keys
+
+    def keys(self, namespace: str = None) -> List[str]:
+        namespace, _ = ensure_namespace_separator(namespace=namespace)
+        start = len(namespace)
+        return [k[start:] for k in self._abs_keys(namespace)]
+
+    def to_dict(self, namespace: str = None) -> Dict:
+        namespace, _ = ensure_namespace_separator(namespace=namespace)
+        start = len(namespace)
+        return {k[start:]: self.get_value(k) for k in self._abs_keys(namespace)}
+
+    def get_many(self, keys: Iterable[str], namespace: str = None) -> Dict[str, Any]:
+        return {key: self.get_value(key, namespace) for key in keys}
+
+    def set_many(self, values: Dict[str, Any], namespace: str = None):
+        self.blackboard.set_many(values, namespace)
+        for key in values:
+            self._before.pop(absolute_name(namespace=namespace, key=key), None)
+
+    def transaction(self, namespace: str = None) -> "BlackBoardTransaction":
+        """A transaction on the blackboard whose writes the snapshot sees."""
+        return BlackBoardTransaction(self, namespace)
+
+    def _apply(self, writes: Dict[str, Any]):
+        self.blackboard._apply(writes)
+        for abs_key, value in writes.items():
+            if value is _MISSING:
+                if abs_key in self._before:
+                    self._before[abs_key] = _MISSING
+            else:
+                self._before.pop(abs_key, None)
+
+
+class BlackBoardTransaction:
+    """Writes to a blackboard buffered until the transaction commits.
+
+    The writes are applied together when the `with` block exits, or on
+    `commit()`, and subscribers are notified once of all the changed keys.
+    Values are checked as they are set, and an exception in the block discards
+    the writes. Reads within the transaction see its own writes.
+
+    Args:
+        blackboard: The blackboard, or snapshot of it, to write to.
+        namespace: The default namespace of the keys.
+    """
+
+    def __init__(
+        self,
+        blackboard: Union["BlackBoard", BlackBoardSnapshot],
+        namespace: str = None,
+    ):
+        self.blackboard = blackboard
+        self.namespace, _ = ensure_namespace_separator(namespace=namespace)
+        # The values to set by absolute key, _MISSING for the keys to remove.
+        self._writes: Dict[str, Any] = {}
+
+    def __enter__(self) -> "BlackBoardTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def _abs_key(self, key: str, namespace: Optional[str]) -> str:
+        if namespace is None:
+            return _join(self.namespace, key)
+        return absolute_name(namespace=namespace, key=key)
+
+    def get_value(self, key: str, namespace: str = None):
+        abs_key = self._abs_key(key, namespace)
+        value = self._writes.get(abs_key)
+        if value is None:
+            return self.blackboard.get_value(abs_key)
+        return None if value is _MISSING else value
+
+    def set_value(self, key: str, value, namespace: str = None):
+        check_value(value)
+        self._writes[self._abs_key(key, namespace)] = value
+
+    def set_many(self, values: Dict[str, Any], namespace: str = None):
+        for key, value in values.items():
+            self.set_value(key, value, namespace)
+
+    def remove_key(self, key: str, namespace: str = None):
+        self._writes[self._abs_key(key, namespace)] = _MISSING
+
+    def commit(self):
+        """Apply the buffered writes, with a single change notification."""
+        writes, self._writes = self._writes, {}
+        if writes:
+            self.blackboard._apply(writes)
+
+    def rollback(self):
+        """Discard the buffered writes."""
+        self._writes = {}
+
+
 class BlackBoard(Dict):
-    def __init__(self):
-        self._bb = BlackBoardSerializableDict(data={})
+    """Values shared by the behaviors of a tree, by namespace and key.
+
+    Args:
+        storage: Where the values are kept, in memory by default. The keys of
+            a storage that is not empty are loaded.
+        memory_policy: Limits on the size of the values, see `MemoryPolicy`.
+    """
+
+    def __init__(
+        self,
+        storage: Optional["BlackBoardStorage"] = None,
+        memory_policy: Optional["MemoryPolicy"] = None,
+    ):
+        self.storage = storage
+        self.memory_policy = memory_policy
+        if storage is None:
+            self._bb = BlackBoardSerializableDict(data={})
+        else:
+            self._bb = BlackBoardSerializableDict.model_construct(data=storage)
         self._types: Dict[str, tuple[str, str]] = {}
+        # Absolute keys by namespace, for every namespace that contains a key
+        # directly or in a nested namespace. Dicts keep the insertion order.
+        self._namespaces: Dict[str, Dict[str, None]] = {}
+        # The blackboard version when a key or namespace last changed. Keys
+        # and namespaces are told apart by the trailing separator.
+        self.version = 0
+        self._versions: Dict[str, int] = {}
+        self._subscribers: List[Subscription] = []
+        self._key_subscribers: Dict[str, List[Subscription]] = {}
+        self._namespace_subscribers: Dict[str, List[Subscription]] = {}
+        self._reads: Optional[List[str]] = None
+        # The keys set and removed since the last delta, see to_json_delta().
+        self._dirty: Dict[str, None] = {}
+        self._removed: Dict[str, None] = {}
+        # The JSON encoded models not decoded yet, see from_bytes().
+        self._lazy: Dict[str, bytes] = {}
+        # The sizes of the values measured since they were last set.
+        self._sizes: Dict[str, int] = {}
+        self._snapshots: "weakref.WeakSet[BlackBoardSnapshot]" = weakref.WeakSet()
+        # The JSON of the values and namespaces in debug_json(), the namespaces
+        # by the version they were serialized at.
+        self._debug_values: Dict[str, str] = {}
+        self._debug_subtrees: Dict[str, tuple[int, str]] = {}
+        # The values of `BlackBoardPath`s by key and attributes, until the key
+        # changes.
+        self._path_values: Dict[str, Dict[tuple[str, ...], Any]] = {}
+        # With a memory policy, the write time and size of every key in write
+        # order, overall and by the namespace directly holding the key.
+        self.total_bytes = 0
+        self._written: Dict[str, tuple[float, int]] = {}
+        self._namespace_written: Dict[str, Dict[str, None]] = {}
+        self._namespace_bytes: Dict[str, int] = {}
+        if storage is not None:
+            self._types.update(storage.types())
+            for k in storage:
+                self._index(k)
+                self._touch(k)
+                if memory_policy is not None:
+                    self._account(k, value_size(storage[k]))
+            if memory_policy is not None:
+                self._enforce_memory_policy()
+            self.clear_changes()
+
+    def subscribe(
+        self,
+        callback: Callable[[BlackBoardEvent], None],
+        key: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ) -> Subscription:
+        """Call `callback` with a `BlackBoardEvent` after values are set or removed.
+
+        Args:
+            callback: The function to call with the changed keys.
+            key: Only notify the changes of this key, relative to the namespace.
+            namespace: Only notify the changes in this namespace (recursively).
+
+        Returns:
+            A subscription to pass to `unsubscribe()`.
+        """
+        if key is not None:
+            abs_key = absolute_name(namespace=namespace, key=key)
+            subscription = Subscription(self, callback, key=abs_key)
+            self._key_subscribers.setdefault(abs_key, []).append(subscription)
+        elif namespace is not None:
+            namespace, _ = ensure_namespace_separator(namespace=namespace)
+            subscription = Subscription(self, callback, namespace=namespace)
+            self._namespace_subscribers.setdefault(namespace, []).append(subscription)
+        else:
+            subscription = Subscription(self, callback)
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Union[Subscription, Callable]):
+        """Remove a subscription, or every subscription of a callback."""
+        if isinstance(subscription, Subscription):
+            self._remove_subscription(subscription)
+            return
+        for subscriptions in [
+            self._subscribers,
+            *self._key_subscribers.values(),
+            *self._namespace_subscribers.values(),
+        ]:
+            for s in list(subscriptions):
+                if s.callback == subscription:
+                    self._remove_subscription(s)
+
+    def _remove_subscription(self, subscription: Subscription):
+        if subscription.key is not None:
+            subscriptions = self._key_subscribers.get(subscription.key, [])
+        elif subscription.namespace is not None:
+            subscriptions = self._namespace_subscribers.get(subscription.namespace, [])
+        else:
+            subscriptions = self._subscribers
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+        if not subscriptions:
+            self._key_subscribers.pop(subscription.key, None)
+            self._namespace_subscribers.pop(subscription.namespace, None)
+
+    async def watch(
+        self, key: Optional[str] = None, namespace: Optional[str] = None
+    ) -> AsyncIterator[BlackBoardEvent]:
+        """Iterate over the changes of a key or namespace, see `subscribe()`.
+
+        Writes from other threads are delivered on the event loop of the
+        iterating task.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        subscription = self.subscribe(
+            lambda event: loop.call_soon_threadsafe(queue.put_nowait, event),
+            key=key,
+            namespace=namespace,
+        )
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            subscription.unsubscribe()
+
+    def _notify(self, abs_keys: List[str]):
+        event = BlackBoardEvent(abs_keys, self.version)
+        for subscription in list(self._subscribers):
+            subscription.callback(event)
+        if not self._key_subscribers and not self._namespace_subscribers:
+            return
+        matches: Dict[Subscription, List[str]] = {}
+        for abs_key in abs_keys:
+            for subscription in self._key_subscribers.get(abs_key, ()):
+                matches.setdefault(subscription, []).append(abs_key)
+            if self._namespace_subscribers:
+                for namespace in key_namespaces(abs_key):
+                    for subscription in self._namespace_subscribers.get(namespace, ()):
+                        matches.setdefault(subscription, []).append(abs_key)
+        for subscription, keys in matches.items():
+            subscription.callback(BlackBoardEvent(keys, self.version))
+
+    def get_version(self, key: str, namespace: str = None) -> int:
+        """The blackboard version when the key last changed, 0 if missing."""
+        return self._versions.get(absolute_name(namespace=namespace, key=key), 0)
+
+    def get_namespace_version(self, namespace: str = None) -> int:
+        """The blackboard version when a key in the namespace last changed."""
+        namespace, _ = ensure_namespace_separator(namespace=namespace)
+        return self._versions.get(namespace, 0)
+
+    def versions(self, names: List[str]) -> List[int]:
+        """The versions of absolute keys and namespaces, e.g. from `track_reads()`."""
+        return [self._versions.get(name, 0) for name in names]
+
+    @contextmanager
+    def track_reads(self) -> Iterator[List[str]]:
+        """Collect the absolute keys and namespaces read in the block."""
+        outer = self._reads
+        reads: List[str] = []
+        self._reads = reads
+        try:
+            yield reads
+        finally:
+            self._reads = outer
+            if outer is not None:
+                outer.extend(reads)
+
+    def _touch(self, abs_key: str, removed: bool = False):
+        self.version += 1
+        if self._sizes:
+            self._sizes.pop(abs_key, None)
+        if self._debug_values:
+            self._debug_values.pop(abs_key, None)
+        if self._path_values:
+            self._path_values.pop(abs_key, None)
+        if removed:
+            self._versions.pop(abs_key, None)
+            self._dirty.pop(abs_key, None)
+            self._removed[abs_key] = None
+        else:
+            self._versions[abs_key] = self.version
+            self._dirty[abs_key] = None
+            self._removed.pop(abs_key, None)
+        for namespace in key_namespaces(abs_key):
+            self._versions[namespace] = self.version
+
+    def _index(self, abs_key: str):
+        for namespace in key_namespaces(abs_key):
+            keys = self._namespaces.get(namespace)
+            if keys is None:
+                keys = self._namespaces[namespace] = {}
+            keys[abs_key] = None
+
+    def _unindex(self, abs_key: str):
+        for namespace in key_namespaces(abs_key):
+            keys = self._namespaces[namespace]
+            del keys[abs_key]
+            if not keys:
+                del self._namespaces[namespace]
+                self._versions.pop(namespace, None)
+                self._debug_subtrees.pop(namespace, None)
+
+    def _namespace_keys(self, namespace: str) -> Dict[str, None]:
+        return self._namespaces.get(namespace, {})
 
     def remove_key(self, key: str, namespace: str = None):
         abs_key = absolute_name(
             namespace=namespace,
             key=key,
         )
-        self._bb.data.pop(abs_key, None)
+        if self._snapshots:
+            self._preserve(abs_key)
+        data = self._bb.data
+        removed = abs_key in data
+        if removed:
+            # Rather than pop(), a storage need not read the value back.
+            del data[abs_key]
         self._types.pop(abs_key, None)
+        if self._lazy:
+            self._lazy.pop(abs_key, None)
+        if removed:
+            self._touch(abs_key, removed=True)
+            if self.memory_policy is not None:
+                self._unaccount(abs_key)
+            self._unindex(abs_key)
+            self._notify([abs_key])
+        return removed
+
+    def remove_namespace(self, namespace: str) -> int:
+        """Remove every key within a namespace, nested namespaces included.
+
+        Returns:
+            The number of removed keys.
+        """
+        namespace, _ = ensure_namespace_separator(namespace=namespace)
+        keys = list(self._namespace_keys(namespace))
+        for k in keys:
+            self._unload_value(k)
+        if keys:
+            self._notify(keys)
+        return len(keys)
 
     def set_value(self, key: str, value, namespace: str = None):
         """Set a value in the blackboard.
@@ -91,18 +620,92 @@ class BlackBoard(Dict):
             value: The value to set.
             namespace: The namespace to set the value for.
         """
-        if not isinstance(value, (BaseModel, int, float, str, bool)):
-            raise ValueError(
-                f"Value must be an instance of BaseModel or a primitive type, got {type(value)}"
-            )
+        check_value(value)
         abs_key = absolute_name(
             namespace=namespace,
             key=key,
         )
+        if self.memory_policy is not None:
+            size = value_size(value)
+            self._check_fits({abs_key: size})
+        if self._snapshots:
+            self._preserve(abs_key)
+        if abs_key not in self._bb.data:
+            self._index(abs_key)
         self._bb.data[abs_key] = value
+        if self._lazy:
+            self._lazy.pop(abs_key, None)
         if isinstance(value, BaseModel):
-            t = type(value)
-            self._types[abs_key] = (t.__module__, t.__qualname__)
+            self._types[abs_key] = _type_name(type(value))
+        self._touch(abs_key)
+        if self.memory_policy is None:
+            self._notify([abs_key])
+            return
+        self._account(abs_key, size)
+        self._notify([abs_key] + self._enforce_memory_policy((abs_key,)))
+
+    def set_many(self, values: Dict[str, Any], namespace: str = None):
+        """Set several values at once, with a single change notification.
+
+        Every value is checked before any is set, so that either all or none
+        of them are set. With a memory policy, values that do not fit its
+        limits together raise a ValueError.
+
+        Args:
+            values: The values by key.
+            namespace: The namespace of the keys.
+        """
+        for value in values.values():
+            check_value(value)
+        namespace, _ = ensure_namespace_separator(namespace=namespace)
+        self._apply({_join(namespace, k): v for k, v in values.items()})
+
+    def get_many(self, keys: Iterable[str], namespace: str = None) -> Dict[str, Any]:
+        """Get several values at once, None for the missing keys.
+
+        Args:
+            keys: The keys to get the values for.
+            namespace: The namespace of the keys.
+
+        Returns:
+            The values by the given keys.
+        """
+        namespace, _ = ensure_namespace_separator(namespace=namespace)
+        values = {}
+        for key in keys:
+            abs_key = _join(namespace, key)
+            if self._reads is not None:
+                self._reads.append(abs_key)
+            values[key] = self._peek(abs_key)
+        return values
+
+    def transaction(self, namespace: str = None) -> "BlackBoardTransaction":
+        """Buffer writes and apply them together, see `BlackBoardTransaction`."""
+        return BlackBoardTransaction(self, namespace)
+
+    def _apply(self, writes: Dict[str, Any]):
+        """Set or remove (_MISSING) checked values by absolute key, then notify once."""
+        sizes = None
+        if self.memory_policy is not None:
+            sizes = {k: value_size(v) for k, v in writes.items() if v is not _MISSING}
+            self._check_fits(sizes)
+        changed: Dict[str, None] = {}
+        for abs_key, value in writes.items():
+            if value is not _MISSING:
+                if isinstance(value, BaseModel):
+                    self._types[abs_key] = _type_name(type(value))
+                else:
+                    self._types.pop(abs_key, None)
+                self._store(abs_key, value, None if sizes is None else sizes[abs_key])
+                changed[abs_key] = None
+            elif abs_key in self._bb.data:
+                self._unload_value(abs_key)
+                changed[abs_key] = None
+        if not changed:
+            return
+        if sizes:
+            changed.update(dict.fromkeys(self._enforce_memory_policy(sizes)))
+        self._notify(list(changed))
 
     def get_value(self, key: str, namespace: str = None) -> BaseModel:
         """Get a value from the blackboard.
@@ -115,8 +718,32 @@ class BlackBoard(Dict):
             namespace=namespace,
             key=key,
         )
+        if self._reads is not None:
+            self._reads.append(abs_key)
+        return self._peek(abs_key)
+
+    def _peek(self, abs_key: str):
+        if self._lazy and abs_key in self._lazy:
+            return self._decode(abs_key)
         return self._bb.data.get(abs_key, None)
 
+    def snapshot(self) -> BlackBoardSnapshot:
+        """Take a copy-on-write snapshot, see `BlackBoardSnapshot`."""
+        snapshot = BlackBoardSnapshot(self)
+        self._snapshots.add(snapshot)
+        return snapshot
+
+    def _preserve(self, abs_key: str):
+        """Save the value of a key in the snapshots before it changes."""
+        value = None
+        for snapshot in self._snapshots:
+            if abs_key not in snapshot._before:
+                if value is None:
+                    value = self._peek(abs_key)
+                    if value is None:
+                        value = _MISSING
+                snapshot._before[abs_key] = value
+
     def keys(self, namespace: str = None):
         """Get all keys in the blackboard.
 
@@ -124,11 +751,10 @@ class BlackBoard(Dict):
             namespace: The namespace to get the keys for.
         """
         namespace, _ = ensure_namespace_separator(namespace=namespace)
-        return [
-            k.removeprefix(namespace)
-            for k in self._bb.data.keys()
-            if k.startswith(namespace)
-        ]
+        if self._reads is not None:
+            self._reads.append(namespace)
+        start = len(namespace)
+        return [k[start:] for k in self._namespace_keys(namespace)]
 
     def to_dict(self, namespace: str = None) -> Dict:
         """Get a dictionary representation of the blackboard.
@@ -137,57 +763,373 @@ class BlackBoard(Dict):
             namespace: The namespace to get the dictionary for.
         """
         namespace, _ = ensure_namespace_separator(namespace=namespace)
-        ret = {}
-        for k, v in self._bb.data.items():
-            if k.startswith(namespace):
-                ret[k.removeprefix(namespace)] = v
-        return ret
-
-    def debug_json(self, namespace: str = None) -> Dict:
-        def is_primitive(obj):
-            primitives = (bool, str, int, float, type(None))
-            return isinstance(obj, primitives)
-
-        def add_val(d: Dict, key_parts, value):
-            k = key_parts.pop(0)
-            if len(key_parts) == 0:
-                if is_primitive(value):
-                    d[k] = str(value)
-                else:
-                    d[k] = json.loads(value.model_dump_json())
-                return
+        if self._reads is not None:
+            self._reads.append(namespace)
+        start = len(namespace)
+        keys = self._namespace_keys(namespace)
+        if self._lazy:
+            self._decode_all(keys)
+        data = self._bb.data
+        return {k[start:]: data[k] for k in keys}
+
+    def namespace_metrics(self, namespace: str = None) -> Dict[str, Dict[str, int]]:
+        """The number of keys and approximate bytes of the namespaces.
+
+        Every namespace within the given one is listed, its totals include the
+        keys of nested namespaces. Sizes are measured once per value written.
+        """
+        namespace, _ = ensure_namespace_separator(namespace=namespace)
+        return {
+            ns: {"keys": len(keys), "bytes": sum(self._size(k) for k in keys)}
+            for ns, keys in self._namespaces.items()
+            if ns.startswith(namespace)
+        }
+
+    def memory_usage(self) -> Dict[str, int]:
+        """The number of keys and approximate bytes of the whole blackboard."""
+        if self.memory_policy is not None:
+            return {"keys": len(self._written), "bytes": self.total_bytes}
+        data = self._bb.data
+        return {"keys": len(data), "bytes": sum(self._size(k) for k in data)}
+
+    def expire_keys(self) -> int:
+        """Evict the keys older than the TTL of the memory policy.
 
-            new_d = {}
-            if k in d:
-                new_d = d[k]
+        Returns:
+            The number of evicted keys.
+        """
+        if self.memory_policy is None or self.memory_policy.key_ttl is None:
+            return 0
+        evicted = self._expired(self.memory_policy.time())
+        if evicted:
+            self._notify(evicted)
+        return len(evicted)
+
+    def _account(self, abs_key: str, size: int):
+        self._unaccount(abs_key)
+        self._sizes[abs_key] = size
+        self._written[abs_key] = (self.memory_policy.time(), size)
+        self.total_bytes += size
+        namespace = abs_key[: abs_key.rfind(SEPARATOR) + 1]
+        written = self._namespace_written.get(namespace)
+        if written is None:
+            written = self._namespace_written[namespace] = {}
+        written[abs_key] = None
+        self._namespace_bytes[namespace] = (
+            self._namespace_bytes.get(namespace, 0) + size
+        )
+
+    def _unaccount(self, abs_key: str):
+        written = self._written.pop(abs_key, None)
+        if written is None:
+            return
+        size = written[1]
+        self.total_bytes -= size
+        namespace = abs_key[: abs_key.rfind(SEPARATOR) + 1]
+        keys = self._namespace_written[namespace]
+        del keys[abs_key]
+        if keys:
+            self._namespace_bytes[namespace] -= size
+        else:
+            del self._namespace_written[namespace]
+            del self._namespace_bytes[namespace]
+
+    def _check_fits(self, sizes: Dict[str, int]):
+        """Raise a ValueError unless values fit the memory policy together.
+
+        Args:
+            sizes: The sizes of the values about to be written, by absolute key.
+        """
+        policy = self.memory_policy
+        limit = policy.max_total_bytes
+        if limit is not None:
+            total = sum(sizes.values())
+            if total > limit:
+                raise ValueError(
+                    f"Values of {total} bytes exceed max_total_bytes={limit}"
+                )
+        limit = policy.max_namespace_bytes
+        if limit is not None:
+            namespace_sizes: Dict[str, int] = {}
+            for abs_key, size in sizes.items():
+                namespace = abs_key[: abs_key.rfind(SEPARATOR) + 1]
+                namespace_sizes[namespace] = namespace_sizes.get(namespace, 0) + size
+            for namespace, size in namespace_sizes.items():
+                if size > limit:
+                    raise ValueError(
+                        f"Values of {size} bytes exceed max_namespace_bytes={limit} "
+                        f"in namespace '{namespace}'"
+                    )
+
+    def _enforce_memory_policy(self, written: Iterable[str] = None) -> List[str]:
+        """Evict the oldest keys until the limits hold.
+
+        Args:
+            written: The keys just written, never evicted as they were checked
+                to fit. Every namespace is checked when None, e.g. on restore.
+        """
+        policy = self.memory_policy
+        protected = () if written is None else set(written)
+        evicted = []
+        if policy.key_ttl is not None:
+            evicted += self._expired(policy.time(), protected)
+        limit = policy.max_namespace_bytes
+        if limit is not None:
+            if written is None:
+                namespaces = list(self._namespace_bytes)
             else:
-                d[k] = new_d
-            add_val(new_d, key_parts, value)
+                namespaces = {k[: k.rfind(SEPARATOR) + 1] for k in protected}
+            for namespace in namespaces:
+                while self._namespace_bytes.get(namespace, 0) > limit:
+                    written_keys = self._namespace_written[namespace]
+                    evicted.append(self._evict_oldest(written_keys, protected))
+        limit = policy.max_total_bytes
+        if limit is not None:
+            while self.total_bytes > limit:
+                evicted.append(self._evict_oldest(self._written, protected))
+        return evicted
+
+    def _evict_oldest(self, written: Iterable[str], protected) -> str:
+        k = next(k for k in written if k not in protected)
+        self._unload_value(k)
+        return k
+
+    def _expired(self, now: float, protected=()) -> List[str]:
+        ttl = self.memory_policy.key_ttl
+        evicted = []
+        while self._written:
+            k, (written, _) = next(iter(self._written.items()))
+            # The protected keys were just written, after every other key.
+            if k in protected or now - written < ttl:
+                break
+            self._unload_value(k)
+            evicted.append(k)
+        return evicted
+
+    def _size(self, abs_key: str) -> int:
+        size = self._sizes.get(abs_key)
+        if size is None:
+            size = self._sizes[abs_key] = value_size(self._bb.data[abs_key])
+        return size
 
+    def debug_json(self, namespace: str = None) -> str:
+        """The values as nested JSON objects, split by namespace.
+
+        The JSON of every value and of every namespace is cached until a key
+        within it changes, so that repeated calls only serialize the changes.
+        A namespace that has the name of a key next to it keeps its trailing
+        separator, e.g. `"b1/": {...}` next to `"b1"`.
+        """
         namespace, separator = ensure_namespace_separator(namespace=namespace)
+        if namespace == SEPARATOR and separator == SEPARATOR:
+            return self._debug_subtree(namespace)
+
+        keys = {}
+        for k in self._bb.data:
+            keys[k.removeprefix(namespace) if k.startswith(namespace) else k] = k
         ret = {}
-        for k, v in self._bb.data.items():
-            key = k
-            if k.startswith(namespace):
-                key = key.removeprefix(namespace)
-            add_val(ret, key.split(separator), v)
+        for key, k in keys.items():
+            key_parts = key.split(separator)
+            d = ret
+            for i, part in enumerate(key_parts[:-1]):
+                if separator.join(key_parts[: i + 1]) in keys:
+                    part += separator
+                d = d.setdefault(part, {})
+            d[key_parts[-1]] = json.loads(self._debug_fragment(k))
         return json.dumps(ret)
 
+    def _debug_fragment(self, abs_key: str) -> str:
+        fragment = self._debug_values.get(abs_key)
+        if fragment is None:
+            value = self._peek(abs_key)
+            if isinstance(value, (bool, str, int, float, type(None))):
+                fragment = json.dumps(str(value))
+            else:
+                fragment = json.dumps(json.loads(value.model_dump_json()))
+            self._debug_values[abs_key] = fragment
+        return fragment
+
+    def _debug_subtree(self, namespace: str) -> str:
+        version = self._versions.get(namespace, 0)
+        cached = self._debug_subtrees.get(namespace)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        start = len(namespace)
+        # The keys directly in the namespace and the nested namespaces (None)
+        # with their separator, in the order they first appear.
+        entries: Dict[str, Optional[str]] = {}
+        for k in self._namespace_keys(namespace):
+            end = k.find(SEPARATOR, start)
+            if end == -1:
+                entries[k[start:]] = k
+            else:
+                entries.setdefault(k[start : end + 1], None)
+        parts = []
+        for name, k in entries.items():
+            if k is None:
+                fragment = self._debug_subtree(namespace + name)
+                if name[:-1] not in entries:
+                    name = name[:-1]
+            else:
+                fragment = self._debug_fragment(k)
+            parts.append(f"{json.dumps(name)}: {fragment}")
+        subtree = "{" + ", ".join(parts) + "}"
+        self._debug_subtrees[namespace] = (version, subtree)
+        return subtree
+
     def to_json(self) -> tuple[str, str]:
         """Serialize the blackboard data to a JSON string."""
-        return json.dumps(self._types), self._bb.model_dump_json()
+        self._decode_all()
+        bb = self._bb
+        if self.storage is not None:
+            bb = BlackBoardSerializableDict.model_construct(data=dict(bb.data.items()))
+        return json.dumps(self._types), bb.model_dump_json()
 
     def from_json(self, types, data: str) -> "BlackBoard":
         """Deserialize a JSON representation to populate the blackboard."""
         self._types = json.loads(types)
         load_dict = json.loads(data)
         for k, v in load_dict["data"].items():
-            if isinstance(v, Dict):
-                module, name = self._types[k]
-                type_adapter = TypeAdapter(
-                    getattr(importlib.import_module(module), name)
-                )
-                self._bb.data[k] = type_adapter.validate_python(v)
-            else:
-                self._bb.data[k] = v
+            self._load_value(k, v)
+        if self.memory_policy is not None:
+            self._enforce_memory_policy()
+        self.clear_changes()
+        return self
+
+    def to_bytes(self) -> bytes:
+        """Serialize the blackboard to a compact binary snapshot.
+
+        Models are stored as JSON, validated by pydantic-core on load without
+        an intermediate `json.loads`. Values that were never decoded since
+        `from_bytes(lazy=True)` are copied as they are.
+        """
+        data = {}
+        for k, v in self._bb.data.items():
+            if k in self._lazy:
+                v = self._lazy[k]
+            elif isinstance(v, BaseModel):
+                v = v.model_dump_json().encode()
+            data[k] = v
+        return pickle.dumps(
+            (SNAPSHOT_FORMAT, self._types, data), protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+    def from_bytes(self, snapshot: bytes, lazy: bool = False) -> "BlackBoard":
+        """Populate the blackboard from a snapshot created by `to_bytes()`.
+
+        Args:
+            snapshot: The binary snapshot.
+            lazy: Decode a model only when `get_value()` first reads it.
+        """
+        snapshot_format, types, data = pickle.loads(snapshot)
+        if snapshot_format != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format {snapshot_format}")
+        self._types = types
+        for k, v in data.items():
+            if isinstance(v, bytes):
+                if lazy:
+                    self._store(k, v)
+                    self._lazy[k] = v
+                    continue
+                v = type_adapter(*types[k]).validate_json(v)
+            self._store(k, v)
+        if self.memory_policy is not None:
+            self._enforce_memory_policy()
+        self.clear_changes()
         return self
+
+    def _decode(self, k: str):
+        value = type_adapter(*self._types[k]).validate_json(self._lazy.pop(k))
+        self._bb.data[k] = value
+        return value
+
+    def _decode_all(self, keys: Iterable[str] = None):
+        if not self._lazy:
+            return
+        for k in list(self._lazy if keys is None else keys):
+            if k in self._lazy:
+                self._decode(k)
+
+    def to_json_delta(self, full: bool = False) -> str:
+        """Serialize the keys set or removed since the previous delta.
+
+        Checkpointing a delta after every change makes the cost of a
+        checkpoint proportional to the size of the change. See
+        `BlackBoardCheckpointer` for compacting them into full snapshots.
+
+        Args:
+            full: Serialize every value, replacing the blackboard on load.
+        """
+        data = self._bb.data
+        keys = data.keys() if full else self._dirty
+        if self._lazy:
+            self._decode_all(keys)
+        delta = BlackBoardDelta.model_construct(
+            full=full,
+            types={k: self._types[k] for k in keys if k in self._types},
+            data={k: data[k] for k in keys},
+            removed=[] if full else list(self._removed),
+        )
+        self.clear_changes()
+        return delta.model_dump_json()
+
+    def apply_delta(self, delta: str) -> "BlackBoard":
+        """Apply a delta created by `to_json_delta()`."""
+        load_dict = json.loads(delta)
+        if load_dict.get("full", False):
+            for k in list(self._bb.data):
+                self._unload_value(k)
+        for k in load_dict.get("removed", []):
+            if k in self._bb.data:
+                self._unload_value(k)
+        self._types.update(load_dict.get("types", {}))
+        for k, v in load_dict.get("data", {}).items():
+            self._load_value(k, v)
+        if self.memory_policy is not None:
+            self._enforce_memory_policy()
+        self.clear_changes()
+        return self
+
+    def flush(self):
+        """Persist the pending writes of the storage, if any."""
+        if self.storage is not None:
+            self.storage.flush()
+
+    def close(self):
+        """Flush and close the storage, if any."""
+        if self.storage is not None:
+            self.storage.close()
+
+    def clear_changes(self):
+        """Forget the changes since the previous delta, e.g. after a snapshot."""
+        self._dirty = {}
+        self._removed = {}
+
+    def _load_value(self, k: str, v):
+        if isinstance(v, Dict):
+            v = type_adapter(*self._types[k]).validate_python(v)
+        self._store(k, v)
+
+    def _store(self, k: str, v, size: Optional[int] = None):
+        if self._snapshots:
+            self._preserve(k)
+        if k not in self._bb.data:
+            self._index(k)
+        self._touch(k)
+        self._bb.data[k] = v
+        if self._lazy:
+            self._lazy.pop(k, None)
+        if self.memory_policy is not None:
+            self._account(k, value_size(v) if size is None else size)
+
+    def _unload_value(self, k: str):
+        if self._snapshots:
+            self._preserve(k)
+        del self._bb.data[k]
+        self._types.pop(k, None)
+        if self._lazy:
+            self._lazy.pop(k, None)
+        self._touch(k, removed=True)
+        if self.memory_policy is not None:
+            self._unaccount(k)
+        self._unindex(k)
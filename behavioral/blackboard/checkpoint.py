@@ -0,0 +1,68 @@
+from typing import Iterable, Tuple
+
+from .blackboard import BlackBoard
+
+
+class BlackBoardCheckpointer:
+    """Checkpoints a blackboard as a full snapshot followed by deltas.
+
+    Each checkpoint only serializes the keys changed since the previous one.
+    The deltas are periodically compacted into a new full snapshot, so that
+    restoring never replays a long chain of deltas.
+
+    Args:
+        blackboard: The blackboard to checkpoint.
+        compact_every: The number of deltas after which a full snapshot is
+            taken.
+        compact_ratio: A full snapshot is also taken when the deltas since the
+            previous one add up to more than this ratio of its size.
+    """
+
+    def __init__(
+        self,
+        blackboard: BlackBoard,
+        compact_every: int = 20,
+        compact_ratio: float = 1.0,
+    ):
+        self.blackboard = blackboard
+        self.compact_every = compact_every
+        self.compact_ratio = compact_ratio
+        self.full_size = 0
+        self.deltas_since_full = 0
+        self.delta_size_since_full = 0
+
+    def needs_compaction(self) -> bool:
+        return (
+            self.full_size == 0
+            or self.deltas_since_full >= self.compact_every
+            or self.delta_size_since_full > self.compact_ratio * self.full_size
+        )
+
+    def checkpoint(self) -> Tuple[bool, str]:
+        """Serialize the changes since the previous checkpoint.
+
+        Returns:
+            Whether the checkpoint is a full snapshot, which makes the previous
+            checkpoints obsolete, and the serialized checkpoint.
+        """
+        if self.needs_compaction():
+            payload = self.blackboard.to_json_delta(full=True)
+            self.full_size = len(payload)
+            self.deltas_since_full = 0
+            self.delta_size_since_full = 0
+            return True, payload
+        payload = self.blackboard.to_json_delta()
+        self.deltas_since_full += 1
+        self.delta_size_since_full += len(payload)
+        return False, payload
+
+    @staticmethod
+    def restore(
+        checkpoints: Iterable[str], blackboard: BlackBoard = None
+    ) -> BlackBoard:
+        """Rebuild a blackboard from its last full snapshot and later deltas."""
+        if blackboard is None:
+            blackboard = BlackBoard()
+        for payload in checkpoints:
+            blackboard.apply_delta(payload)
+        return blackboard
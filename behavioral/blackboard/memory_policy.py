@@ -0,0 +1,42 @@
+import time
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from behavioral.conversation.clock import Clock
+
+
+class MemoryPolicy:
+    """Limits on the memory held by a blackboard.
+
+    With a policy the blackboard measures every value when it is written.
+    Whenever a limit is exceeded, the least recently written keys are evicted,
+    i.e. removed like with `remove_key()`, but never the keys being written:
+    values that cannot fit the limits raise a ValueError instead. Restoring a
+    blackboard, e.g. with `from_json()` or `apply_delta()`, also evicts the
+    oldest keys until the limits hold. To keep large values on disk instead,
+    use a `SQLiteStorage` with a bounded cache.
+
+    Args:
+        max_namespace_bytes: The maximum approximate bytes of the keys held
+            directly by a namespace, nested namespaces have their own budget.
+        max_total_bytes: The maximum approximate bytes of all the keys.
+        key_ttl: The seconds since a key was last written after which it is
+            evicted. Expired keys are evicted on writes and on every tick.
+        clock: The source of time of `key_ttl`, defaults to the clock of the
+            conversation tree or the wall clock.
+    """
+
+    def __init__(
+        self,
+        max_namespace_bytes: Optional[int] = None,
+        max_total_bytes: Optional[int] = None,
+        key_ttl: Optional[float] = None,
+        clock: Optional["Clock"] = None,
+    ):
+        self.max_namespace_bytes = max_namespace_bytes
+        self.max_total_bytes = max_total_bytes
+        self.key_ttl = key_ttl
+        self.clock = clock
+
+    def time(self) -> float:
+        return self.clock.time() if self.clock is not None else time.time()
@@ -0,0 +1,114 @@
+import copy
+import functools
+import operator
+from typing import Dict, Optional, Tuple, Union
+
+from .blackboard import BlackBoard, BlackBoardSnapshot, absolute_name
+
+# The value of a path whose key is missing while attributes follow.
+_UNRESOLVED = object()
+_MISSING = object()
+
+
+class BlackBoardPath:
+    """A blackboard variable such as "conversation_state.topics", parsed once.
+
+    The variable is a key followed by an optional chain of attributes. The
+    absolute key is computed once per namespace and the resolved value is
+    cached on the blackboard until the key changes, so that checks which run
+    on every tick are constant time while nothing changes. Values must thus
+    be replaced with `set_value()` rather than mutated in place.
+
+    Args:
+        variable: The key, optionally followed by dot separated attributes.
+    """
+
+    def __init__(self, variable: str):
+        self.variable = variable
+        self.key, _, attributes = variable.partition(".")
+        self.attributes: Tuple[str, ...] = (
+            tuple(attributes.split(".")) if attributes else ()
+        )
+        self._getter = operator.attrgetter(attributes) if attributes else None
+        self._abs_keys: Dict[Optional[str], str] = {}
+
+    def __repr__(self) -> str:
+        return f"BlackBoardPath({self.variable!r})"
+
+    def absolute_key(self, namespace: str = None) -> str:
+        abs_key = self._abs_keys.get(namespace)
+        if abs_key is None:
+            abs_key = absolute_name(namespace=namespace, key=self.key)
+            self._abs_keys[namespace] = abs_key
+        return abs_key
+
+    def _lookup(self, bb: Union[BlackBoard, BlackBoardSnapshot], namespace: str):
+        abs_key = self.absolute_key(namespace)
+        if not isinstance(bb, BlackBoard):
+            return self._resolve(bb.get_value(abs_key))
+        if bb._reads is not None:
+            bb._reads.append(abs_key)
+        values = bb._path_values.get(abs_key)
+        if values is None:
+            values = bb._path_values[abs_key] = {}
+        else:
+            value = values.get(self.attributes, _MISSING)
+            if value is not _MISSING:
+                return value
+        value = values[self.attributes] = self._resolve(bb._peek(abs_key))
+        return value
+
+    def _resolve(self, root):
+        if self._getter is None:
+            return root
+        if root is None:
+            return _UNRESOLVED
+        return self._getter(root)
+
+    def resolve(self, bb: Union[BlackBoard, BlackBoardSnapshot], namespace: str = None):
+        """The value of the variable, like `operator.attrgetter` on the key.
+
+        Raises:
+            AttributeError: If an attribute is missing, including the
+                attributes of a missing key.
+        """
+        value = self._lookup(bb, namespace)
+        if value is _UNRESOLVED:
+            raise AttributeError(
+                f"'NoneType' object has no attribute '{self.attributes[0]}'"
+            )
+        return value
+
+    def get(self, bb: Union[BlackBoard, BlackBoardSnapshot], namespace: str = None):
+        """The value of the variable, None if the key is missing.
+
+        Raises:
+            AttributeError: If an attribute of an existing value is missing.
+        """
+        value = self._lookup(bb, namespace)
+        return None if value is _UNRESOLVED else value
+
+    def set(
+        self, bb: Union[BlackBoard, BlackBoardSnapshot], value, namespace: str = None
+    ):
+        """Set the variable, copying the objects along the attribute chain."""
+        abs_key = self.absolute_key(namespace)
+        if self.attributes:
+            objects = [bb.get_value(abs_key)]
+            if objects[0] is None:
+                raise AttributeError(
+                    f"'NoneType' object has no attribute '{self.attributes[0]}'"
+                )
+            for name in self.attributes[:-1]:
+                objects.append(getattr(objects[-1], name))
+            for obj, name in zip(reversed(objects), reversed(self.attributes)):
+                obj = copy.copy(obj)
+                setattr(obj, name, value)
+                value = obj
+        bb.set_value(abs_key, value)
+
+
+@functools.lru_cache(maxsize=1024)
+def blackboard_path(variable: str) -> BlackBoardPath:
+    """A shared `BlackBoardPath`, for call sites that only have the variable."""
+    return BlackBoardPath(variable)
@@ -0,0 +1,344 @@
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .blackboard import type_adapter, value_size
+
+_DELETED = object()
+
+
+class BlackBoardStorage(MutableMapping):
+    """Where a `BlackBoard` keeps its values, by absolute key.
+
+    Iteration must follow the insertion order of the keys, like a dict. The
+    blackboard keeps the keys and their namespace index in memory, a storage
+    only needs to hold the values.
+    """
+
+    def types(self) -> Dict[str, Tuple[str, str]]:
+        """The `(module, qualname)` of the stored models, when opened."""
+        return {}
+
+    def flush(self):
+        """Persist the pending writes."""
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class _SQLiteWriter:
+    """The connection to a database and the thread flushing its writes.
+
+    Shared by every `SQLiteStorage` opened on the same database file, so that
+    many blackboards use a single connection and thread, and their writes are
+    flushed together in one transaction.
+    """
+
+    _writers: Dict[str, "_SQLiteWriter"] = {}
+    _writers_lock = threading.Lock()
+
+    def __init__(self, path: str, flush_interval: float):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS blackboard (name TEXT, key TEXT, "
+            "module TEXT, qualname TEXT, value BLOB, PRIMARY KEY (name, key))"
+        )
+        self.connection.commit()
+        # Serializes the use of the connection.
+        self.lock = threading.Lock()
+        # The storages with writes to flush by id, storages are not hashable.
+        self._dirty: Dict[int, "SQLiteStorage"] = {}
+        self._dirty_lock = threading.Lock()
+        self._storages = 0
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name=f"SQLiteWriter({path})", daemon=True
+        )
+        self._thread.start()
+
+    @classmethod
+    def open(cls, path: str, flush_interval: float) -> "_SQLiteWriter":
+        """The writer of a database, started by its first storage."""
+        # Every connection to ":memory:" opens a different database.
+        key = None if path == ":memory:" else os.path.abspath(path)
+        with cls._writers_lock:
+            writer = cls._writers.get(key) if key is not None else None
+            if writer is None:
+                writer = cls(path, flush_interval)
+                if key is not None:
+                    cls._writers[key] = writer
+            writer._storages += 1
+            writer.flush_interval = min(writer.flush_interval, flush_interval)
+        return writer
+
+    def release(self, timeout: Optional[float] = None):
+        """Close the database once the last of its storages is closed."""
+        with self._writers_lock:
+            self._storages -= 1
+            if self._storages:
+                return
+            key = os.path.abspath(self.path)
+            if self._writers.get(key) is self:
+                del self._writers[key]
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout)
+        self.flush()
+        with self.lock:
+            self.connection.close()
+
+    def mark_dirty(self, storage: "SQLiteStorage", wake: bool = False):
+        with self._dirty_lock:
+            self._dirty[id(storage)] = storage
+        if wake:
+            self._wake.set()
+
+    def flush(self, storages: Optional[List["SQLiteStorage"]] = None):
+        """Write the pending writes of some storages, of every one by default."""
+        with self.lock:
+            with self._dirty_lock:
+                if storages is None:
+                    storages = list(self._dirty.values())
+                    self._dirty.clear()
+                else:
+                    for storage in storages:
+                        self._dirty.pop(id(storage), None)
+            batches = [(storage, storage._take_batch()) for storage in storages]
+            batches = [(storage, batch) for storage, batch in batches if batch]
+            if not batches:
+                return
+            try:
+                upserts: List[tuple] = []
+                deletes: List[tuple] = []
+                for storage, batch in batches:
+                    storage._encode(batch, upserts, deletes)
+                with self.connection:
+                    self.connection.executemany(
+                        "DELETE FROM blackboard WHERE name = ? AND key = ?", deletes
+                    )
+                    self.connection.executemany(
+                        "INSERT INTO blackboard VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (name, key) DO UPDATE SET "
+                        "module = excluded.module, qualname = excluded.qualname, "
+                        "value = excluded.value",
+                        upserts,
+                    )
+            except BaseException:
+                for storage, batch in batches:
+                    storage._restore(batch)
+                    self.mark_dirty(storage)
+                raise
+            for storage, batch in batches:
+                storage._flushed(batch)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Retried at the next interval, the batches are still pending.
+                pass
+
+
+class SQLiteStorage(BlackBoardStorage):
+    """Values persisted in a local SQLite database.
+
+    Reads go through a bounded LRU cache of decoded values. Writes are kept in
+    memory and flushed in batches by a background thread, every
+    `flush_interval` seconds or once `max_pending` keys are waiting. The
+    storages of the same database file share its connection and flusher
+    thread, which flushes at the shortest interval among them. Models are
+    stored as JSON and other values pickled. Call `close()` before exiting to
+    flush the last writes.
+
+    Args:
+        path: The database file, ":memory:" for a temporary database.
+        name: The name of the blackboard, a database holds many blackboards.
+        cache_size: The maximum number of values kept decoded in memory,
+            besides the writes that are not flushed yet.
+        cache_bytes: The maximum approximate bytes of the cached values, so
+            that large values are spilled to disk.
+        flush_interval: The maximum seconds a write waits to be flushed.
+        max_pending: The number of pending writes that triggers a flush.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str = "default",
+        cache_size: int = 1024,
+        cache_bytes: Optional[int] = None,
+        flush_interval: float = 1.0,
+        max_pending: int = 1000,
+    ):
+        self.path = path
+        self.name = name
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._writer = _SQLiteWriter.open(path, flush_interval)
+        self._keys: Dict[str, None] = {}
+        self._types: Dict[str, Tuple[str, str]] = {}
+        with self._writer.lock:
+            rows = self._writer.connection.execute(
+                "SELECT key, module, qualname FROM blackboard WHERE name = ? "
+                "ORDER BY rowid",
+                (name,),
+            ).fetchall()
+        for key, module, qualname in rows:
+            self._keys[key] = None
+            if module is not None:
+                self._types[key] = (module, qualname)
+        self._cache: OrderedDict[str, Any] = OrderedDict()
+        self._cache_sizes: Dict[str, int] = {}
+        self._cached_bytes = 0
+        # Writes not flushed yet and the batch being flushed, _DELETED marks
+        # removed keys.
+        self._pending: Dict[str, Any] = {}
+        self._flushing: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def types(self) -> Dict[str, Tuple[str, str]]:
+        # Updated by the flusher thread.
+        with self._lock:
+            return dict(self._types)
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __getitem__(self, key: str):
+        if key not in self._keys:
+            raise KeyError(key)
+        with self._lock:
+            value = self._pending.get(key, _DELETED)
+            if value is _DELETED:
+                value = self._flushing.get(key, _DELETED)
+        if value is not _DELETED:
+            return value
+        value = self._cache.get(key, _DELETED)
+        if value is not _DELETED:
+            self._cache.move_to_end(key)
+            return value
+        value = self._read(key)
+        self._cache_value(key, value)
+        return value
+
+    def __setitem__(self, key: str, value):
+        self._keys[key] = None
+        self._cache_value(key, value)
+        self._write(key, value)
+
+    def __delitem__(self, key: str):
+        # Never reads the value, unlike `MutableMapping.pop()`.
+        if key not in self._keys:
+            raise KeyError(key)
+        del self._keys[key]
+        self._uncache(key)
+        self._write(key, _DELETED)
+
+    def _write(self, key: str, value):
+        with self._lock:
+            first = not self._pending
+            self._pending[key] = value
+            pending = len(self._pending)
+        if first or pending >= self.max_pending:
+            self._writer.mark_dirty(self, wake=pending >= self.max_pending)
+
+    def _cache_value(self, key: str, value):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        if self.cache_bytes is not None:
+            size = value_size(value)
+            self._cached_bytes += size - self._cache_sizes.get(key, 0)
+            self._cache_sizes[key] = size
+        while len(self._cache) > self.cache_size or (
+            self.cache_bytes is not None and self._cached_bytes > self.cache_bytes
+        ):
+            self._uncache(next(iter(self._cache)))
+
+    def _uncache(self, key: str):
+        self._cache.pop(key, None)
+        if self.cache_bytes is not None:
+            self._cached_bytes -= self._cache_sizes.pop(key, 0)
+
+    def _read(self, key: str):
+        with self._writer.lock:
+            row = self._writer.connection.execute(
+                "SELECT module, qualname, value FROM blackboard "
+                "WHERE name = ? AND key = ?",
+                (self.name, key),
+            ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        module, qualname, value = row
+        if module is None:
+            return pickle.loads(value)
+        return type_adapter(module, qualname).validate_json(value)
+
+    def flush(self):
+        self._writer.flush([self])
+
+    def _take_batch(self) -> Dict[str, Any]:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._flushing = batch
+        return batch
+
+    def _encode(
+        self, batch: Dict[str, Any], upserts: List[tuple], deletes: List[tuple]
+    ):
+        for key, value in batch.items():
+            if value is _DELETED:
+                deletes.append((self.name, key))
+            elif isinstance(value, BaseModel):
+                t = type(value)
+                data = value.model_dump_json().encode()
+                upserts.append((self.name, key, t.__module__, t.__qualname__, data))
+            else:
+                data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                upserts.append((self.name, key, None, None, data))
+
+    def _restore(self, batch: Dict[str, Any]):
+        # Keep the batch pending, unless overwritten in the meantime.
+        with self._lock:
+            self._flushing = {}
+            for key, value in batch.items():
+                self._pending.setdefault(key, value)
+
+    def _flushed(self, batch: Dict[str, Any]):
+        with self._lock:
+            self._flushing = {}
+            for key, value in batch.items():
+                if value is _DELETED or not isinstance(value, BaseModel):
+                    self._types.pop(key, None)
+                else:
+                    t = type(value)
+                    self._types[key] = (t.__module__, t.__qualname__)
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush the pending writes, the database is closed with its last storage."""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        self._writer.release(timeout)
@@ -1,8 +1,8 @@
-import operator
-import time
+import math
 from typing import Callable, Optional
 
 from behavioral.base import Behavior
+from behavioral.blackboard import blackboard_path
 
 
 def check_blackboard_val(
@@ -12,14 +12,10 @@ def check_blackboard_val(
     check: Optional[Callable] = None,
     **kwargs,
 ):
-    value = behavior.conversation_tree.bb.get_value(key, namespace=behavior.namespace)
+    variable = key if attribute is None else f"{key}.{attribute}"
+    value = blackboard_path(variable).get(behavior.blackboard, behavior.namespace)
     if value is None:
         return False
-
-    if attribute is not None:
-        value = operator.attrgetter(attribute)(value)
-        if value is None:
-            return False
     if check is None:
         return bool(value)
     return check(value, **kwargs)
@@ -30,24 +26,17 @@ def get_blackboard_val(
     key: str,
     attribute: Optional[str] = None,
 ):
-    value = behavior.conversation_tree.bb.get_value(key, namespace=behavior.namespace)
-    if value is None:
-        return None
-
-    if attribute is not None:
-        value = operator.attrgetter(attribute)(value)
-        if value is None:
-            return None
-    return value
+    variable = key if attribute is None else f"{key}.{attribute}"
+    return blackboard_path(variable).get(behavior.blackboard, behavior.namespace)
 
 
 def is_user_active(behavior: Behavior, time_since_last_message):
     if len(behavior.conversation_tree.chat_history) == 0:
         return True
-    current_time = time.time()
-    if (
-        current_time - behavior.conversation_tree.last_message_time
-        > time_since_last_message
-    ):
+    current_time = behavior.conversation_tree.clock.time()
+    deadline = behavior.conversation_tree.last_message_time + time_since_last_message
+    if current_time > deadline:
         return False
+    # Just after the deadline, when the user counts as inactive.
+    behavior.conversation_tree.wakeup_at(math.nextafter(deadline, math.inf))
     return True
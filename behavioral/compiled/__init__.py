@@ -0,0 +1,5 @@
+from .compiled_tree import CompiledTree
+
+__all__ = [
+    "CompiledTree",
+]
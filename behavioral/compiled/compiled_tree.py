@@ -0,0 +1,554 @@
+import time
+from typing import Callable, List, Optional
+
+import py_trees
+from py_trees.common import Status
+
+from behavioral import composites, decorators
+from behavioral.base import Behavior
+
+# Node kinds
+LEAF = 0
+BEHAVIOR = 1
+SEQUENCE = 2
+SELECTOR = 3
+PARALLEL = 4
+DECORATOR = 5
+RETRY = 6
+OPAQUE = 7
+LEAVES = (LEAF, BEHAVIOR, OPAQUE)
+
+# How a parent consumes the tick of a child. Sequences and selectors stop
+# iterating a child as soon as it reports a status that decides their own.
+FULL = 0
+SEQUENCE_PARENT = 1
+SELECTOR_PARENT = 2
+
+# Frame phases
+ENTER = 0
+GUARDED = 1
+CHILD = 2
+POST = 3
+
+STATUSES = list(Status)
+
+
+def node_kind(node: py_trees.behaviour.Behaviour) -> int:
+    """Classify a node by the tick implementation it uses.
+
+    Nodes that override `tick` with an implementation unknown to the
+    interpreter are ticked through their generator.
+    """
+    cls = type(node)
+    if isinstance(node, Behavior):
+        if cls.tick is Behavior.tick and cls.guarded_tick is Behavior.guarded_tick:
+            return BEHAVIOR
+        return OPAQUE
+    for kind, extended, base in (
+        (SEQUENCE, composites.Sequence, py_trees.composites.Sequence),
+        (SELECTOR, composites.Selector, py_trees.composites.Selector),
+        (PARALLEL, composites.Parallel, py_trees.composites.Parallel),
+    ):
+        if isinstance(node, extended):
+            if cls.tick is extended.tick and cls.guarded_tick is extended.guarded_tick:
+                return kind
+            return OPAQUE
+        if isinstance(node, base):
+            return kind if cls.tick is base.tick else OPAQUE
+    if isinstance(node, decorators.Retry):
+        return RETRY if cls.tick is decorators.Retry.tick else OPAQUE
+    if isinstance(node, py_trees.decorators.Decorator):
+        return DECORATOR if cls.tick is py_trees.decorators.Decorator.tick else OPAQUE
+    if isinstance(node, py_trees.composites.Composite):
+        return OPAQUE
+    if cls.tick is py_trees.behaviour.Behaviour.tick:
+        return LEAF
+    return OPAQUE
+
+
+def stop(node: py_trees.behaviour.Behaviour, new_status: Status):
+    """`Behaviour.stop()` without formatting the debug log of every call."""
+    if type(node).stop is not py_trees.behaviour.Behaviour.stop:
+        node.stop(new_status)
+        return
+    node.terminate(new_status)
+    node.status = new_status
+    node.iterator = node.tick()
+
+
+def abandons(mode: int, status: Status) -> bool:
+    """True if a parent stops iterating a child that yields this status."""
+    if mode == SEQUENCE_PARENT:
+        return status != Status.SUCCESS
+    if mode == SELECTOR_PARENT:
+        return status == Status.RUNNING or status == Status.SUCCESS
+    return False
+
+
+class CompiledTree:
+    """Tick a behavior tree with a flat iterative interpreter.
+
+    The tree is flattened breadth first into arrays, so that the children of
+    every node occupy a contiguous index range. A tick walks these arrays with
+    an explicit stack instead of nesting one generator per tree level, and
+    restarts requested by exit guards or `Retry` are bounded by
+    `max_reentries` per tick instead of recursing.
+
+    The statuses and the calls to `initialise`, `update` and `terminate` are
+    the same as the ones of the generator based `tick()`. Visitors are run
+    once for every ticked node.
+
+    The tree is recompiled when the conversation tree reports a structure
+    change, or when the number of children of a composite changes.
+
+    Args:
+        root: The root of the tree.
+        conversation_tree: The tree that owns the nodes.
+        max_reentries: The maximum number of restarts in a single tick.
+    """
+
+    def __init__(
+        self,
+        root: py_trees.behaviour.Behaviour,
+        conversation_tree=None,
+        max_reentries: int = 100,
+    ):
+        self.root = root
+        self.conversation_tree = conversation_tree
+        self.max_reentries = max_reentries
+        self.nodes: List[py_trees.behaviour.Behaviour] = []
+        self.kinds: List[int] = []
+        self.extended: List[bool] = []
+        self.child_begin: List[int] = []
+        self.child_end: List[int] = []
+        self.structure_version = None
+        self.reentries = 0
+        self.profiler = None
+        self.logger = py_trees.logging.Logger(self.__class__.__name__)
+        self.compile()
+
+    def compile(self):
+        """Flatten the tree into arrays."""
+        nodes = [self.root]
+        kinds = []
+        extended = []
+        child_begin = []
+        child_end = []
+        i = 0
+        while i < len(nodes):
+            node = nodes[i]
+            kind = node_kind(node)
+            kinds.append(kind)
+            extended.append(hasattr(node, "guarded_tick"))
+            child_begin.append(len(nodes))
+            if kind not in LEAVES:
+                nodes.extend(node.children)
+            child_end.append(len(nodes))
+            i += 1
+        self.nodes = nodes
+        self.kinds = kinds
+        self.extended = extended
+        self.child_begin = child_begin
+        self.child_end = child_end
+        self.index = {id(node): i for i, node in enumerate(nodes)}
+        if self.conversation_tree is not None:
+            self.structure_version = self.conversation_tree.structure_version
+
+    def is_stale(self) -> bool:
+        return (
+            self.conversation_tree is not None
+            and self.structure_version != self.conversation_tree.structure_version
+        )
+
+    def tick(
+        self, visit: Optional[Callable[[py_trees.behaviour.Behaviour], None]] = None
+    ) -> Status:
+        """Tick the tree once and return the status of the root."""
+        if self.is_stale() or self.nodes[0] is not self.root:
+            self.compile()
+        self.reentries = 0
+        incremental = (
+            self.conversation_tree is not None
+            and self.conversation_tree.incremental_tick
+        )
+        self.profiler = (
+            self.conversation_tree.profiler
+            if self.conversation_tree is not None
+            else None
+        )
+        # A frame is
+        # [node index, phase, child position, mode, previous child, start time]
+        stack = [[0, ENTER, 0, FULL, None, None]]
+        while stack:
+            frame = stack[-1]
+            i = frame[0]
+            node = self.nodes[i]
+            kind = self.kinds[i]
+            phase = frame[1]
+
+            if phase == ENTER:
+                if kind in LEAVES:
+                    stack.pop()
+                    self._tick_leaf(node, kind, frame[3], incremental, visit)
+                    if self.is_stale():
+                        self._recompile(stack)
+                    continue
+                if len(node.children) != self.child_end[i] - self.child_begin[i]:
+                    self._recompile(stack)
+                    continue
+                if self.profiler is not None and self.extended[i]:
+                    frame[5] = time.perf_counter()
+                if incremental and self.extended[i]:
+                    settled_status = self.conversation_tree.settled_status(node)
+                    if settled_status is not None:
+                        node.status = settled_status
+                        stack.pop()
+                        self._finish(node, visit, start=frame[5])
+                        continue
+                if kind == DECORATOR or kind == RETRY:
+                    if node.status != Status.RUNNING:
+                        node.initialise()
+                    frame[1] = CHILD
+                    stack.append([self.child_begin[i], ENTER, 0, FULL, None, None])
+                    continue
+                frame[1] = GUARDED
+                phase = GUARDED
+
+            if phase == GUARDED:
+                if self.extended[i] and node.guard is not None:
+                    guard_enter_status = node.guard.check_enter(node)
+                    if guard_enter_status is not None:
+                        node.status = guard_enter_status
+                        node.current_child = node.children[0] if node.children else None
+                        stack.pop()
+                        self._finish(node, visit, incremental, frame[5])
+                        continue
+                if not self._start(node, kind, frame):
+                    frame[1] = POST
+                    continue
+                frame[1] = CHILD
+                if not self._descend(stack, frame, kind, incremental, visit):
+                    frame[1] = POST
+                continue
+
+            if phase == CHILD:
+                if self.is_stale():
+                    self._recompile(stack)
+                if kind == DECORATOR or kind == RETRY:
+                    new_status = self._validate(node, node.update())
+                    if new_status != Status.RUNNING:
+                        node.stop(new_status)
+                    node.status = new_status
+                    if (
+                        kind == RETRY
+                        and new_status == Status.RUNNING
+                        and node.failed_in_this_tick
+                        and self._reenter(node)
+                    ):
+                        frame[1] = ENTER
+                        continue
+                    stack.pop()
+                    self._finish(node, visit)
+                    continue
+                if self._child_done(node, kind, frame) or not self._descend(
+                    stack, frame, kind, incremental, visit
+                ):
+                    frame[1] = POST
+                continue
+
+            # POST
+            if self.extended[i]:
+                if (
+                    kind == SEQUENCE
+                    and node.status == Status.RUNNING
+                    and frame[3] != FULL
+                ):
+                    # The parent stops at the early RUNNING yield of the sequence.
+                    stack.pop()
+                    self._finish(node, visit, incremental, frame[5])
+                    continue
+                if node.guard is not None:
+                    guard_exit_status = node.guard.check_exit(node)
+                    if guard_exit_status == Status.RUNNING:
+                        if self._reenter(node):
+                            frame[1] = GUARDED
+                            continue
+                        node.status = Status.RUNNING
+                    elif guard_exit_status is not None:
+                        node.status = guard_exit_status
+            stack.pop()
+            self._finish(node, visit, incremental, frame[5])
+        return self.root.status
+
+    def _recompile(self, stack):
+        """Recompile in the middle of a tick and remap the stack."""
+        frame_nodes = [self.nodes[frame[0]] for frame in stack]
+        self.compile()
+        for frame, node in zip(stack, frame_nodes):
+            frame[0] = self.index[id(node)]
+
+    def _descend(self, stack, frame, kind, incremental, visit) -> bool:
+        """Tick the children of a composite from the current position.
+
+        Leaves are ticked in place, the first composite child is pushed to the
+        stack. Returns False if the composite is done.
+        """
+        node = self.nodes[frame[0]]
+        if kind == SEQUENCE:
+            mode = SEQUENCE_PARENT
+        elif kind == SELECTOR:
+            mode = SELECTOR_PARENT
+        else:
+            mode = FULL
+        while True:
+            child = self.child_begin[frame[0]] + frame[2]
+            child_kind = self.kinds[child]
+            if child_kind not in LEAVES:
+                stack.append([child, ENTER, 0, mode, None, None])
+                return True
+            self._tick_leaf(self.nodes[child], child_kind, mode, incremental, visit)
+            # Leaves may change the structure of the tree, e.g. ExpandTree.
+            if self.is_stale():
+                self._recompile(stack)
+            if self._child_done(node, kind, frame):
+                return False
+
+    def _start(self, node, kind, frame) -> bool:
+        """Initialise a composite, False if it has no children to tick."""
+        i = frame[0]
+        children = self.nodes[self.child_begin[i] : self.child_end[i]]
+        if kind == SEQUENCE:
+            index = 0
+            if node.status != Status.RUNNING:
+                node.current_child = children[0] if children else None
+                for child in children:
+                    if child.status != Status.INVALID:
+                        stop(child, Status.INVALID)
+                node.initialise()
+            elif node.memory:
+                index = node.children.index(node.current_child)
+            else:
+                node.current_child = children[0] if children else None
+            if not children:
+                node.current_child = None
+                node.stop(Status.SUCCESS)
+                return False
+            frame[2] = index
+            return True
+        if kind == SELECTOR:
+            if node.status != Status.RUNNING:
+                node.current_child = children[0] if children else None
+                node.initialise()
+            if not children:
+                node.current_child = None
+                node.stop(Status.FAILURE)
+                return False
+            index = 0
+            if node.memory:
+                index = node.children.index(node.current_child)
+                for child in children[:index]:
+                    stop(child, Status.INVALID)
+            frame[2] = index
+            frame[4] = node.current_child
+            return True
+        # PARALLEL
+        node.validate_policy_configuration()
+        if node.status != Status.RUNNING:
+            for child in children:
+                if child.status != Status.INVALID:
+                    stop(child, Status.INVALID)
+            node.current_child = None
+            node.initialise()
+        if not children:
+            node.current_child = None
+            node.stop(Status.SUCCESS)
+            return False
+        return self._next_parallel_child(node, frame, 0)
+
+    def _next_parallel_child(self, node, frame, position) -> bool:
+        i = frame[0]
+        begin = self.child_begin[i]
+        count = self.child_end[i] - begin
+        while position < count:
+            child = self.nodes[begin + position]
+            if not (node.policy.synchronise and child.status == Status.SUCCESS):
+                frame[2] = position
+                return True
+            position += 1
+        self._parallel_status(node)
+        return False
+
+    def _child_done(self, node, kind, frame) -> bool:
+        """Handle the status of the ticked child, True if the composite is done."""
+        i = frame[0]
+        begin = self.child_begin[i]
+        end = self.child_end[i]
+        position = frame[2]
+        child = self.nodes[begin + position]
+        if kind == SEQUENCE:
+            if child.status != Status.SUCCESS:
+                node.status = child.status
+                if not node.memory:
+                    for sibling in self.nodes[begin + position + 1 : end]:
+                        if sibling.status != Status.INVALID:
+                            stop(sibling, Status.INVALID)
+                return True
+            if begin + position + 1 < end:
+                node.current_child = self.nodes[begin + position + 1]
+                frame[2] = position + 1
+                return False
+            node.stop(Status.SUCCESS)
+            return True
+        if kind == SELECTOR:
+            if child.status == Status.RUNNING or child.status == Status.SUCCESS:
+                node.current_child = child
+                node.status = child.status
+                previous = frame[4]
+                if previous is None or previous != node.current_child:
+                    passed = False
+                    for sibling in self.nodes[begin:end]:
+                        if passed:
+                            if sibling.status != Status.INVALID:
+                                stop(sibling, Status.INVALID)
+                        passed = True if sibling == node.current_child else passed
+                return True
+            if begin + position + 1 < end:
+                frame[2] = position + 1
+                return False
+            node.status = Status.FAILURE
+            node.current_child = self.nodes[end - 1] if end > begin else None
+            return True
+        # PARALLEL
+        return not self._next_parallel_child(node, frame, position + 1)
+
+    def _parallel_status(self, node):
+        """Set the status of a parallel from its children (see py_trees)."""
+        children = node.children
+        new_status = Status.RUNNING
+        node.current_child = children[-1]
+        failed_child = next(
+            (child for child in children if child.status == Status.FAILURE), None
+        )
+        if failed_child is not None:
+            node.current_child = failed_child
+            new_status = Status.FAILURE
+        elif type(node.policy) is py_trees.common.ParallelPolicy.SuccessOnAll:
+            if all(c.status == Status.SUCCESS for c in children):
+                new_status = Status.SUCCESS
+                node.current_child = children[-1]
+        elif type(node.policy) is py_trees.common.ParallelPolicy.SuccessOnOne:
+            for child in reversed(children):
+                if child.status == Status.SUCCESS:
+                    new_status = Status.SUCCESS
+                    node.current_child = child
+                    break
+        elif type(node.policy) is py_trees.common.ParallelPolicy.SuccessOnSelected:
+            if all(c.status == Status.SUCCESS for c in node.policy.children):
+                new_status = Status.SUCCESS
+                node.current_child = node.policy.children[-1]
+        else:
+            raise RuntimeError(
+                "this parallel has been configured with an unrecognised policy [{}]".format(
+                    type(node.policy)
+                )
+            )
+        if new_status != Status.RUNNING:
+            stop(node, new_status)
+        node.status = new_status
+
+    def _tick_leaf(self, node, kind, mode, incremental, visit) -> Status:
+        if kind == OPAQUE:
+            for ticked in node.tick():
+                if visit is not None:
+                    visit(ticked)
+                if ticked is node and abandons(mode, ticked.status):
+                    break
+            return node.status
+        if kind == LEAF:
+            if node.status != Status.RUNNING:
+                node.initialise()
+            new_status = self._validate(node, node.update())
+            if new_status != Status.RUNNING:
+                stop(node, new_status)
+            node.status = new_status
+            return self._finish(node, visit)
+
+        start = time.perf_counter() if self.profiler is not None else None
+        conversation_tree = getattr(node, "conversation_tree", None)
+        incremental = incremental and conversation_tree is not None
+        if incremental:
+            settled_status = conversation_tree.settled_status(node)
+            if settled_status is not None:
+                node.status = settled_status
+                return self._finish(node, visit, start=start)
+        guard = node.guard
+        while True:
+            if guard is not None:
+                guard_enter_status = guard.check_enter(node)
+                if guard_enter_status is not None:
+                    node.feedback_message = f"guard enter status: {guard_enter_status}"
+                    node.status = guard_enter_status
+                    node.current_child = node.children[0] if node.children else None
+                    break
+            if start is not None:
+                update_start = time.perf_counter()
+            if node.status != Status.RUNNING:
+                node.initialise()
+            new_status = self._validate(node, node.update())
+            if new_status != Status.RUNNING:
+                stop(node, new_status)
+            node.status = new_status
+            if start is not None:
+                self.profiler.record(node, "update", time.perf_counter() - update_start)
+            if new_status == Status.RUNNING and mode != FULL:
+                # The parent stops at the early RUNNING yield of the behavior.
+                break
+            if guard is None:
+                break
+            guard_exit_status = guard.check_exit(node)
+            if guard_exit_status is None:
+                break
+            node.feedback_message = f"guard exit status: {guard_exit_status}"
+            if guard_exit_status == Status.RUNNING:
+                if self._reenter(node):
+                    continue
+                node.status = Status.RUNNING
+                break
+            node.status = guard_exit_status
+            break
+        return self._finish(node, visit, incremental, start)
+
+    def _finish(
+        self,
+        node,
+        visit,
+        incremental: bool = False,
+        start: Optional[float] = None,
+    ) -> Status:
+        if start is not None:
+            self.profiler.record(node, "tick", time.perf_counter() - start)
+        if incremental:
+            self.conversation_tree.record_settled_status(node)
+        if visit is not None:
+            visit(node)
+        return node.status
+
+    def _validate(self, node, new_status) -> Status:
+        if new_status not in STATUSES:
+            self.logger.error(
+                "A behaviour returned an invalid status, setting to INVALID [%s][%s]"
+                % (new_status, node.name)
+            )
+            return Status.INVALID
+        return new_status
+
+    def _reenter(self, node) -> bool:
+        """Count a restart of the node, False if the budget is exhausted."""
+        self.reentries += 1
+        if self.reentries > self.max_reentries:
+            self.logger.error(
+                f"Re-entry budget of {self.max_reentries} exhausted, "
+                f"leaving {node.name} running until the next tick"
+            )
+            return False
+        return True
@@ -7,6 +7,8 @@ from behavioral.guards import BehaviorGuard
 
 
 class Sequence(py_trees.composites.Sequence):
+    pure = True
+
     def __init__(
         self,
         name,
@@ -33,6 +35,15 @@ class Sequence(py_trees.composites.Sequence):
 
     def tick(self) -> Iterator[py_trees.behaviour.Behaviour]:
         self.logger.debug("Sequence.tick()")
+        conversation_tree = getattr(self, "conversation_tree", None)
+        if conversation_tree is None or not (
+            conversation_tree.incremental_tick or conversation_tree.profiler
+        ):
+            yield from self.guarded_tick()
+            return
+        yield from conversation_tree.tick_node(self)
+
+    def guarded_tick(self) -> Iterator[py_trees.behaviour.Behaviour]:
         if self.guard is not None:
             guard_enter_status = self.guard.check_enter(self)
             if guard_enter_status is not None:
@@ -59,7 +70,7 @@ class Sequence(py_trees.composites.Sequence):
 
         # Restart if exit guard is running
         if guard_exit_status == py_trees.common.Status.RUNNING:
-            for node in self.tick():
+            for node in self.guarded_tick():
                 yield node
             return
         self.status = guard_exit_status
@@ -67,6 +78,8 @@ class Sequence(py_trees.composites.Sequence):
 
 
 class Selector(py_trees.composites.Selector):
+    pure = True
+
     def __init__(
         self,
         name,
@@ -93,6 +106,15 @@ class Selector(py_trees.composites.Selector):
 
     def tick(self) -> Iterator[py_trees.behaviour.Behaviour]:
         self.logger.debug("Selector.tick()")
+        conversation_tree = getattr(self, "conversation_tree", None)
+        if conversation_tree is None or not (
+            conversation_tree.incremental_tick or conversation_tree.profiler
+        ):
+            yield from self.guarded_tick()
+            return
+        yield from conversation_tree.tick_node(self)
+
+    def guarded_tick(self) -> Iterator[py_trees.behaviour.Behaviour]:
         if self.guard is not None:
             guard_enter_status = self.guard.check_enter(self)
             if guard_enter_status is not None:
@@ -116,7 +138,7 @@ class Selector(py_trees.composites.Selector):
 
         # Restart if exit guard is running
         if guard_exit_status == py_trees.common.Status.RUNNING:
-            for node in self.tick():
+            for node in self.guarded_tick():
                 yield node
             return
         self.status = guard_exit_status
@@ -124,6 +146,8 @@ class Selector(py_trees.composites.Selector):
 
 
 class Parallel(py_trees.composites.Parallel):
+    pure = True
+
     def __init__(
         self,
         name,
@@ -150,6 +174,15 @@ class Parallel(py_trees.composites.Parallel):
 
     def tick(self) -> Iterator[py_trees.behaviour.Behaviour]:
         self.logger.debug("Parallel.tick()")
+        conversation_tree = getattr(self, "conversation_tree", None)
+        if conversation_tree is None or not (
+            conversation_tree.incremental_tick or conversation_tree.profiler
+        ):
+            yield from self.guarded_tick()
+            return
+        yield from conversation_tree.tick_node(self)
+
+    def guarded_tick(self) -> Iterator[py_trees.behaviour.Behaviour]:
         if self.guard is not None:
             guard_enter_status = self.guard.check_enter(self)
             if guard_enter_status is not None:
@@ -173,7 +206,7 @@ class Parallel(py_trees.composites.Parallel):
 
         # Restart if exit guard is running
         if guard_exit_status == py_trees.common.Status.RUNNING:
-            for node in self.tick():
+            for node in self.guarded_tick():
                 yield node
             return
         self.status = guard_exit_status
@@ -2,14 +2,30 @@
 Conversation package for managing chat-based behavior trees.
 """
 
+from .clock import Clock, SystemClock, VirtualClock
 from .conversation_behaviour_tree import (ChatMessage,
                                           ConversationBehaviourTree,
                                           ConversationState)
 from .idioms import message_until_condition
+from .namespace_policy import NamespacePolicy
+from .profiler import Histogram, TreeProfiler, aggregate_profiles
+from .scheduler import TreeScheduler
+from .tokens import TokenCounter, estimate_tokens, token_window
 
 __all__ = [
     "ConversationBehaviourTree",
     "message_until_condition",
     "ConversationState",
     "ChatMessage",
+    "TreeScheduler",
+    "TreeProfiler",
+    "Histogram",
+    "aggregate_profiles",
+    "Clock",
+    "SystemClock",
+    "VirtualClock",
+    "NamespacePolicy",
+    "TokenCounter",
+    "estimate_tokens",
+    "token_window",
 ]
@@ -0,0 +1,186 @@
+import asyncio
+import heapq
+import itertools
+import selectors
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Coroutine, List, Optional, Tuple
+
+
+class Clock(ABC):
+    """The source of time of conversation trees and their behaviors."""
+
+    @abstractmethod
+    def time(self) -> float:
+        """The current time in seconds, comparable to `time.time()`."""
+        pass
+
+    @abstractmethod
+    async def sleep(self, seconds: float):
+        pass
+
+    @abstractmethod
+    async def wait(self, event: asyncio.Event, timeout: Optional[float]) -> bool:
+        """Wait for the event to be set, False if the timeout expires first."""
+        pass
+
+
+class SystemClock(Clock):
+    """Wall clock time."""
+
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    async def wait(self, event: asyncio.Event, timeout: Optional[float]) -> bool:
+        try:
+            async with asyncio.timeout(timeout):
+                await event.wait()
+        except TimeoutError:
+            return False
+        return True
+
+
+class VirtualClock(Clock):
+    """Simulated time that jumps straight to the next deadline.
+
+    Sleeps and wait timeouts register timers instead of waiting for real time
+    to pass. On the event loop of the clock, see `run()`, whenever the loop is
+    idle, i.e. it has no callback ready to run and no work in its executors,
+    the clock advances to the earliest timer and wakes it up. A simulated
+    conversation thus runs as fast as its behaviors execute. On other event
+    loops the timers only expire with `advance()`.
+
+    Work that waits on the outside world (network calls to real models,
+    threads not started through the executors of the loop) does not keep the
+    loop busy, so simulations should use fake chat models.
+
+    Args:
+        start: The initial time, defaults to the current wall clock time.
+    """
+
+    def __init__(self, start: Optional[float] = None):
+        self.now = time.time() if start is None else start
+        self.timers: List[Tuple[float, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        # The calls running in the executors of the event loop of the clock.
+        self.executor_calls = 0
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        await self._timer(seconds)
+
+    async def wait(self, event: asyncio.Event, timeout: Optional[float]) -> bool:
+        if event.is_set():
+            return True
+        if timeout is None:
+            await event.wait()
+            return True
+        timer = self._timer(timeout)
+        waiter = asyncio.ensure_future(event.wait())
+        try:
+            await asyncio.wait({timer, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            timer.cancel()
+            waiter.cancel()
+        return event.is_set()
+
+    def advance(self, seconds: float):
+        """Move the clock forward and wake up the expired timers."""
+        self.now += seconds
+        self._expire()
+
+    def new_event_loop(self) -> asyncio.AbstractEventLoop:
+        """An event loop that advances the clock whenever it is idle."""
+        return _VirtualEventLoop(self)
+
+    def run(self, main: Coroutine[Any, Any, Any]) -> Any:
+        """Like `asyncio.run()`, on an event loop of the clock."""
+        with asyncio.Runner(loop_factory=self.new_event_loop) as runner:
+            return runner.run(main)
+
+    def _timer(self, seconds: float) -> asyncio.Future:
+        timer = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self.timers, (self.now + max(0.0, seconds), next(self._counter), timer)
+        )
+        return timer
+
+    def _expire(self):
+        while self.timers and self.timers[0][0] <= self.now:
+            _, _, timer = heapq.heappop(self.timers)
+            if not timer.done():
+                timer.set_result(None)
+
+    def _advance_to_next_timer(self) -> bool:
+        """Expire the earliest timers, False if there is none."""
+        # Drop the timers of cancelled sleeps and waits.
+        while self.timers and self.timers[0][2].done():
+            heapq.heappop(self.timers)
+        if not self.timers:
+            return False
+        self.now = max(self.now, self.timers[0][0])
+        self._expire()
+        return True
+
+    def _executor_call_done(self, future: asyncio.Future):
+        self.executor_calls -= 1
+
+
+class _VirtualSelector(selectors.BaseSelector):
+    """A selector that advances a clock instead of blocking an idle loop.
+
+    The event loop blocks in `select()` only when no callback is ready to
+    run, with a timeout of None or until its next real timer.
+    """
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self.selector = selectors.DefaultSelector()
+
+    def register(self, fileobj, events, data=None):
+        return self.selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self.selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self.selector.modify(fileobj, events, data)
+
+    def select(self, timeout: Optional[float] = None):
+        if (
+            (timeout is None or timeout > 0)
+            and not self.clock.executor_calls
+            and self.clock._advance_to_next_timer()
+        ):
+            # The woken up timers scheduled their callbacks.
+            timeout = 0
+        return self.selector.select(timeout)
+
+    def close(self):
+        self.selector.close()
+
+    def get_key(self, fileobj):
+        return self.selector.get_key(fileobj)
+
+    def get_map(self):
+        return self.selector.get_map()
+
+
+class _VirtualEventLoop(asyncio.SelectorEventLoop):
+    """The event loop of a `VirtualClock`, counting its executor calls."""
+
+    def __init__(self, clock: VirtualClock):
+        super().__init__(selector=_VirtualSelector(clock))
+        self.clock = clock
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self.clock.executor_calls += 1
+        # Runs on the loop, next to the callbacks of the awaiting tasks.
+        future.add_done_callback(self.clock._executor_call_done)
+        return future
@@ -1,19 +1,67 @@
 import asyncio
+import heapq
 import threading
 import time
-from typing import Callable, Dict, Literal, Optional
+from typing import (TYPE_CHECKING, Callable, Dict, Iterator, List, Literal,
+                    Optional, Tuple)
 
 import py_trees
 from langchain_core.language_models.chat_models import BaseChatModel
-from pydantic import BaseModel, Field
+from langchain_core.messages import (AIMessage, BaseMessage, HumanMessage,
+                                     SystemMessage)
+from pydantic import BaseModel, Field, PrivateAttr
 
-from behavioral.blackboard import BlackBoard
+from behavioral.blackboard import BlackBoard, BlackBoardEvent
+from behavioral.blackboard.blackboard import ensure_namespace_separator
+from behavioral.conversation.clock import Clock, SystemClock
+from behavioral.conversation.namespace_policy import NamespacePolicy
+from behavioral.conversation.profiler import TreeProfiler
+from behavioral.conversation.tokens import (TokenCounter, estimate_tokens,
+                                            token_window)
+
+if TYPE_CHECKING:
+    from behavioral.utils.state_extraction import StateExtractionBatcher
+    from behavioral.utils.summary import ConversationSummary
+
+
+_LANGCHAIN_MESSAGE_TYPES = {
+    "user": HumanMessage,
+    "assistant": AIMessage,
+    "system": SystemMessage,
+}
 
 
 class ChatMessage(BaseModel):
     content: str
     role: Literal["user", "assistant", "system"] = "assistant"
     metadata: Dict
+    # The token counter, the counted content and its token count.
+    _token_count: Optional[tuple[TokenCounter, str, int]] = PrivateAttr(default=None)
+    _langchain_message: Optional[BaseMessage] = PrivateAttr(default=None)
+
+    def token_count(self, token_counter: TokenCounter = estimate_tokens) -> int:
+        """The number of tokens of the content, counted once per content."""
+        cached = self._token_count
+        if (
+            cached is not None
+            and cached[0] is token_counter
+            and cached[1] is self.content
+        ):
+            return cached[2]
+        count = token_counter(self.content)
+        self._token_count = (token_counter, self.content, count)
+        return count
+
+    def to_langchain_message(self) -> BaseMessage:
+        """The message as a LangChain message, converted once per content."""
+        # Reading private attributes through the model is comparatively slow.
+        private = self.__pydantic_private__
+        cached = private["_langchain_message"]
+        if cached is not None and cached.content is self.content:
+            return cached
+        message = _LANGCHAIN_MESSAGE_TYPES[self.role](content=self.content)
+        private["_langchain_message"] = message
+        return message
 
 
 class ConversationState(BaseModel):
@@ -69,7 +117,49 @@ class ConversationBehaviourTree(py_trees.trees.BehaviourTree):
         capture_state_on_assistant_message: bool = False,
         message_history: int = 10,
         namespace: str = None,
+        incremental_tick: bool = False,
+        compiled_tick: bool = False,
+        clock: Optional[Clock] = None,
+        blackboard: Optional[BlackBoard] = None,
+        namespace_policy: Optional[NamespacePolicy] = None,
+        history_token_budget: Optional[int] = None,
+        token_counter: TokenCounter = estimate_tokens,
+        conversation_summary: Optional["ConversationSummary"] = None,
+        state_extractor: Optional["StateExtractionBatcher"] = None,
     ):
+        """Create a conversation tree.
+
+        Args:
+            incremental_tick: If True, ticks reuse the results of settled pure
+                subtrees (conditions and composites of conditions) and of
+                guards while their inputs are unchanged, so that only the
+                running path is traversed. The inputs are the blackboard, the
+                chat history, the registered deadlines and the structure of
+                the tree, guards must not depend on anything else. While the
+                inputs are unchanged and the behaviors at the running frontier
+                only wait for their tasks, see `Behavior.resumable()`, ticks
+                skip the traversal altogether.
+            compiled_tick: If True, ticks run on a flat iterative interpreter
+                (see `behavioral.compiled.CompiledTree`) instead of nested
+                generators. Restarts of nodes are bounded per tick.
+            clock: The source of time of the tree and its behaviors, defaults
+                to the wall clock. Use a `VirtualClock` to simulate
+                conversations faster than real time.
+            blackboard: The blackboard of the tree, e.g. one persisted in a
+                `SQLiteStorage`. Defaults to an in-memory blackboard.
+            namespace_policy: Evicts the keys of idle namespaces owned by
+                subtrees, see `own_namespace()`.
+            history_token_budget: The maximum tokens of the active chat history,
+                besides the `message_history` messages. Behaviors may set their
+                own budget.
+            token_counter: Counts the tokens of the messages, defaults to an
+                estimate from the length of the text. Pass the tokenizer of
+                the chat model for exact budgets.
+            conversation_summary: Summarizes the messages that slide out of
+                the active chat history, see `summarized_history()`.
+            state_extractor: Combines the state captures of the behaviors
+                into a single model call per turn.
+        """
         super().__init__(
             ConversationBehaviourTree.create_conversation_flow(
                 root=root,
@@ -82,34 +172,257 @@ class ConversationBehaviourTree(py_trees.trees.BehaviourTree):
         self.conversation_state_type = conversation_state_type
         self.capture_state_on_assistant_message = capture_state_on_assistant_message
         self.message_history = message_history
+        self.history_token_budget = history_token_budget
+        self.token_counter = token_counter
+        self.conversation_summary = conversation_summary
+        self.state_extractor = state_extractor
         self.chat_history = []
         self.namespace = namespace
-        self.bb = BlackBoard()
+        self.bb = blackboard if blackboard is not None else BlackBoard()
         self.sleep_event = asyncio.Event()
+        # Set by the ticks during a capture of the conversation state, replies
+        # wait for it. Pinned snapshots only keep the reads of async behaviors
+        # consistent, they do not order them.
         self.capture_state_running = False
+        self.clock = clock if clock is not None else SystemClock()
+        if self.bb.memory_policy is not None and self.bb.memory_policy.clock is None:
+            self.bb.memory_policy.clock = self.clock
         self.tick_lock = threading.Lock()
-        self.last_message_time = time.time()
-        self.start_time = time.time()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.scheduler = None
+        self.deadlines: List[float] = []
+        self.ticking = False
+        self.last_message_time = self.clock.time()
+        self.start_time = self.clock.time()
         self.ticks = 0
+        self.incremental_tick = incremental_tick
+        # Incremented when any input of the tick changes, context_epoch when an
+        # input other than the blackboard changes.
+        self.input_epoch = 0
+        self.context_epoch = 0
+        self.structure_version = 0
+        # The epochs and running frontier of the last tick, if it can resume.
+        self.resume_point: Optional[tuple] = None
+        self._frontier: Optional[List[py_trees.behaviour.Behaviour]] = None
+        self._resumable_epochs: Optional[tuple] = None
+        self._resumable_structure: Optional[Tuple[int, bool]] = None
+        self.resumed_ticks = 0
+        self.compiled_tick = compiled_tick
+        self.compiled_tree = None
+        self.profiler: Optional[TreeProfiler] = None
+        self.wakeup_time: Optional[float] = None
+        self.namespace_owners: Dict[str, py_trees.behaviour.Behaviour] = {}
+        self.namespace_policy = namespace_policy
         self.logger = py_trees.logging.Logger(self.__class__.__name__)
+        self.bb.subscribe(self._on_blackboard_change)
 
     def setup(self) -> None:
         super().setup(namespace=self.namespace, conversation_tree=self)
 
     def add_user_message(self, message: str):
-        self.last_message_time = time.time()
+        self.last_message_time = self.clock.time()
         self.chat_history.append(
             ChatMessage(
                 role="user", content=message, metadata={"time": self.last_message_time}
             )
         )
+        self.input_epoch += 1
+        self.context_epoch += 1
         self.wakeup()
 
     # Multithreaded set event
     def wakeup(self):
+        if self.profiler is not None and self.wakeup_time is None:
+            self.wakeup_time = time.perf_counter()
+        if self.scheduler is not None:
+            self.scheduler.wakeup(self)
+            return
+        if self.loop is None:
+            return
         with self.tick_lock:
             self.loop.call_soon_threadsafe(self.sleep_event.set)
 
+    def wakeup_at(self, deadline: float):
+        """Request a tick at (or shortly after) the given `clock.time()` deadline.
+
+        Time based behaviors call this from their update so that the tree is
+        ticked when their condition may change, instead of relying on polling.
+        """
+        if deadline in self.deadlines:
+            return
+        heapq.heappush(self.deadlines, deadline)
+        if self.scheduler is not None:
+            self.scheduler.schedule(self, deadline)
+        elif not self.ticking:
+            # Wake a sleeping tick loop so that it observes the new deadline.
+            self.wakeup()
+
+    def next_deadline(self) -> Optional[float]:
+        return self.deadlines[0] if self.deadlines else None
+
+    def _expire_deadlines(self, now: float) -> bool:
+        expired = False
+        while self.deadlines and self.deadlines[0] <= now:
+            heapq.heappop(self.deadlines)
+            expired = True
+        return expired
+
+    def _on_blackboard_change(self, event: BlackBoardEvent):
+        self.input_epoch += 1
+        # Writes made while ticking are observed by the tick itself.
+        if not self.ticking:
+            self.wakeup()
+
+    def structure_changed(self):
+        """Notify the tree that behaviors were added or removed."""
+        self.structure_version += 1
+        self.input_epoch += 1
+        self.context_epoch += 1
+        self.collect_namespaces()
+
+    def own_namespace(self, namespace: str, owner: py_trees.behaviour.Behaviour):
+        """Tie the blackboard keys of a namespace to the subtree of `owner`.
+
+        The keys are removed once the owner is no longer part of the tree,
+        e.g. after `RemoveChildren`, or when evicted by the namespace policy.
+        """
+        namespace, _ = ensure_namespace_separator(namespace=namespace)
+        self.namespace_owners[namespace] = owner
+
+    def collect_namespaces(self) -> int:
+        """Remove the keys of the namespaces whose owner left the tree.
+
+        Returns:
+            The number of removed keys.
+        """
+        removed = 0
+        for namespace, owner in list(self.namespace_owners.items()):
+            while owner.parent is not None:
+                owner = owner.parent
+            if owner is not self.root:
+                del self.namespace_owners[namespace]
+                removed += self.bb.remove_namespace(namespace)
+        return removed
+
+    def _evict_namespaces(self, now: float):
+        for namespace in self.namespace_policy.evictions(
+            self.bb, self.namespace_owners, now
+        ):
+            self.logger.debug(f"Evicting namespace {namespace}")
+            self.bb.remove_namespace(namespace)
+
+    def enable_profiling(self) -> TreeProfiler:
+        """Start recording tick timings, see `TreeProfiler`."""
+        if self.profiler is None:
+            self.profiler = TreeProfiler()
+        return self.profiler
+
+    def disable_profiling(self):
+        self.profiler = None
+        self.wakeup_time = None
+
+    def tick_node(
+        self, node: py_trees.behaviour.Behaviour
+    ) -> Iterator[py_trees.behaviour.Behaviour]:
+        """Tick a behavior or composite with incremental reuse and profiling."""
+        if self.incremental_tick:
+            ticks = self._tick_incremental(node)
+        else:
+            ticks = node.guarded_tick()
+        if self.profiler is not None:
+            ticks = self.profiler.profile_tick(node, ticks)
+        yield from ticks
+
+    def _tick_incremental(
+        self, node: py_trees.behaviour.Behaviour
+    ) -> Iterator[py_trees.behaviour.Behaviour]:
+        settled_status = self.settled_status(node)
+        if settled_status is not None:
+            node.status = settled_status
+            yield node
+            return
+        for ticked in node.guarded_tick():
+            if ticked is node:
+                # Parents may stop iterating once they see the status.
+                self.record_settled_status(node)
+            yield ticked
+
+    def is_pure(self, node: py_trees.behaviour.Behaviour) -> bool:
+        """True if ticking the node has no side effects besides its status.
+
+        Behaviors declare this with a `pure` attribute, a composite is pure
+        only if all of its children are pure as well.
+        """
+        cached = getattr(node, "_pure_cache", None)
+        if cached is not None and cached[0] == self.structure_version:
+            return cached[1]
+        pure = getattr(node, "pure", False) and all(
+            self.is_pure(child) for child in node.children
+        )
+        node._pure_cache = (self.structure_version, pure)
+        return pure
+
+    def settled_status(
+        self, node: py_trees.behaviour.Behaviour
+    ) -> Optional[py_trees.common.Status]:
+        """The status of a settled pure node if its inputs did not change."""
+        memo = getattr(node, "_settled_memo", None)
+        if memo is None or memo[0] != self.input_epoch:
+            return None
+        if node.status != memo[1]:
+            # Stopped by its parent, the statuses of the children are reset.
+            return None
+        return memo[1]
+
+    def record_settled_status(self, node: py_trees.behaviour.Behaviour):
+        if node.status == py_trees.common.Status.RUNNING or not self.is_pure(node):
+            node._settled_memo = None
+            if self._frontier is not None and not isinstance(
+                node, py_trees.composites.Composite
+            ):
+                if node.resumable():
+                    self._frontier.append(node)
+                else:
+                    self._frontier = None
+            return
+        node._settled_memo = (self.input_epoch, node.status)
+
+    def is_resumable_structure(self) -> bool:
+        """True if every node reports its ticks, see `record_settled_status()`.
+
+        Only behaviors and the sequences, selectors and parallels that keep
+        their tick implementation do, any other node prevents resuming.
+        """
+        from behavioral.compiled.compiled_tree import (BEHAVIOR, PARALLEL,
+                                                       SELECTOR, SEQUENCE,
+                                                       node_kind)
+
+        cached = self._resumable_structure
+        if cached is not None and cached[0] == self.structure_version:
+            return cached[1]
+        resumable = all(
+            node_kind(node) in (BEHAVIOR, SEQUENCE, SELECTOR, PARALLEL)
+            for node in self.root.iterate()
+        )
+        self._resumable_structure = (self.structure_version, resumable)
+        return resumable
+
+    def can_resume(self) -> bool:
+        """True if a tick would leave every status unchanged.
+
+        That is, if the inputs did not change since the last tick and every
+        non-pure behavior it ticked is still resumable.
+        """
+        resume_point = self.resume_point
+        return (
+            resume_point is not None
+            and resume_point[0] == self.input_epoch
+            and resume_point[1] == self.context_epoch
+            and resume_point[2] == self.structure_version
+            and not self.visitors
+            and all(node.resumable() for node in resume_point[3])
+        )
+
     def get_chat_history(self):
         return self.chat_history
 
@@ -120,21 +433,67 @@ class ConversationBehaviourTree(py_trees.trees.BehaviourTree):
         return self.chat_history[-1].metadata["time"]
 
     def add_assistant_message(self) -> ChatMessage:
-        self.last_message_time = time.time()
+        self.last_message_time = self.clock.time()
         message = ChatMessage(
             role="assistant",
             content="",
             metadata={"time": self.last_message_time, "completed": False},
         )
         self.chat_history.append(message)
+        self.input_epoch += 1
+        self.context_epoch += 1
         return message
 
-    def get_active_chat_history(self):
-        return self.chat_history[-self.message_history :]
+    def get_active_chat_history(
+        self, token_budget: Optional[int] = None
+    ) -> List[ChatMessage]:
+        return self.history_window(self.chat_history, token_budget)
+
+    def history_window(
+        self, messages: List[ChatMessage], token_budget: Optional[int] = None
+    ) -> List[ChatMessage]:
+        """The newest `message_history` messages that fit the token budget.
+
+        Args:
+            messages: The chat history to take the window of.
+            token_budget: The maximum tokens of the window, defaults to
+                `history_token_budget`.
+        """
+        messages = messages[-self.message_history :]
+        if token_budget is None:
+            token_budget = self.history_token_budget
+        if token_budget is None:
+            return messages
+        return token_window(messages, token_budget, self.token_counter)
+
+    async def summarized_history(
+        self,
+        messages: Optional[List[ChatMessage]] = None,
+        token_budget: Optional[int] = None,
+    ) -> Tuple[Optional[str], List[ChatMessage]]:
+        """The summary of the earlier messages and the active chat history.
+
+        Without a `conversation_summary` the summary is None and the history is
+        the `history_window()`. Otherwise the summary may be refreshed in the
+        background, see `ConversationSummary.update()`.
+
+        Args:
+            messages: The chat history, defaults to the whole chat history.
+            token_budget: The maximum tokens of the window, see
+                `history_window()`.
+        """
+        if messages is None:
+            messages = self.chat_history
+        window = self.history_window(messages, token_budget)
+        if self.conversation_summary is None:
+            return None, window
+        return await self.conversation_summary.update(
+            self.chat_model, messages, window
+        )
 
     async def atick_tock(
         self,
-        period_ms: int,
+        period_ms: Optional[int],
         number_of_iterations: int = py_trees.trees.CONTINUOUS_TICK_TOCK,
         pre_tick_handler: Optional[
             Callable[[py_trees.trees.BehaviourTree], None]
@@ -143,6 +502,19 @@ class ConversationBehaviourTree(py_trees.trees.BehaviourTree):
             Callable[[py_trees.trees.BehaviourTree], None]
         ] = None,
     ) -> None:
+        """Tick the tree until interrupted.
+
+        The tree is ticked on every `wakeup()` (user messages, finished async
+        behaviors, blackboard writes from outside a tick) and when a deadline
+        registered with `wakeup_at()` expires.
+
+        Args:
+            period_ms: The maximum time to sleep between ticks. Use None for
+                event driven scheduling, where an idle tree is never ticked.
+            number_of_iterations: The number of ticks to run.
+            pre_tick_handler: Function to execute before ticking.
+            post_tick_handler: Function to execute after ticking.
+        """
         tick_tocks = 0
         self.loop = asyncio.get_running_loop()
         while not self.interrupt_tick_tocking and (
@@ -153,25 +525,132 @@ class ConversationBehaviourTree(py_trees.trees.BehaviourTree):
             try:
                 with self.tick_lock:
                     self.sleep_event.clear()
-                try:
-                    async with asyncio.timeout(period_ms / 1000.0):
-                        await self.sleep_event.wait()
-                except TimeoutError:
-                    pass
+                await self._sleep(period_ms)
             except KeyboardInterrupt:
                 break
             tick_tocks += 1
         self.interrupt_tick_tocking = False
 
+    async def _sleep(self, period_ms: Optional[int]):
+        """Sleep until woken up, the next deadline or the period expires."""
+        timeout = None if period_ms is None else period_ms / 1000.0
+        deadline = self.next_deadline()
+        if deadline is not None:
+            until_deadline = max(0.0, deadline - self.clock.time())
+            if timeout is None or until_deadline < timeout:
+                timeout = until_deadline
+        await self.clock.wait(self.sleep_event, timeout)
+
     def tick(self, pre_tick_handler=None, post_tick_handler=None) -> None:
-        tick_time = time.time()
+        tick_time = self.clock.time()
         self.logger.debug(f"Tick #{self.ticks} seconds: {tick_time - self.start_time}")
-        self.capture_state_running = False
-        super().tick(
-            pre_tick_handler=pre_tick_handler, post_tick_handler=post_tick_handler
-        )
+        if self._expire_deadlines(tick_time):
+            self.input_epoch += 1
+            self.context_epoch += 1
+        profiler = self.profiler
+        if profiler is not None:
+            tick_start = time.perf_counter()
+            if self.wakeup_time is not None:
+                profiler.wakeup_latency.record(tick_start - self.wakeup_time)
+                self.wakeup_time = None
+        self.ticking = True
+        try:
+            if self.bb.memory_policy is not None:
+                self.bb.expire_keys()
+            if self.incremental_tick and self.can_resume():
+                self._resume_tick(pre_tick_handler, post_tick_handler)
+            else:
+                self._full_tick(pre_tick_handler, post_tick_handler)
+            if self.namespace_policy is not None and self.namespace_owners:
+                self._evict_namespaces(tick_time)
+        finally:
+            self.ticking = False
+        if profiler is not None:
+            profiler.tick_duration.record(time.perf_counter() - tick_start)
         self.ticks += 1
 
+    def _full_tick(self, pre_tick_handler=None, post_tick_handler=None) -> None:
+        """Traverse the tree, recording where the next tick can resume."""
+        self.capture_state_running = False
+        self.resume_point = None
+        epochs = (self.input_epoch, self.context_epoch, self.structure_version)
+        repeated = self._resumable_epochs == epochs
+        self._resumable_epochs = None
+        if self.incremental_tick and self.is_resumable_structure():
+            self._frontier = []
+        try:
+            if self.compiled_tick:
+                self._compiled_tick(pre_tick_handler, post_tick_handler)
+            else:
+                super().tick(
+                    pre_tick_handler=pre_tick_handler,
+                    post_tick_handler=post_tick_handler,
+                )
+            if self._frontier is not None:
+                # Writes made while ticking are only seen by the next tick.
+                self._resumable_epochs = epochs
+                # Ticking again still resets the children left behind, e.g.
+                # those before the current child of a selector with memory.
+                # Only the statuses of a repeated tick are final.
+                if repeated:
+                    self.resume_point = epochs + (self._frontier,)
+        finally:
+            self._frontier = None
+
+    def _resume_tick(self, pre_tick_handler=None, post_tick_handler=None) -> None:
+        """A tick at the running frontier, where every behavior still waits.
+
+        Ticking the tree again would only yield the same statuses, so the
+        traversal is skipped and only the tick handlers run.
+        """
+        if pre_tick_handler is not None:
+            pre_tick_handler(self)
+        for handler in self.pre_tick_handlers:
+            handler(self)
+        for handler in self.post_tick_handlers:
+            handler(self)
+        if post_tick_handler is not None:
+            post_tick_handler(self)
+        self.count += 1
+        self.resumed_ticks += 1
+
+    def _compiled_tick(self, pre_tick_handler=None, post_tick_handler=None) -> None:
+        """Same as `BehaviourTree.tick()` on the compiled tree."""
+        from behavioral.compiled import CompiledTree
+
+        if self.compiled_tree is None or self.compiled_tree.root is not self.root:
+            self.compiled_tree = CompiledTree(self.root, conversation_tree=self)
+        if pre_tick_handler is not None:
+            pre_tick_handler(self)
+        for handler in self.pre_tick_handlers:
+            handler(self)
+        for visitor in self.visitors:
+            visitor.initialise()
+
+        visitors = [visitor for visitor in self.visitors if not visitor.full]
+        visit = None
+        if visitors:
+
+            def visit(node):
+                for visitor in visitors:
+                    node.visit(visitor)
+
+        self.compiled_tree.tick(visit=visit)
+
+        full_visitors = [visitor for visitor in self.visitors if visitor.full]
+        if full_visitors:
+            for node in self.root.iterate():
+                for visitor in full_visitors:
+                    node.visit(visitor)
+
+        for visitor in self.visitors:
+            visitor.finalise()
+        for handler in self.post_tick_handlers:
+            handler(self)
+        if post_tick_handler is not None:
+            post_tick_handler(self)
+        self.count += 1
+
     def html_tree(self, max_height: int = None) -> str:
         debug_tree = py_trees.display.xhtml_tree(
             self.root,
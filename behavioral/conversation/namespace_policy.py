@@ -0,0 +1,53 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from behavioral.blackboard import BlackBoard
+
+
+class NamespacePolicy:
+    """Evicts the blackboard keys of idle namespaces owned by subtrees.
+
+    The keys of an owned namespace are always removed once its subtree is
+    removed from the tree, see `ConversationBehaviourTree.own_namespace()`. A
+    policy also evicts the keys of owned namespaces that were not written for
+    `ttl` seconds, and of the least recently written ones beyond
+    `max_namespaces`, even while their subtree is part of the tree.
+
+    Args:
+        ttl: The seconds since the last write after which a namespace is
+            evicted.
+        max_namespaces: The maximum number of owned namespaces holding keys.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_namespaces: int = None):
+        self.ttl = ttl
+        self.max_namespaces = max_namespaces
+        # The namespace version and the time it was first seen.
+        self.last_write: Dict[str, Tuple[int, float]] = {}
+
+    def evictions(
+        self, bb: BlackBoard, namespaces: Iterable[str], now: float
+    ) -> List[str]:
+        """The namespaces to evict at the given `clock.time()`."""
+        last_write = {}
+        for namespace in namespaces:
+            version = bb.get_namespace_version(namespace)
+            if version == 0:
+                # No keys to evict.
+                continue
+            last = self.last_write.get(namespace)
+            if last is None or last[0] != version:
+                last = (version, now)
+            last_write[namespace] = last
+        self.last_write = last_write
+
+        evicted = []
+        if self.ttl is not None:
+            evicted = [ns for ns, (_, t) in last_write.items() if now - t >= self.ttl]
+        if self.max_namespaces is not None:
+            kept = [ns for ns in last_write if ns not in evicted]
+            if len(kept) > self.max_namespaces:
+                kept.sort(key=lambda ns: last_write[ns])
+                evicted += kept[: len(kept) - self.max_namespaces]
+        for namespace in evicted:
+            del self.last_write[namespace]
+        return evicted
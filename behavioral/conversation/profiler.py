@@ -0,0 +1,161 @@
+import time
+from typing import Dict, Hashable, Iterable, Iterator, List, Tuple
+
+import py_trees
+
+
+class Histogram:
+    """A fixed size latency histogram with power of two microsecond buckets.
+
+    Bucket `i` counts the samples in [2^(i-1), 2^i) microseconds, bucket 0
+    the samples below one microsecond and the last bucket everything above.
+    """
+
+    BUCKETS = 32
+
+    def __init__(self):
+        self.counts: List[int] = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        bucket = int(seconds * 1e6).bit_length()
+        self.counts[bucket if bucket < self.BUCKETS else self.BUCKETS - 1] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "Histogram"):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        """The upper bound in seconds of the bucket holding the q-th percentile."""
+        if self.count == 0:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000.0 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000.0,
+            "p95_ms": self.percentile(95) * 1000.0,
+            "p99_ms": self.percentile(99) * 1000.0,
+            "max_ms": self.max * 1000.0,
+        }
+
+
+class TreeProfiler:
+    """Per node tick, update and guard timings of a conversation tree.
+
+    Node timings are keyed by the node id and the phase, one of "tick"
+    (including the children of composites), "update", "guard_enter",
+    "guard_exit" and "queue_wait" (the wait of the chat model calls of async
+    behaviors for the `RateLimiter`). Each node is labelled with its name and
+    its path of names from the root. The tree also records the duration of
+    whole ticks and the latency from `wakeup()` to the next tick.
+
+    Enable it with `ConversationBehaviourTree.enable_profiling()`.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[Hashable, Dict[str, Histogram]] = {}
+        # The name and path of every node.
+        self.labels: Dict[Hashable, Tuple[str, str]] = {}
+        self.tick_duration = Histogram()
+        self.wakeup_latency = Histogram()
+
+    def record(self, node: py_trees.behaviour.Behaviour, phase: str, seconds: float):
+        phases = self.nodes.get(node.id)
+        if phases is None:
+            phases = self.nodes[node.id] = {}
+            self.labels[node.id] = (node.name, self._path(node))
+        histogram = phases.get(phase)
+        if histogram is None:
+            histogram = phases[phase] = Histogram()
+        histogram.record(seconds)
+
+    def profile_tick(
+        self,
+        node: py_trees.behaviour.Behaviour,
+        ticks: Iterator[py_trees.behaviour.Behaviour],
+    ) -> Iterator[py_trees.behaviour.Behaviour]:
+        """Time the tick of a node, excluding the time it is suspended."""
+        elapsed = 0.0
+        try:
+            start = time.perf_counter()
+            for ticked in ticks:
+                elapsed += time.perf_counter() - start
+                yield ticked
+                start = time.perf_counter()
+            elapsed += time.perf_counter() - start
+        finally:
+            # Also runs when the parent stops iterating the tick.
+            self.record(node, "tick", elapsed)
+
+    @staticmethod
+    def _path(node: py_trees.behaviour.Behaviour) -> str:
+        names = []
+        while node is not None:
+            names.append(node.name)
+            node = node.parent
+        return "/".join(reversed(names))
+
+    def merge(self, other: "TreeProfiler", by_path: bool = False):
+        """Add the timings of another profiler.
+
+        Args:
+            by_path: If True, nodes are merged by their path instead of their
+                id, e.g. the same node of trees built alike.
+        """
+        for node_id, phases in other.nodes.items():
+            label = other.labels[node_id]
+            key = label[1] if by_path else node_id
+            self.labels.setdefault(key, label)
+            own_phases = self.nodes.setdefault(key, {})
+            for phase, histogram in phases.items():
+                own_phases.setdefault(phase, Histogram()).merge(histogram)
+        self.tick_duration.merge(other.tick_duration)
+        self.wakeup_latency.merge(other.wakeup_latency)
+
+    def reset(self):
+        self.__init__()
+
+    def to_dict(self) -> Dict:
+        return {
+            "tick_duration": self.tick_duration.to_dict(),
+            "wakeup_latency": self.wakeup_latency.to_dict(),
+            "nodes": {
+                str(key): {
+                    "name": self.labels[key][0],
+                    "path": self.labels[key][1],
+                    "phases": {phase: h.to_dict() for phase, h in phases.items()},
+                }
+                for key, phases in self.nodes.items()
+            },
+        }
+
+
+def aggregate_profiles(profilers: Iterable[TreeProfiler]) -> Dict:
+    """Merge the profiles of many trees, e.g. all the trees of a scheduler.
+
+    The nodes of different trees are merged by path, the sibling nodes of a
+    tree that share their name share an entry too.
+    """
+    total = TreeProfiler()
+    for profiler in profilers:
+        if profiler is not None:
+            total.merge(profiler, by_path=True)
+    return total.to_dict()
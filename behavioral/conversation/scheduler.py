@@ -0,0 +1,210 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+import py_trees
+
+from behavioral.conversation.clock import Clock, SystemClock
+
+
+class TreeScheduler:
+    """Tick many conversation trees from a single asyncio task.
+
+    Trees are ticked only when they are ready: after `wakeup()` (user messages,
+    finished async behaviors, blackboard writes) or when a deadline registered
+    with `wakeup_at()` expires. Ready trees are ticked round-robin in batches,
+    and the scheduler yields to the event loop after every batch so that the
+    async behaviors of the trees can make progress.
+
+    Args:
+        batch_size: The maximum number of trees ticked per batch.
+        batch_budget_ms: The maximum time spent ticking trees per batch.
+        period_ms: If set, every tree is also ticked at least once per period.
+        clock: The source of time of the deadlines, it should be the clock of
+            the scheduled trees. Defaults to the wall clock.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        batch_budget_ms: float = 10.0,
+        period_ms: Optional[int] = None,
+        clock: Optional[Clock] = None,
+    ):
+        self.batch_size = batch_size
+        self.batch_budget_ms = batch_budget_ms
+        self.period_ms = period_ms
+        self.clock = clock if clock is not None else SystemClock()
+        self.trees: Set = set()
+        self.ready: Deque = deque()
+        self.ready_times: Dict = {}
+        self.deadlines: List[Tuple[float, int, object]] = []
+        self.heartbeats: Dict = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wakeup_event: Optional[asyncio.Event] = None
+        self.running = False
+        self._loop_thread: Optional[int] = None
+        self._counter = itertools.count()
+        self.ticks = 0
+        self.batches = 0
+        self.lag_count = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.last_lag = 0.0
+        self.last_batch_size = 0
+        self.last_batch_time = 0.0
+        self.logger = py_trees.logging.Logger(self.__class__.__name__)
+
+    def add_tree(self, tree):
+        """Start scheduling a tree. The tree is ticked on the next batch."""
+        tree.scheduler = self
+        self.trees.add(tree)
+        if self.loop is not None:
+            tree.loop = self.loop
+            self.wakeup(tree)
+
+    def remove_tree(self, tree):
+        """Stop scheduling a tree."""
+        self.trees.discard(tree)
+        self.ready_times.pop(tree, None)
+        self.heartbeats.pop(tree, None)
+        if tree.scheduler is self:
+            tree.scheduler = None
+
+    def wakeup(self, tree):
+        """Mark a tree as ready to tick. Can be called from any thread."""
+        if self.loop is None:
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._make_ready(tree, self.clock.time())
+        else:
+            self.loop.call_soon_threadsafe(self._make_ready, tree, self.clock.time())
+
+    def schedule(self, tree, deadline: float):
+        """Tick a tree when the `clock.time()` deadline expires."""
+        if self.loop is None or threading.get_ident() == self._loop_thread:
+            self._push_deadline(tree, deadline)
+        else:
+            self.loop.call_soon_threadsafe(self._push_deadline, tree, deadline)
+
+    def stop(self):
+        self.running = False
+        if self.wakeup_event is not None:
+            self.wakeup_event.set()
+
+    def queue_depth(self) -> int:
+        return len(self.ready)
+
+    def metrics(self) -> Dict:
+        """Scheduling metrics. Lag is the time a tree waited to be ticked."""
+        return {
+            "trees": len(self.trees),
+            "queue_depth": self.queue_depth(),
+            "deadlines": len(self.deadlines),
+            "ticks": self.ticks,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_time_ms": self.last_batch_time * 1000.0,
+            "last_lag_ms": self.last_lag * 1000.0,
+            "max_lag_ms": self.lag_max * 1000.0,
+            "mean_lag_ms": (
+                self.lag_total / self.lag_count * 1000.0 if self.lag_count else 0.0
+            ),
+        }
+
+    async def run(self):
+        """Tick ready trees until `stop()` is called."""
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self.wakeup_event = asyncio.Event()
+        self.running = True
+        for tree in self.trees:
+            tree.loop = self.loop
+            self._make_ready(tree, self.clock.time())
+        try:
+            while self.running:
+                self._expire_deadlines(self.clock.time())
+                if not self.ready:
+                    await self._sleep()
+                    continue
+                self._tick_batch()
+                # Let the async behaviors started by the batch run.
+                await asyncio.sleep(0)
+        finally:
+            self.running = False
+            self.loop = None
+            self._loop_thread = None
+
+    async def _sleep(self):
+        self.wakeup_event.clear()
+        timeout = None
+        if self.deadlines:
+            timeout = max(0.0, self.deadlines[0][0] - self.clock.time())
+        await self.clock.wait(self.wakeup_event, timeout)
+
+    def _make_ready(self, tree, ready_time: float):
+        if tree not in self.trees or tree in self.ready_times:
+            return
+        self.ready_times[tree] = ready_time
+        self.ready.append(tree)
+        if self.wakeup_event is not None:
+            self.wakeup_event.set()
+
+    def _push_deadline(self, tree, deadline: float):
+        if not self.deadlines or deadline < self.deadlines[0][0]:
+            # The scheduler may be sleeping until a later deadline.
+            if self.wakeup_event is not None:
+                self.wakeup_event.set()
+        heapq.heappush(self.deadlines, (deadline, next(self._counter), tree))
+
+    def _expire_deadlines(self, now: float):
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, _, tree = heapq.heappop(self.deadlines)
+            if self._is_pending(tree, deadline):
+                self._make_ready(tree, deadline)
+
+    def _is_pending(self, tree, deadline: float) -> bool:
+        # Deadlines are not removed when a tree ticks earlier for another
+        # reason, skip the ones that the tree has already handled.
+        if self.heartbeats.get(tree) == deadline:
+            return True
+        next_deadline = tree.next_deadline()
+        return next_deadline is not None and next_deadline <= deadline
+
+    def _tick_batch(self):
+        start = time.perf_counter()
+        budget = self.batch_budget_ms / 1000.0
+        ticked = 0
+        while self.ready and ticked < self.batch_size:
+            tree = self.ready.popleft()
+            ready_time = self.ready_times.pop(tree, None)
+            if ready_time is None:
+                # Removed while waiting in the queue.
+                continue
+            self._record_lag(self.clock.time() - ready_time)
+            try:
+                tree.tick()
+            except Exception as e:
+                self.logger.error(f"Error while ticking tree: {e}")
+            if self.period_ms is not None and tree in self.trees:
+                heartbeat = self.clock.time() + self.period_ms / 1000.0
+                self.heartbeats[tree] = heartbeat
+                self._push_deadline(tree, heartbeat)
+            ticked += 1
+            if time.perf_counter() - start > budget:
+                break
+        self.ticks += ticked
+        self.batches += 1
+        self.last_batch_size = ticked
+        self.last_batch_time = time.perf_counter() - start
+
+    def _record_lag(self, lag: float):
+        lag = max(0.0, lag)
+        self.last_lag = lag
+        self.lag_total += lag
+        self.lag_count += 1
+        self.lag_max = max(self.lag_max, lag)
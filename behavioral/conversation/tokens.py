@@ -0,0 +1,36 @@
+from typing import TYPE_CHECKING, Callable, List, Sequence
+
+if TYPE_CHECKING:
+    from .conversation_behaviour_tree import ChatMessage
+
+# Counts the tokens of a text, e.g. with the tokenizer of the chat model.
+TokenCounter = Callable[[str], int]
+
+
+def estimate_tokens(text: str) -> int:
+    """A rough token count of English text, about four characters per token."""
+    return (len(text) + 3) // 4
+
+
+def token_window(
+    messages: Sequence["ChatMessage"],
+    token_budget: int,
+    token_counter: TokenCounter = estimate_tokens,
+) -> List["ChatMessage"]:
+    """The newest messages whose tokens add up to at most the budget.
+
+    The newest message with content is always included, even when it exceeds
+    the budget on its own, so that there is always something to respond to.
+    Empty messages, i.e. responses still being streamed, do not count.
+    """
+    total = 0
+    start = len(messages)
+    has_content = False
+    while start > 0:
+        message = messages[start - 1]
+        total += message.token_count(token_counter)
+        if total > token_budget and has_content:
+            break
+        has_content = has_content or bool(message.content)
+        start -= 1
+    return list(messages[start:])
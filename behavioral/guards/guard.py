@@ -1,3 +1,5 @@
+import time
+import weakref
 from typing import Callable, Dict, Optional, Union
 
 import py_trees
@@ -52,15 +54,65 @@ class BehaviorGuard:
         self.guard_on_tick_enter = guard_on_tick_enter
         self.guard_on_tick_exit = guard_on_tick_exit
         self.logger = py_trees.logging.Logger(self.__class__.__name__)
+        # Per behavior, the memo of each of the two guards.
+        self._memo: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
 
     def check_enter(self, behavior) -> Union[py_trees.common.Status, None]:
         if self.guard_on_tick_enter is None:
             return None
         self.logger.debug("guard_on_tick_enter.check_all")
-        return self.guard_on_tick_enter.check_all(behavior)
+        return self._check(self.guard_on_tick_enter, behavior, "guard_enter")
 
     def check_exit(self, behavior) -> Union[py_trees.common.Status, None]:
         if self.guard_on_tick_exit is None:
             return None
         self.logger.debug("guard_on_tick_exit.check_all")
-        return self.guard_on_tick_exit.check_all(behavior)
+        return self._check(self.guard_on_tick_exit, behavior, "guard_exit")
+
+    def _check(
+        self, guard: Guard, behavior, phase: str
+    ) -> Union[py_trees.common.Status, None]:
+        conversation_tree = getattr(behavior, "conversation_tree", None)
+        if conversation_tree is None or conversation_tree.profiler is None:
+            return self._check_memoized(guard, behavior, conversation_tree)
+        start = time.perf_counter()
+        status = self._check_memoized(guard, behavior, conversation_tree)
+        conversation_tree.profiler.record(behavior, phase, time.perf_counter() - start)
+        return status
+
+    def _check_memoized(
+        self, guard: Guard, behavior, conversation_tree
+    ) -> Union[py_trees.common.Status, None]:
+        if conversation_tree is None or not conversation_tree.incremental_tick:
+            return guard.check_all(behavior)
+        # Reuse the result while the behavior status, the inputs other than
+        # the blackboard and the versions of the blackboard values that the
+        # guard read are unchanged.
+        bb = conversation_tree.bb
+        memos = self._memo.get(behavior)
+        if memos is None:
+            memos = self._memo[behavior] = {}
+        memo = memos.get(guard)
+        if (
+            memo is not None
+            and memo[0] == conversation_tree.context_epoch
+            and memo[1] == behavior.status
+            and (
+                memo[2] == conversation_tree.input_epoch
+                or bb.versions(memo[3]) == memo[4]
+            )
+        ):
+            return memo[5]
+        status = behavior.status
+        with bb.track_reads() as reads:
+            result = guard.check_all(behavior)
+        reads = list(dict.fromkeys(reads))
+        memos[guard] = (
+            conversation_tree.context_epoch,
+            status,
+            conversation_tree.input_epoch,
+            reads,
+            bb.versions(reads),
+            result,
+        )
+        return result
@@ -1,6 +1,11 @@
 from .langchain_utils import (ainvoke, capture_conversation_state,
                               capture_goal_state, respond_to_user)
-from .prompts import PartialPromptParams
+from .prompts import PartialPromptParams, PromptTemplate, compile_prompt
+from .rate_limiter import Priority, RateLimiter, default_rate_limiter
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight, default_single_flight
+from .state_extraction import StateExtractionBatcher
+from .summary import ConversationSummary
 
 __all__ = [
     "ainvoke",
@@ -8,4 +13,14 @@ __all__ = [
     "capture_goal_state",
     "respond_to_user",
     "PartialPromptParams",
+    "PromptTemplate",
+    "compile_prompt",
+    "ConversationSummary",
+    "Priority",
+    "RateLimiter",
+    "default_rate_limiter",
+    "ResponseCache",
+    "SingleFlight",
+    "default_single_flight",
+    "StateExtractionBatcher",
 ]
@@ -1,29 +1,83 @@
-from typing import List
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Union
 
 import py_trees
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.runnables import RunnableSerializable
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import Runnable, RunnableSerializable
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel
 
 from behavioral.conversation import ChatMessage
 
+from .rate_limiter import Priority, RateLimiter, default_rate_limiter
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
+
 logger = py_trees.logging.Logger(__name__)
 
+RESPOND_TO_USER_INSTRUCTIONS = """
 
-async def ainvoke(
+An external system guides your conversation with the user.
+For your response, you must strictly follow the instructions of the external system, reported as "External system instruction" messages.
+The instructions can be achieved in multiple conversation steps. You don't have to achieve all goals of the instructions in one message.
+Continue the conversation with the user naturally but don't let them drift the conversation from the system instructions.
+Respond only with the content of your message. You are talking to the user directly. Do not repeat your previous messages.
+"""
+
+CAPTURE_STATE_INSTRUCTIONS = """
+You are an expert at capturing/updating the structured state of conversations between users and assistants.
+
+You are distinguished for your attention to detail and for only including structured details that are actually present in the conversation with the user.
+Leave structure fields empty or maintain their previous conversation state value if there is no relative information in the conversation history.
+Do not come up with new data that are not in the conversation or the previous conversation state.
+"""
+
+CAPTURE_GOAL_STATE_INSTRUCTIONS = (
+    CAPTURE_STATE_INSTRUCTIONS
+    + """Make sure to **always** check if the current assistant's goal is achieved or failed.
+"""
+)
+
+SUMMARIZE_INSTRUCTIONS = """
+You are an expert at summarizing conversations between users and assistants.
+
+Update the summary of the conversation with the new assistant/user messages.
+Keep the facts, decisions, open questions and user preferences that may matter later in the conversation, drop small talk.
+Respond only with the updated summary, in at most {max_words} words.
+"""
+
+# The bound chains by the ids of their parts, with the parts kept alive so
+# that their ids are not reused.
+MAX_CACHED_CHAINS = 256
+_chains: "OrderedDict[tuple, tuple[tuple, Runnable]]" = OrderedDict()
+_chains_lock = threading.Lock()
+
+
+def model_name(chat_model: BaseChatModel) -> str:
+    # Not every chat model has a model attribute, e.g. the fake ones.
+    return getattr(chat_model, "model", type(chat_model).__name__)
+
+
+def build_chain(
     chat_model: BaseChatModel,
-    conversation_goal_prompt: str,
-    prompt: str,
-    chat_history: list[ChatMessage],
-    extra_chain_runnables: RunnableSerializable = None,
     tools: List[BaseTool] = None,
+    extra_chain_runnables: RunnableSerializable = None,
     structured_output: type[BaseModel] = None,
-):
-    logger.debug(f"Invoke: {chat_model.model}")
-    model_prompt = [{"role": "system", "content": conversation_goal_prompt}]
-    model_prompt.append(chat_history)
-    model_prompt.append({"role": "system", "content": prompt})
+) -> Runnable:
+    """The chain of a chat model, built once per combination of its parts.
+
+    The parts are told apart by identity, a list of tools by the identity of
+    the tools in it.
+    """
+    tool_ids = None if tools is None else tuple(map(id, tools))
+    key = (id(chat_model), tool_ids, id(extra_chain_runnables), structured_output)
+    with _chains_lock:
+        cached = _chains.get(key)
+        if cached is not None:
+            _chains.move_to_end(key)
+            return cached[1]
     chain = chat_model
     if tools is not None:
         chain = chain.bind_tools(tools)
@@ -31,7 +85,150 @@ async def ainvoke(
         chain = chain | extra_chain_runnables
     if structured_output is not None:
         chain = chain.with_structured_output(structured_output)
-    ret = await chain.ainvoke(str(model_prompt))
+    parts = (chat_model, None if tools is None else tuple(tools), extra_chain_runnables)
+    with _chains_lock:
+        _chains[key] = (parts, chain)
+        while len(_chains) > MAX_CACHED_CHAINS:
+            _chains.popitem(last=False)
+    return chain
+
+
+async def invoke_chain(
+    chain: Runnable,
+    messages: List[BaseMessage],
+    chat_model: BaseChatModel,
+    tools: List[BaseTool] = None,
+    extra_chain_runnables: RunnableSerializable = None,
+    structured_output: type[BaseModel] = None,
+    response_cache: Optional[ResponseCache] = None,
+    single_flight: Optional[SingleFlight] = None,
+    priority: Priority = Priority.BACKGROUND,
+    rate_limiter: RateLimiter = default_rate_limiter,
+):
+    """`chain.ainvoke(messages)`, unless cached or already in flight.
+
+    With a `single_flight`, concurrent identical requests share a single call,
+    e.g. the same call of a behavior restarted while its previous call is
+    still running, or conversations that start the same way. The call waits
+    for the `rate_limiter` with the given priority.
+    """
+    if response_cache is not None:
+        key = ResponseCache.key(
+            chat_model, messages, tools, extra_chain_runnables, structured_output
+        )
+        value = await response_cache.aget(key)
+        if value is not None:
+            return value
+
+    def call():
+        return limited_ainvoke(chain, messages, chat_model, priority, rate_limiter)
+
+    if single_flight is None:
+        value = await call()
+    else:
+        value = await single_flight.run(flight_key(chain, messages), call)
+    if response_cache is not None:
+        response_cache.put(key, value)
+    return value
+
+
+def flight_key(chain: Runnable, messages: List[BaseMessage]) -> tuple:
+    """An in-process key of a call, cheaper to compute than `ResponseCache.key()`.
+
+    The chain is told apart by identity, see `build_chain()`. Plain text
+    messages are told apart by type and content, other messages by identity.
+    """
+    return (id(chain),) + tuple(
+        (m.type, m.content)
+        if isinstance(m.content, str)
+        and not m.additional_kwargs
+        and not getattr(m, "tool_calls", None)
+        and m.type != "tool"
+        else id(m)
+        for m in messages
+    )
+
+
+async def limited_ainvoke(
+    chain: Runnable,
+    messages: List[BaseMessage],
+    chat_model: BaseChatModel,
+    priority: Priority = Priority.BACKGROUND,
+    rate_limiter: RateLimiter = default_rate_limiter,
+):
+    """`chain.ainvoke(messages)` within the limits of `rate_limiter`."""
+    name = model_name(chat_model)
+    async with rate_limiter.limit(name, priority) as wait:
+        logger.debug(f"Queued {priority.name.lower()} call {name} for {wait:.3f}s")
+        return await chain.ainvoke(messages)
+
+
+def to_langchain_messages(
+    messages: Iterable[Union[ChatMessage, BaseMessage]],
+) -> List[BaseMessage]:
+    """The chat history as LangChain messages, without empty messages.
+
+    Empty messages are the assistant messages still being streamed.
+    """
+    converted = []
+    for m in messages:
+        if isinstance(m, ChatMessage):
+            if not m.content:
+                continue
+            m = m.to_langchain_message()
+        converted.append(m)
+    return converted
+
+
+def format_transcript(messages: Iterable[ChatMessage]) -> str:
+    """The chat history as one "role: content" line per message."""
+    return "\n".join(f"{m.role}: {m.content}" for m in messages)
+
+
+def summary_message(summary: str) -> SystemMessage:
+    return SystemMessage(content=f"Summary of the earlier conversation: {summary}")
+
+
+def summary_section(summary: Optional[str]) -> str:
+    if not summary:
+        return ""
+    return f"""
+Summary of the earlier conversation:
+{summary}
+"""
+
+
+async def ainvoke(
+    chat_model: BaseChatModel,
+    conversation_goal_prompt: str,
+    prompt: str,
+    chat_history: list[ChatMessage],
+    extra_chain_runnables: RunnableSerializable = None,
+    tools: List[BaseTool] = None,
+    structured_output: type[BaseModel] = None,
+    summary: Optional[str] = None,
+    response_cache: Optional[ResponseCache] = None,
+    single_flight: Optional[SingleFlight] = None,
+):
+    logger.debug(f"Invoke: {model_name(chat_model)}")
+    # The stable system prefix first, the instruction of the call last.
+    messages = [SystemMessage(content=conversation_goal_prompt)]
+    if summary:
+        messages.append(summary_message(summary))
+    messages += to_langchain_messages(chat_history)
+    messages.append(HumanMessage(content=prompt))
+    chain = build_chain(chat_model, tools, extra_chain_runnables, structured_output)
+    ret = await invoke_chain(
+        chain,
+        messages,
+        chat_model,
+        tools,
+        extra_chain_runnables,
+        structured_output,
+        response_cache,
+        single_flight,
+        priority=Priority.INVOKE,
+    )
     return ret
 
 
@@ -43,41 +240,28 @@ async def respond_to_user(
     chat_history: list,
     extra_chain_runnables: RunnableSerializable = None,
     tools: List[BaseTool] = None,
+    summary: Optional[str] = None,
 ):
-    logger.debug(f"Responding to user {chat_model.model}")
+    logger.debug(f"Responding to user {model_name(chat_model)}")
     messages = [
-        {
-            "role": "system",
-            "content": conversation_goal_prompt
-            + """
-
-An external system guides your conversation with the user.
-For your response, you must strictly follow the instructions of the external system reported as system messages.
-The instructions can be achieved in multiple conversation steps. You don't have to achieve all goals of the instructions in one message.
-Continue the conversation with the user naturally but don't let them drift the conversation from the system instructions.
-Respond only with the content of your message. You are talking to the user directly. Do not repeat your previous messages.
-""",
-        },
+        SystemMessage(content=conversation_goal_prompt + RESPOND_TO_USER_INSTRUCTIONS)
     ]
-    for m in chat_history:
-        messages.append(m)
-
+    if summary:
+        messages.append(summary_message(summary))
+    messages += to_langchain_messages(chat_history)
     messages.append(
-        {
-            "role": "system",
-            "content": f"External system instruction: {current_goal_prompt}",
-        }
+        HumanMessage(content=f"External system instruction: {current_goal_prompt}")
     )
 
-    chain = chat_model
-    if tools is not None:
-        chain = chain.bind_tools(tools)
-    if extra_chain_runnables is not None:
-        chain = chain | extra_chain_runnables
-    async for chunk in chain.astream(str(messages)):
-        response_message.content += chunk.content
+    chain = build_chain(chat_model, tools, extra_chain_runnables)
+    name = model_name(chat_model)
+    # Responses to the user go ahead of the background calls.
+    async with default_rate_limiter.limit(name, Priority.RESPOND) as wait:
+        logger.debug(f"Queued respond call {name} for {wait:.3f}s")
+        async for chunk in chain.astream(messages):
+            response_message.content += chunk.content
     response_message.metadata["completed"] = True
-    logger.debug(f"Responding to user {chat_model.model}")
+    logger.debug(f"Responding to user {model_name(chat_model)}")
     return response_message
 
 
@@ -89,27 +273,24 @@ async def capture_conversation_state(
     state_type: type[BaseModel],
     extra_chain_runnables: RunnableSerializable = None,
     tools: List[BaseTool] = None,
+    summary: Optional[str] = None,
+    response_cache: Optional[ResponseCache] = None,
+    single_flight: Optional[SingleFlight] = None,
 ) -> BaseModel:
     prompt = [
-        {
-            "role": "user",
-            "content": f"""
-You are an expert at capturing/updating the structured state of conversations between users and assistants.
-
-You are distinguished for your attention to detail and for only including structured details that are actually present in the conversation with the user.
-Leave structure fields empty or maintain their previous conversation state value if there is no relative information in the conversation history.
-Do not come up with new data that are not in the conversation or the previous conversation state.
-
+        SystemMessage(content=CAPTURE_STATE_INSTRUCTIONS),
+        HumanMessage(
+            content=f"""{summary_section(summary)}
 Conversation history:
-{chat_history[:-non_captured_messages]}
+{format_transcript(chat_history[:-non_captured_messages])}
 
 Previous conversation state:
 {previous_state.model_dump_json(indent=2) if previous_state else "None"}
 
 New assistant/user messages:
-{chat_history[-non_captured_messages:]}
-        """,
-        }
+{format_transcript(chat_history[-non_captured_messages:])}
+"""
+        ),
     ]
     return await capture_state(
         chat_model=chat_model,
@@ -117,6 +298,8 @@ New assistant/user messages:
         state_type=state_type,
         extra_chain_runnables=extra_chain_runnables,
         tools=tools,
+        response_cache=response_cache,
+        single_flight=single_flight,
     )
 
 
@@ -129,31 +312,27 @@ async def capture_goal_state(
     state_type: type[BaseModel],
     extra_chain_runnables: RunnableSerializable = None,
     tools: List[BaseTool] = None,
+    summary: Optional[str] = None,
+    response_cache: Optional[ResponseCache] = None,
+    single_flight: Optional[SingleFlight] = None,
 ) -> BaseModel:
     prompt = [
-        {
-            "role": "user",
-            "content": f"""
-You are an expert at capturing/updating the structured state of conversations between users and assistants.
-
-You are distinguished for your attention to detail and for only including structured details that are actually present in the conversation with the user.
-Leave structure fields empty or maintain their previous conversation state value if there is no relative information in the conversation history.
-Do not come up with new data that are not in the conversation or the previous conversation state.
-Make sure to **always** check if the current assistant's goal is achieved or failed.
-
-Current assistant conversation goal: 
+        SystemMessage(content=CAPTURE_GOAL_STATE_INSTRUCTIONS),
+        HumanMessage(
+            content=f"""
+Current assistant conversation goal:
 {goal_prompt}
-
+{summary_section(summary)}
 Conversation history:
-{chat_history[:-non_captured_messages]}
+{format_transcript(chat_history[:-non_captured_messages])}
 
 Previous conversation state:
 {previous_state.model_dump_json(indent=2) if previous_state else "None"}
 
 New assistant/user messages:
-{chat_history[-non_captured_messages:]}
-        """,
-        }
+{format_transcript(chat_history[-non_captured_messages:])}
+"""
+        ),
     ]
     return await capture_state(
         chat_model=chat_model,
@@ -161,23 +340,56 @@ New assistant/user messages:
         state_type=state_type,
         extra_chain_runnables=extra_chain_runnables,
         tools=tools,
+        response_cache=response_cache,
+        single_flight=single_flight,
     )
 
 
 async def capture_state(
     chat_model: BaseChatModel,
-    prompt: str,
+    prompt: List[BaseMessage],
     state_type: type[BaseModel],
     extra_chain_runnables: RunnableSerializable = None,
     tools: List[BaseTool] = None,
+    response_cache: Optional[ResponseCache] = None,
+    single_flight: Optional[SingleFlight] = None,
 ) -> BaseModel:
     logger.debug(f"Capturing state prompt {prompt}")
-    chain = chat_model
-    if tools is not None:
-        chain = chain.bind_tools(tools)
-    if extra_chain_runnables is not None:
-        chain = chain | extra_chain_runnables
-    if state_type is not None:
-        chain = chain.with_structured_output(state_type)
-    captured_state = await chain.ainvoke(prompt)
+    chain = build_chain(chat_model, tools, extra_chain_runnables, state_type)
+    captured_state = await invoke_chain(
+        chain,
+        prompt,
+        chat_model,
+        tools,
+        extra_chain_runnables,
+        state_type,
+        response_cache,
+        single_flight,
+    )
     return captured_state
+
+
+async def summarize_conversation(
+    chat_model: BaseChatModel,
+    previous_summary: str,
+    chat_history: list,
+    max_words: int = 200,
+    priority: Priority = Priority.BACKGROUND,
+) -> str:
+    logger.debug(f"Summarizing conversation {model_name(chat_model)}")
+    prompt = [
+        SystemMessage(content=SUMMARIZE_INSTRUCTIONS.format(max_words=max_words)),
+        HumanMessage(
+            content=f"""
+Previous summary:
+{previous_summary if previous_summary else "None"}
+
+New assistant/user messages:
+{format_transcript(chat_history)}
+"""
+        ),
+    ]
+    summary = await limited_ainvoke(
+        build_chain(chat_model), prompt, chat_model, priority
+    )
+    return summary.content
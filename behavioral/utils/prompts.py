@@ -1,4 +1,7 @@
+import _string
+import functools
 import string
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 
 class PartialPromptParams(dict):
@@ -22,3 +25,132 @@ class PartialPromptParams(dict):
         if string_formatter is None:
             string_formatter = string.Formatter()
         return str(string_formatter.vformat(prompt, (), self))
+
+
+_formatter = string.Formatter()
+_MISSING = object()
+
+
+class PromptTemplate:
+    """A prompt parsed once, with the parameters its fields reference.
+
+    Rendering only looks up the referenced parameters and formats the prompt
+    like `PartialPromptParams.format_with_eval()`. With a memo, e.g. one per
+    behavior, the output is reused while the looked up values are the same
+    objects, so values must be replaced rather than mutated in place.
+
+    Args:
+        prompt: The prompt, a `str.format()` string.
+    """
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.eval = "eval_" in prompt
+        # The literal text and the following field, if any, as the parameter,
+        # the attribute and index lookups, the conversion and the format spec.
+        self.parts: List[Tuple[str, Optional[tuple]]] = []
+        # Templates with positional fields or nested fields in format specs
+        # are rendered by string.Formatter and never reused.
+        self.simple = True
+        keys: Dict[str, None] = {}
+        for literal, field_name, format_spec, conversion in _formatter.parse(prompt):
+            field = None
+            if field_name is not None:
+                key, lookups = _string.formatter_field_name_split(field_name)
+                if not isinstance(key, str) or not key or "{" in format_spec:
+                    self.simple = False
+                else:
+                    keys[key] = None
+                    if key.startswith("eval_"):
+                        keys[key.replace("eval_", "")] = None
+                    if "}" in format_spec:
+                        self.simple = False
+                field = (key, tuple(lookups), conversion, format_spec)
+            self.parts.append((literal, field))
+        self.keys: Tuple[str, ...] = tuple(keys)
+
+    def __repr__(self) -> str:
+        return f"PromptTemplate({self.prompt!r})"
+
+    def render(
+        self, params: Mapping[str, Any], memo: Optional[Dict[Any, tuple]] = None
+    ) -> str:
+        """Format the prompt, missing parameters are left as fields.
+
+        Args:
+            params: The parameters by name, only `__getitem__` is used.
+            memo: Where the last output of each template is kept for reuse,
+                none by default.
+        """
+        text = self._render(params, memo, self)
+        if self.eval:
+            # The eval_ fields were replaced by fields to format once more.
+            text = compile_prompt(text)._render(params, memo, (self, "eval"))
+        return text
+
+    def _render(
+        self, params: Mapping[str, Any], memo: Optional[Dict[Any, tuple]], slot
+    ) -> str:
+        if not self.simple:
+            return _LookupParams(params).format(self.prompt)
+        values = tuple(_lookup(params, key) for key in self.keys)
+        # The template, the values of its keys and the output.
+        last = memo.get(slot) if memo is not None else None
+        if (
+            last is not None
+            and last[0] is self
+            and all(a is b for a, b in zip(last[1], values))
+        ):
+            return last[2]
+        found = PartialPromptParams(
+            (k, v) for k, v in zip(self.keys, values) if v is not _MISSING
+        )
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field is None:
+                continue
+            key, lookups, conversion, format_spec = field
+            obj = found[key]
+            for is_attribute, name in lookups:
+                obj = getattr(obj, name) if is_attribute else obj[name]
+            obj = _formatter.convert_field(obj, conversion)
+            out.append(_formatter.format_field(obj, format_spec))
+        text = "".join(out)
+        if memo is not None:
+            memo[slot] = (self, values, text)
+        return text
+
+
+def _lookup(params: Mapping[str, Any], key: str):
+    try:
+        return params[key]
+    except KeyError:
+        return _MISSING
+
+
+class _LookupParams(PartialPromptParams):
+    """`PartialPromptParams` that looks up the missing keys in a mapping."""
+
+    def __init__(self, params: Mapping[str, Any]):
+        super().__init__()
+        self.params = params
+
+    def get(self, key, default=None):
+        if key in self:
+            return dict.__getitem__(self, key)
+        value = _lookup(self.params, key)
+        return default if value is _MISSING else value
+
+    def __missing__(self, key):
+        value = _lookup(self.params, key)
+        if value is _MISSING:
+            return super().__missing__(key)
+        self[key] = value
+        return value
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_prompt(prompt: str) -> PromptTemplate:
+    """The shared `PromptTemplate` of a prompt."""
+    return PromptTemplate(prompt)
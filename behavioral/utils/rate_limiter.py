@@ -0,0 +1,258 @@
+import asyncio
+import contextvars
+import enum
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from behavioral.conversation import Histogram
+
+
+class Priority(enum.IntEnum):
+    """The priority classes of chat model calls, lower goes first."""
+
+    # Responses streamed to the user.
+    RESPOND = 0
+    # Calls whose result the tree waits on, e.g. `AIToBlackboard`.
+    INVOKE = 1
+    # State captures and summaries.
+    BACKGROUND = 2
+
+
+# Called with the queue wait of the calls made in the context, e.g. to record
+# it in the profile of the behavior that makes them.
+queue_wait_observer: contextvars.ContextVar[Optional[Callable[[float], None]]] = (
+    contextvars.ContextVar("queue_wait_observer", default=None)
+)
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """The seconds until a token is available, after refilling."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Waiter:
+    def __init__(self, priority: int, order: int, model: str):
+        self.priority = priority
+        self.order = order
+        self.model = model
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.order) < (other.priority, other.order)
+
+
+class RateLimiter:
+    """Process-wide limits on the chat model calls.
+
+    Calls wait for a free slot among `max_in_flight` and for a token of their
+    model's bucket, refilled at `requests_per_second`. Waiting calls go in
+    order of priority, then of arrival, so that responses to the user go
+    ahead of background state captures. A call whose model is out of tokens
+    does not hold back the calls to other models. The limits can be changed
+    at any time, None means unlimited.
+
+    Args:
+        max_in_flight: The maximum number of concurrent calls, all models
+            included.
+        requests_per_second: The rate of calls per model.
+        burst: The number of calls per model that can start at once after
+            being idle.
+        model_rates: The requests per second of specific models, by name.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        burst: int = 1,
+        model_rates: Optional[Dict[str, float]] = None,
+    ):
+        self.max_in_flight = max_in_flight
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.model_rates = model_rates if model_rates is not None else {}
+        self.in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._order = itertools.count()
+        self._retry: Optional[float] = None
+        self._lock = threading.Lock()
+        self.queue_waits: Dict[Priority, Histogram] = {}
+
+    @asynccontextmanager
+    async def limit(
+        self, model: str, priority: Priority = Priority.BACKGROUND
+    ) -> AsyncIterator[float]:
+        """Hold a slot for a call, yielding the seconds waited for it."""
+        wait = await self.acquire(model, priority)
+        try:
+            yield wait
+        finally:
+            self.release()
+
+    async def acquire(
+        self, model: str, priority: Priority = Priority.BACKGROUND
+    ) -> float:
+        """Wait for a slot for a call, `release()` it once the call is done.
+
+        Returns:
+            The seconds waited in the queue.
+        """
+        start = time.monotonic()
+        waiter = None
+        with self._lock:
+            # Without queued calls, a free slot is taken right away.
+            if not self._grant(model, start):
+                waiter = _Waiter(priority, next(self._order), model)
+                heapq.heappush(self._waiters, waiter)
+                self._dispatch()
+        wait = 0.0
+        if waiter is not None:
+            try:
+                await waiter.future
+            except BaseException:
+                with self._lock:
+                    if waiter.granted:
+                        self._release()
+                    else:
+                        waiter.cancelled = True
+                raise
+            wait = time.monotonic() - start
+        with self._lock:
+            histogram = self.queue_waits.get(priority)
+            if histogram is None:
+                histogram = self.queue_waits[Priority(priority)] = Histogram()
+            histogram.record(wait)
+        observer = queue_wait_observer.get()
+        if observer is not None:
+            observer(wait)
+        return wait
+
+    def _grant(self, model: str, now: float) -> bool:
+        if self._waiters:
+            return False
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            return False
+        bucket = self._bucket(model)
+        if bucket is not None:
+            if bucket.wait_time(now) > 0:
+                return False
+            bucket.tokens -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self._release()
+
+    def _release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _bucket(self, model: str) -> Optional[_TokenBucket]:
+        rate = self.model_rates.get(model, self.requests_per_second)
+        if rate is None:
+            return None
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            bucket = self._buckets[model] = _TokenBucket(rate, self.burst)
+        bucket.rate = rate
+        bucket.capacity = self.burst
+        return bucket
+
+    def _dispatch(self):
+        """Grant the slots that are free, by priority."""
+        now = time.monotonic()
+        limited = []
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.cancelled:
+                heapq.heappop(self._waiters)
+                continue
+            if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+                break
+            heapq.heappop(self._waiters)
+            bucket = self._bucket(waiter.model)
+            if bucket is not None:
+                delay = bucket.wait_time(now)
+                if delay > 0:
+                    limited.append((waiter, delay))
+                    continue
+                bucket.tokens -= 1
+            self.in_flight += 1
+            waiter.granted = True
+            _call_soon(waiter.loop, _set_granted, waiter.future)
+        for waiter, _ in limited:
+            heapq.heappush(self._waiters, waiter)
+        if limited:
+            waiter, delay = min(limited, key=lambda limit: limit[1])
+            self._retry_at(waiter.loop, now + delay)
+
+    def _retry_at(self, loop: asyncio.AbstractEventLoop, when: float):
+        # A single timer, for the earliest bucket refill.
+        if self._retry is not None and self._retry <= when:
+            return
+        self._retry = when
+        _call_soon(
+            loop,
+            lambda: loop.call_later(
+                max(0.0, when - time.monotonic()), self._redispatch
+            ),
+        )
+
+    def _redispatch(self):
+        with self._lock:
+            self._retry = None
+            self._dispatch()
+
+    def metrics(self) -> Dict[str, object]:
+        """The calls in flight and queued, and the queue waits by priority."""
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "queued": sum(not w.cancelled for w in self._waiters),
+                "queue_waits": {
+                    priority.name.lower(): histogram.to_dict()
+                    for priority, histogram in sorted(self.queue_waits.items())
+                },
+            }
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback, *args):
+    # Waking up the loop from another thread costs a write to its self-pipe.
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        loop.call_soon(callback, *args)
+    else:
+        loop.call_soon_threadsafe(callback, *args)
+
+
+def _set_granted(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+# Limits the chat model calls of every conversation in the process, without
+# limits until configured.
+default_rate_limiter = RateLimiter()
@@ -0,0 +1,245 @@
+import asyncio
+import copy
+import functools
+import hashlib
+import json
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel
+
+from behavioral.blackboard.blackboard import type_adapter
+
+# Returned by a lookup that has to read the disk tier.
+_ON_DISK = object()
+
+
+@functools.lru_cache(maxsize=None)
+def _schema(structured_output: type[BaseModel]) -> tuple:
+    return (
+        structured_output.__module__,
+        structured_output.__qualname__,
+        json.dumps(structured_output.model_json_schema(), sort_keys=True),
+    )
+
+
+class ResponseCache:
+    """Responses of chat models by an exact hash of their request.
+
+    The key covers the chat model and its parameters, the messages, the tools,
+    the extra chain runnables and the output schema, so only identical
+    requests share a response. Responses are kept in an LRU in memory and,
+    with a `path`, in a local SQLite database that outlives the process, e.g.
+    to replay conversations and evaluation runs without calling the model.
+    Structured outputs are stored as JSON and other responses pickled.
+
+    Every hit is a copy of the cached response, so callers may modify it.
+    Responses are written to disk by a background thread, use `aget()` to
+    read the disk without blocking the event loop.
+
+    Pass a cache to the behaviors whose calls are deterministic, like
+    `AIToBlackboard` or `CaptureConversationState`, to opt in.
+
+    Args:
+        max_entries: The maximum number of responses kept in memory.
+        path: The database file of the disk tier, none by default.
+    """
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        # The responses not written to disk yet.
+        self._pending: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        # Serializes the use of the connection, taken before `_lock`.
+        self._db_lock = threading.Lock()
+        self._connection = None
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        if path is not None:
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, "
+                "module TEXT, qualname TEXT, value BLOB)"
+            )
+            self._connection.commit()
+            self._thread = threading.Thread(
+                target=self._run, name=f"ResponseCache({path})", daemon=True
+            )
+            self._thread.start()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(
+        chat_model: BaseChatModel,
+        messages: Sequence[BaseMessage],
+        tools: List[BaseTool] = None,
+        extra_chain_runnables: Runnable = None,
+        structured_output: type[BaseModel] = None,
+    ) -> str:
+        """The canonical hash of a request."""
+        request = {
+            "model": [type(chat_model).__name__, chat_model._identifying_params],
+            "messages": [[m.type, m.content] for m in messages],
+        }
+        if tools is not None:
+            request["tools"] = [[t.name, t.description, t.args] for t in tools]
+        if extra_chain_runnables is not None:
+            request["extra_chain_runnables"] = repr(extra_chain_runnables)
+        if structured_output is not None:
+            request["structured_output"] = _schema(structured_output)
+        canonical = json.dumps(request, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, key: str):
+        """The cached response, None if missing."""
+        value = self._lookup(key)
+        if value is _ON_DISK:
+            value = self._read(key)
+        return value
+
+    async def aget(self, key: str):
+        """Like `get()`, reading the disk in a worker thread."""
+        value = self._lookup(key)
+        if value is _ON_DISK:
+            loop = asyncio.get_running_loop()
+            value = await loop.run_in_executor(None, self._read, key)
+        return value
+
+    def put(self, key: str, value):
+        """Cache a copy of the response, written to disk in the background."""
+        if value is None:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, value)
+            if self._connection is not None:
+                self._pending[key] = value
+                self._wake.set()
+
+    def flush(self):
+        """Write the pending responses to disk."""
+        with self._db_lock:
+            with self._lock:
+                pending = list(self._pending.items())
+            if not pending or self._connection is None:
+                return
+            rows = []
+            for key, value in pending:
+                if isinstance(value, BaseModel):
+                    t = type(value)
+                    rows.append(
+                        (key, t.__module__, t.__qualname__, value.model_dump_json())
+                    )
+                else:
+                    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                    rows.append((key, None, None, data))
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", rows
+                )
+            with self._lock:
+                for key, value in pending:
+                    if self._pending.get(key) is value:
+                        del self._pending[key]
+
+    def _lookup(self, key: str):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            else:
+                value = self._pending.get(key)
+            if value is not None:
+                self.memory_hits += 1
+                return copy.deepcopy(value)
+            if self._connection is None:
+                self.misses += 1
+                return None
+            return _ON_DISK
+
+    def _read(self, key: str):
+        with self._db_lock:
+            row = None
+            if self._connection is not None:
+                row = self._connection.execute(
+                    "SELECT module, qualname, value FROM responses WHERE key = ?",
+                    (key,),
+                ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            value = self._decode(*row)
+            self._remember(key, value)
+            self.disk_hits += 1
+            return copy.deepcopy(value)
+
+    def _remember(self, key: str, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Retried with the next response, the rows are still pending.
+                pass
+
+    @staticmethod
+    def _decode(module: Optional[str], qualname: Optional[str], value):
+        if module is None:
+            return pickle.loads(value)
+        return type_adapter(module, qualname).validate_json(value)
+
+    def metrics(self) -> Dict[str, float]:
+        """The hits by tier, misses, hit rate and responses kept in memory."""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def clear(self):
+        """Forget every response, on disk too."""
+        with self._db_lock:
+            with self._lock:
+                self._memory.clear()
+                self._pending.clear()
+            if self._connection is not None:
+                with self._connection:
+                    self._connection.execute("DELETE FROM responses")
+
+    def close(self, timeout: Optional[float] = None):
+        """Write the pending responses and close the database."""
+        if self._thread is not None:
+            self._closed = True
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        with self._db_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,71 @@
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one.
+
+    While a call for a key is in flight, later calls for the same key await
+    a copy of its result instead of calling again, or share its exception. A
+    cancelled caller stops waiting for the call, which is cancelled in turn
+    once none of its callers waits for it anymore. Calls made from different
+    event loops are never coalesced.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, function: Callable[[], Awaitable[Any]]):
+        """Await `function()`, or the call in flight for the same key."""
+        flight = self._in_flight.get(key)
+        coalesced = (
+            flight is not None and flight.task.get_loop() is asyncio.get_running_loop()
+        )
+        if coalesced:
+            self.coalesced += 1
+        else:
+            flight = _Flight(asyncio.ensure_future(function()))
+            self._in_flight[key] = flight
+            self.calls += 1
+            flight.task.add_done_callback(lambda task: self._done(key, flight))
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+            # Every caller may modify the result it gets.
+            return copy.deepcopy(result) if coalesced else result
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Every caller was cancelled, later calls start anew.
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+                flight.task.cancel()
+
+    def _done(self, key: Hashable, flight: _Flight):
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+        if not flight.task.cancelled():
+            # Retrieved, so that a failure nobody awaits anymore is not logged.
+            flight.task.exception()
+
+    def metrics(self) -> Dict[str, int]:
+        """The calls made, the calls saved by coalescing and those in flight."""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+# Coalesces the chat model calls of every conversation in the process that
+# passes it, see `invoke_chain()`.
+default_single_flight = SingleFlight()
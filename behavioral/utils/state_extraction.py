@@ -0,0 +1,296 @@
+import asyncio
+import functools
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableSerializable
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, Field, create_model
+
+from .langchain_utils import (CAPTURE_GOAL_STATE_INSTRUCTIONS, build_chain,
+                              capture_conversation_state, capture_goal_state,
+                              format_transcript, invoke_chain, summary_section)
+from .response_cache import ResponseCache
+from .single_flight import SingleFlight
+
+COMBINED_STATE_INSTRUCTIONS = (
+    CAPTURE_GOAL_STATE_INSTRUCTIONS
+    + """Capture every field of the output as a separate state, following the instructions of its section.
+"""
+)
+
+
+class _StateRequest:
+    def __init__(
+        self,
+        chat_model: BaseChatModel,
+        goal_prompt: Optional[str],
+        chat_history: list,
+        non_captured_messages: int,
+        previous_state: BaseModel,
+        state_type: type[BaseModel],
+        summary: Optional[str],
+        response_cache: Optional[ResponseCache],
+        single_flight: Optional[SingleFlight],
+    ):
+        self.chat_model = chat_model
+        self.goal_prompt = goal_prompt
+        self.chat_history = chat_history
+        self.non_captured_messages = non_captured_messages
+        self.previous_state = previous_state
+        self.state_type = state_type
+        self.summary = summary
+        self.response_cache = response_cache
+        self.single_flight = single_flight
+        self.future: Optional[asyncio.Future] = None
+
+    def description(self) -> str:
+        if self.goal_prompt is None:
+            return "The state of the conversation."
+        return f"The state of the assistant conversation goal: {self.goal_prompt}"
+
+
+@functools.lru_cache(maxsize=128)
+def combined_state_type(
+    fields: Tuple[Tuple[type[BaseModel], str], ...],
+) -> type[BaseModel]:
+    """A model with a `state_<i>` field per state type and description."""
+    return create_model(
+        "CombinedState",
+        **{
+            f"state_{i}": (state_type, Field(description=description))
+            for i, (state_type, description) in enumerate(fields)
+        },
+    )
+
+
+class StateExtractionBatcher:
+    """Combines the state captures of a turn into a single model call.
+
+    The captures of a conversation, like those of `CaptureConversationState`
+    and of every active `ConversationGoal`, start together when a user message
+    arrives: the tasks started by a tick run in the following event loop
+    iterations. The captures requested over the same chat window until the
+    loop runs an iteration without new ones are sent as one call with a
+    combined output schema, and each capture gets its own part of the output.
+    Nothing waits for a timer, so batching adds no latency. A capture alone,
+    or with tools or extra chain runnables, is a call of its own.
+
+    Pass a batcher to `ConversationBehaviourTree` to enable it.
+
+    Args:
+        max_iterations: The maximum event loop iterations to wait for more
+            captures after the first one.
+    """
+
+    def __init__(self, max_iterations: int = 10):
+        self.max_iterations = max_iterations
+        self._pending: Dict[tuple, List[_StateRequest]] = {}
+        self._flushes: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.calls = 0
+
+    async def capture_conversation_state(
+        self,
+        chat_model: BaseChatModel,
+        chat_history: list,
+        non_captured_messages: int,
+        previous_state: BaseModel,
+        state_type: type[BaseModel],
+        extra_chain_runnables: RunnableSerializable = None,
+        tools: List[BaseTool] = None,
+        summary: Optional[str] = None,
+        response_cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+    ) -> BaseModel:
+        """Like `capture_conversation_state()`, possibly combined."""
+        if tools is not None or extra_chain_runnables is not None:
+            self.requests += 1
+            self.calls += 1
+            return await capture_conversation_state(
+                chat_model=chat_model,
+                chat_history=chat_history,
+                non_captured_messages=non_captured_messages,
+                previous_state=previous_state,
+                state_type=state_type,
+                extra_chain_runnables=extra_chain_runnables,
+                tools=tools,
+                summary=summary,
+                response_cache=response_cache,
+                single_flight=single_flight,
+            )
+        return await self._submit(
+            _StateRequest(
+                chat_model=chat_model,
+                goal_prompt=None,
+                chat_history=chat_history,
+                non_captured_messages=non_captured_messages,
+                previous_state=previous_state,
+                state_type=state_type,
+                summary=summary,
+                response_cache=response_cache,
+                single_flight=single_flight,
+            )
+        )
+
+    async def capture_goal_state(
+        self,
+        chat_model: BaseChatModel,
+        goal_prompt: str,
+        chat_history: list,
+        non_captured_messages: int,
+        previous_state: BaseModel,
+        state_type: type[BaseModel],
+        extra_chain_runnables: RunnableSerializable = None,
+        tools: List[BaseTool] = None,
+        summary: Optional[str] = None,
+        response_cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+    ) -> BaseModel:
+        """Like `capture_goal_state()`, possibly combined."""
+        if tools is not None or extra_chain_runnables is not None:
+            self.requests += 1
+            self.calls += 1
+            return await capture_goal_state(
+                chat_model=chat_model,
+                goal_prompt=goal_prompt,
+                chat_history=chat_history,
+                non_captured_messages=non_captured_messages,
+                previous_state=previous_state,
+                state_type=state_type,
+                extra_chain_runnables=extra_chain_runnables,
+                tools=tools,
+                summary=summary,
+                response_cache=response_cache,
+                single_flight=single_flight,
+            )
+        return await self._submit(
+            _StateRequest(
+                chat_model=chat_model,
+                goal_prompt=goal_prompt,
+                chat_history=chat_history,
+                non_captured_messages=non_captured_messages,
+                previous_state=previous_state,
+                state_type=state_type,
+                summary=summary,
+                response_cache=response_cache,
+                single_flight=single_flight,
+            )
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        """The captures requested and the model calls made for them."""
+        return {
+            "requests": self.requests,
+            "calls": self.calls,
+            "saved_calls": self.requests - self.calls,
+        }
+
+    async def _submit(self, request: _StateRequest) -> BaseModel:
+        loop = asyncio.get_running_loop()
+        request.future = loop.create_future()
+        self.requests += 1
+        key = (
+            loop,
+            id(request.chat_model),
+            format_transcript(request.chat_history),
+            request.summary,
+            id(request.response_cache),
+            id(request.single_flight),
+        )
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            flush = loop.create_task(self._flush(key))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+        batch.append(request)
+        return await request.future
+
+    async def _flush(self, key: tuple):
+        batch = self._pending[key]
+        for _ in range(self.max_iterations):
+            size = len(batch)
+            # Lets the other tasks started by the tick request their captures.
+            await asyncio.sleep(0)
+            if len(batch) == size:
+                break
+        del self._pending[key]
+        self.calls += 1
+        try:
+            if len(batch) == 1:
+                results = [await self._capture(batch[0])]
+            else:
+                results = await self._capture_combined(batch)
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        for request, result in zip(batch, results):
+            if not request.future.done():
+                request.future.set_result(result)
+
+    @staticmethod
+    async def _capture(request: _StateRequest) -> BaseModel:
+        kwargs = dict(
+            chat_model=request.chat_model,
+            chat_history=request.chat_history,
+            non_captured_messages=request.non_captured_messages,
+            previous_state=request.previous_state,
+            state_type=request.state_type,
+            summary=request.summary,
+            response_cache=request.response_cache,
+            single_flight=request.single_flight,
+        )
+        if request.goal_prompt is None:
+            return await capture_conversation_state(**kwargs)
+        return await capture_goal_state(goal_prompt=request.goal_prompt, **kwargs)
+
+    @staticmethod
+    async def _capture_combined(batch: List[_StateRequest]) -> List[BaseModel]:
+        first = batch[0]
+        state_type = combined_state_type(
+            tuple((request.state_type, request.description()) for request in batch)
+        )
+        sections = []
+        for i, request in enumerate(batch):
+            goal = ""
+            if request.goal_prompt is not None:
+                goal = (
+                    f"Current assistant conversation goal:\n{request.goal_prompt}\n\n"
+                )
+            previous_state = (
+                request.previous_state.model_dump_json(indent=2)
+                if request.previous_state
+                else "None"
+            )
+            sections.append(
+                f"""
+Section state_{i}:
+{goal}Previous conversation state:
+{previous_state}
+
+New assistant/user messages: the last {request.non_captured_messages} messages of the conversation history.
+"""
+            )
+        prompt = [
+            SystemMessage(content=COMBINED_STATE_INSTRUCTIONS),
+            HumanMessage(
+                content=f"""{summary_section(first.summary)}
+Conversation history:
+{format_transcript(first.chat_history)}
+{"".join(sections)}"""
+            ),
+        ]
+        chain = build_chain(first.chat_model, structured_output=state_type)
+        combined = await invoke_chain(
+            chain,
+            prompt,
+            first.chat_model,
+            structured_output=state_type,
+            response_cache=first.response_cache,
+            single_flight=first.single_flight,
+        )
+        return [getattr(combined, f"state_{i}") for i in range(len(batch))]
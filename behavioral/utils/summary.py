@@ -0,0 +1,107 @@
+import asyncio
+from typing import List, Optional, Sequence, Tuple
+
+import py_trees
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from behavioral.conversation import ChatMessage
+
+from .langchain_utils import summarize_conversation
+from .rate_limiter import Priority
+
+logger = py_trees.logging.Logger(__name__)
+
+
+class ConversationSummary:
+    """A running summary of the messages that slid out of the history window.
+
+    The summary is updated incrementally with the messages before the window,
+    in batches of `batch_messages` messages so that the chat model is not
+    called on every new message. Until a batch is complete, its messages are
+    kept in the window instead. The size of the prompts is thus bounded by the
+    window, the batch and the summary, however long the conversation.
+
+    The summary is refreshed in the background, so that no response waits for
+    it. Until the refresh completes, the previous summary is used and the
+    messages of the batch stay in the window.
+
+    The messages are tracked by their position in the chat history, a summary
+    belongs to a single conversation.
+
+    Args:
+        chat_model: The chat model that summarizes, defaults to the one of the
+            conversation tree.
+        batch_messages: The number of messages summarized at once.
+        max_words: The maximum words of the summary.
+    """
+
+    def __init__(
+        self,
+        chat_model: Optional[BaseChatModel] = None,
+        batch_messages: int = 4,
+        max_words: int = 200,
+    ):
+        self.chat_model = chat_model
+        self.batch_messages = batch_messages
+        self.max_words = max_words
+        self.summary = ""
+        # The number of leading messages of the chat history in the summary.
+        self.summarized = 0
+        self._refresh: Optional[asyncio.Task] = None
+
+    async def update(
+        self,
+        chat_model: BaseChatModel,
+        messages: Sequence[ChatMessage],
+        window: List[ChatMessage],
+    ) -> Tuple[str, List[ChatMessage]]:
+        """Start summarizing the complete batches of messages before the window.
+
+        Args:
+            chat_model: The chat model to use if the summary has none.
+            messages: The chat history, possibly pinned to a shorter length.
+            window: The newest messages of the chat history.
+
+        Returns:
+            The current summary and the messages that follow it, the window
+            extended with the messages before it that are not summarized yet.
+        """
+        start = len(messages) - len(window)
+        end = self.summarized
+        end += (start - end) // self.batch_messages * self.batch_messages
+        if end > self.summarized and (self._refresh is None or self._refresh.done()):
+            self._refresh = asyncio.get_running_loop().create_task(
+                self._summarize(
+                    self.chat_model or chat_model,
+                    list(messages[self.summarized : end]),
+                    end,
+                )
+            )
+        return self.summary, list(messages[min(start, self.summarized) :])
+
+    async def wait(self):
+        """Wait for the refresh of the summary in progress, if any."""
+        if self._refresh is not None:
+            await asyncio.wait({self._refresh})
+
+    async def _summarize(
+        self,
+        chat_model: BaseChatModel,
+        messages: List[ChatMessage],
+        end: int,
+    ):
+        try:
+            summary = await summarize_conversation(
+                chat_model=chat_model,
+                previous_summary=self.summary,
+                chat_history=messages,
+                max_words=self.max_words,
+                # Nothing waits for the refresh, responses go first.
+                priority=Priority.BACKGROUND,
+            )
+        except Exception as e:
+            # Retried on the next update.
+            logger.error(f"Error summarizing conversation: {e}")
+            return
+        self.summary = summary
+        self.summarized = end
@@ -0,0 +1,63 @@
+"""Per turn checkpoints of blackboards with 100, 10k and 100k keys.
+
+Every turn changes 10 keys. A full checkpoint serializes the whole blackboard
+with `to_json()`, a delta checkpoint only the changed keys.
+
+Usage (after `pip install -e .`):
+    python benchmarks/blackboard_checkpoints.py --turns 50
+"""
+
+import argparse
+import time
+
+from behavioral.blackboard import BlackBoard, BlackBoardCheckpointer
+
+CHANGES_PER_TURN = 10
+
+
+def create_blackboard(keys: int) -> BlackBoard:
+    bb = BlackBoard()
+    for i in range(keys):
+        bb.set_value(f"key_{i % 10}", f"value {i}", f"item_{i // 10}")
+    return bb
+
+
+def turn(bb: BlackBoard, keys: int, t: int):
+    for i in range(CHANGES_PER_TURN):
+        j = (t * CHANGES_PER_TURN + i) * 7919 % keys
+        bb.set_value(f"key_{j % 10}", f"turn {t}", f"item_{j // 10}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+
+    for keys in (100, 10000, 100000):
+        bb = create_blackboard(keys)
+        full_time = 0.0
+        for t in range(args.turns):
+            turn(bb, keys, t)
+            start = time.perf_counter()
+            bb.to_json()
+            full_time += time.perf_counter() - start
+
+        bb = create_blackboard(keys)
+        checkpointer = BlackBoardCheckpointer(bb)
+        chain = [checkpointer.checkpoint()[1]]
+        delta_time = 0.0
+        for t in range(args.turns):
+            turn(bb, keys, t)
+            start = time.perf_counter()
+            full, payload = checkpointer.checkpoint()
+            delta_time += time.perf_counter() - start
+            chain = [payload] if full else chain + [payload]
+        assert BlackBoardCheckpointer.restore(chain).to_json() == bb.to_json()
+        print(
+            f"{keys:>6} keys: full {1e3 * full_time / args.turns:8.3f} ms, "
+            f"delta with compaction {1e3 * delta_time / args.turns:8.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Repeated `debug_json()` calls, like the polling of `/api/state` in the demo.
+
+Measures the first call, a repeated call without changes and a call after a
+single write, on blackboards with 1k and 10k model values.
+
+Usage (after `pip install -e .`):
+    python benchmarks/blackboard_debug_json.py --repeat 20
+"""
+
+import argparse
+import time
+from typing import List
+
+from pydantic import BaseModel
+
+from behavioral.blackboard import BlackBoard
+
+
+class Item(BaseModel):
+    name: str
+    quantity: int
+    notes: List[str] = []
+
+
+def timeit(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for keys in (1000, 10000):
+        bb = BlackBoard()
+        for i in range(keys):
+            bb.set_value(
+                f"key_{i % 10}", Item(name=f"item {i}", quantity=i), f"item_{i // 10}"
+            )
+        first_time = timeit(bb.debug_json, 1)
+        cached_time = timeit(bb.debug_json, args.repeat)
+
+        def write_and_poll():
+            bb.set_value("key_0", Item(name="changed", quantity=0), "item_0")
+            bb.debug_json()
+
+        write_time = timeit(write_and_poll, args.repeat)
+        print(
+            f"{keys:>5} keys: first {1e3 * first_time:7.2f} ms, "
+            f"unchanged {1e3 * cached_time:7.3f} ms, "
+            f"after a write {1e3 * write_time:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Namespace listing and extraction on blackboards with 10, 1k and 100k keys.
+
+Every namespace holds 10 keys, like the namespaces created by `ExpandTree`.
+The linear scan is the lookup used before the namespace index.
+
+Usage (after `pip install -e .`):
+    python benchmarks/blackboard_namespaces.py --repeat 100
+"""
+
+import argparse
+import time
+
+from behavioral.blackboard import BlackBoard
+from behavioral.blackboard.blackboard import ensure_namespace_separator
+
+KEYS_PER_NAMESPACE = 10
+
+
+def scan_to_dict(bb: BlackBoard, namespace: str):
+    namespace, _ = ensure_namespace_separator(namespace=namespace)
+    return {
+        k.removeprefix(namespace): v
+        for k, v in bb._bb.data.items()
+        if k.startswith(namespace)
+    }
+
+
+def create_blackboard(keys: int) -> BlackBoard:
+    bb = BlackBoard()
+    for i in range(keys):
+        bb.set_value(
+            f"key_{i % KEYS_PER_NAMESPACE}", i, f"item_{i // KEYS_PER_NAMESPACE}"
+        )
+    return bb
+
+
+def timeit(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    for keys in (10, 1000, 100000):
+        start = time.perf_counter()
+        bb = create_blackboard(keys)
+        set_time = (time.perf_counter() - start) / keys
+        namespace = f"item_{(keys - 1) // KEYS_PER_NAMESPACE}"
+        assert bb.to_dict(namespace) == scan_to_dict(bb, namespace)
+        keys_time = timeit(lambda: bb.keys(namespace), args.repeat)
+        to_dict_time = timeit(lambda: bb.to_dict(namespace), args.repeat)
+        scan_time = timeit(lambda: scan_to_dict(bb, namespace), args.repeat)
+        print(
+            f"{keys:>6} keys: set_value {1e6 * set_time:6.2f} us, "
+            f"keys {1e6 * keys_time:7.2f} us, "
+            f"to_dict {1e6 * to_dict_time:7.2f} us, "
+            f"linear scan to_dict {1e6 * scan_time:9.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Rehydration of many conversation blackboards from their snapshots.
+
+Compares `from_json()` with the binary `from_bytes()`, eager and lazy. The
+lazy load then reads a single model, like a conversation resumed for a turn.
+
+Usage (after `pip install -e .`):
+    python benchmarks/blackboard_snapshots.py --conversations 1000
+"""
+
+import argparse
+import time
+from typing import List
+
+from pydantic import BaseModel
+
+from behavioral.blackboard import BlackBoard
+
+KEYS_PER_CONVERSATION = 50
+
+
+class Item(BaseModel):
+    name: str
+    quantity: int
+    notes: List[str] = []
+
+
+def create_blackboard(conversation: int) -> BlackBoard:
+    bb = BlackBoard()
+    for i in range(KEYS_PER_CONVERSATION):
+        if i % 2:
+            value = Item(name=f"item {i}", quantity=conversation, notes=["a", "b"])
+        else:
+            value = f"value {i}"
+        bb.set_value(f"key_{i % 10}", value, f"item_{i // 10}")
+    return bb
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=1000)
+    args = parser.parse_args()
+
+    blackboards = [create_blackboard(i) for i in range(args.conversations)]
+    json_snapshots = [bb.to_json() for bb in blackboards]
+    binary_snapshots = [bb.to_bytes() for bb in blackboards]
+
+    start = time.perf_counter()
+    for types, data in json_snapshots:
+        BlackBoard().from_json(types, data)
+    json_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for snapshot in binary_snapshots:
+        BlackBoard().from_bytes(snapshot)
+    binary_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for snapshot in binary_snapshots:
+        BlackBoard().from_bytes(snapshot, lazy=True).get_value("key_1", "item_0")
+    lazy_time = time.perf_counter() - start
+
+    json_size = sum(len(types) + len(data) for types, data in json_snapshots)
+    binary_size = sum(len(snapshot) for snapshot in binary_snapshots)
+    print(
+        f"{args.conversations} conversations, {KEYS_PER_CONVERSATION} keys each\n"
+        f"from_json        {json_time:7.3f} s, {json_size / 1e6:6.2f} MB\n"
+        f"from_bytes       {binary_time:7.3f} s, {binary_size / 1e6:6.2f} MB\n"
+        f"from_bytes lazy  {lazy_time:7.3f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""A blackboard persisted in SQLite, compared with the in-memory one.
+
+Writes are flushed in the background, so `set_value` stays in memory. Reads
+of recently used keys hit the cache, the others are loaded from SQLite.
+
+Usage (after `pip install -e .`):
+    python benchmarks/blackboard_sqlite.py --keys 10000 --cache-size 256
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from pydantic import BaseModel
+
+from behavioral.blackboard import BlackBoard, SQLiteStorage
+
+
+class Item(BaseModel):
+    name: str
+    quantity: int
+    notes: List[str] = []
+
+
+def run(bb: BlackBoard, keys: int, hot: int):
+    start = time.perf_counter()
+    for i in range(keys):
+        bb.set_value(
+            f"key_{i % 10}", Item(name=f"item {i}", quantity=i), f"item_{i // 10}"
+        )
+    set_time = (time.perf_counter() - start) / keys
+    start = time.perf_counter()
+    bb.flush()
+    flush_time = time.perf_counter() - start
+
+    random.seed(0)
+    hot_keys = [random.randrange(keys - hot, keys) for _ in range(keys)]
+    cold_keys = [random.randrange(keys) for _ in range(keys)]
+    timings = []
+    for indices in (hot_keys, cold_keys):
+        start = time.perf_counter()
+        for i in indices:
+            bb.get_value(f"key_{i % 10}", f"item_{i // 10}")
+        timings.append((time.perf_counter() - start) / keys)
+    return set_time, flush_time, timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--cache-size", type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteStorage(
+            os.path.join(directory, "blackboard.db"), cache_size=args.cache_size
+        )
+        for name, bb in (("memory", BlackBoard()), ("sqlite", BlackBoard(storage))):
+            set_time, flush_time, (hot_time, cold_time) = run(
+                bb, args.keys, args.cache_size
+            )
+            print(
+                f"{name}: set_value {1e6 * set_time:6.2f} us, "
+                f"flush {1e3 * flush_time:7.2f} ms, "
+                f"get_value cached {1e6 * hot_time:6.2f} us, "
+                f"uncached {1e6 * cold_time:6.2f} us"
+            )
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Tick time of generator and compiled ticking on 100, 1k and 10k node trees.
+
+Usage (after `pip install -e .`):
+    python benchmarks/compiled_tree.py --ticks 50
+"""
+
+import argparse
+import operator
+import time
+
+import py_trees
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from py_trees.common import ComparisonExpression
+
+from behavioral.behaviors import CheckBlackboardVariableValue
+from behavioral.composites import Parallel, Selector, Sequence
+from behavioral.conversation import ConversationBehaviourTree
+
+CHECKS_PER_SEQUENCE = 8
+SEQUENCES_PER_SELECTOR = 10
+
+
+def create_sequence(name: str) -> Sequence:
+    # Every check succeeds except the last one, so all of them are ticked.
+    checks = [
+        CheckBlackboardVariableValue(
+            f"{name}_check_{i}",
+            ComparisonExpression("flag", i < CHECKS_PER_SEQUENCE - 1, operator.eq),
+        )
+        for i in range(CHECKS_PER_SEQUENCE)
+    ]
+    return Sequence(name, memory=False, children=checks)
+
+
+def create_tree(nodes: int, compiled_tick: bool) -> ConversationBehaviourTree:
+    sequences = max(1, nodes // (CHECKS_PER_SEQUENCE + 1))
+    selectors = [
+        Selector(
+            f"selector_{i}",
+            memory=False,
+            children=[
+                create_sequence(f"sequence_{i}_{j}")
+                for j in range(
+                    min(SEQUENCES_PER_SELECTOR, sequences - i * SEQUENCES_PER_SELECTOR)
+                )
+            ],
+        )
+        for i in range(0, (sequences - 1) // SEQUENCES_PER_SELECTOR + 1)
+    ]
+    root = Parallel(
+        "root",
+        policy=py_trees.common.ParallelPolicy.SuccessOnAll(synchronise=False),
+        children=selectors,
+    )
+    tree = ConversationBehaviourTree(
+        root=root,
+        conversation_goal_prompt="",
+        chat_model=FakeListChatModel(responses=["ok"]),
+        compiled_tick=compiled_tick,
+    )
+    tree.setup()
+    tree.bb.set_value("flag", True)
+    return tree
+
+
+def run(nodes: int, ticks: int, compiled_tick: bool):
+    tree = create_tree(nodes, compiled_tick)
+    tree.tick()
+    start = time.perf_counter()
+    for _ in range(ticks):
+        tree.tick()
+    elapsed = time.perf_counter() - start
+    statuses = [node.status for node in tree.root.iterate()]
+    return elapsed / ticks, len(statuses), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ticks", type=int, default=50)
+    args = parser.parse_args()
+    py_trees.logging.level = py_trees.logging.Level.WARN
+
+    for nodes in (100, 1000, 10000):
+        generator_time, count, generator_statuses = run(nodes, args.ticks, False)
+        compiled_time, _, compiled_statuses = run(nodes, args.ticks, True)
+        assert generator_statuses == compiled_statuses
+        print(
+            f"{count:>6} nodes: generator {1000 * generator_time:8.3f} ms/tick, "
+            f"compiled {1000 * compiled_time:8.3f} ms/tick, "
+            f"speedup {generator_time / compiled_time:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""CPU cost of idle conversations with periodic and event driven ticking.
+
+Usage (after `pip install -e .`):
+    python benchmarks/idle_conversations.py --conversations 1000 --seconds 5
+"""
+
+import argparse
+import asyncio
+import time
+
+import py_trees
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from behavioral.behaviors import ConversationMessage
+from behavioral.checks import is_user_active
+from behavioral.composites import Sequence
+from behavioral.conversation import ConversationBehaviourTree
+from behavioral.guards import BehaviorGuard, Guard
+
+
+def create_tree() -> ConversationBehaviourTree:
+    respond_to_inactivity = ConversationMessage(
+        "respond_to_inactivity",
+        "The user was inactive in the conversation.",
+        respond_without_user_message=True,
+        guard=BehaviorGuard(
+            guard_on_tick_enter=Guard(
+                success_check=is_user_active,
+                success_check_kwargs={"time_since_last_message": 3600},
+            ),
+        ),
+    )
+    respond = ConversationMessage("respond", "Respond to the user.")
+    root = Sequence("root", memory=False, children=[respond_to_inactivity, respond])
+    tree = ConversationBehaviourTree(
+        root=root,
+        conversation_goal_prompt="",
+        chat_model=FakeListChatModel(responses=["ok"]),
+    )
+    tree.setup()
+    return tree
+
+
+async def run(conversations: int, seconds: float, period_ms) -> tuple[float, int]:
+    trees = [create_tree() for _ in range(conversations)]
+    for tree in trees:
+        # Give every conversation some history so the inactivity check is active.
+        tree.add_user_message("hello")
+        tree.add_assistant_message()
+    start = time.process_time()
+    tasks = [
+        asyncio.create_task(tree.atick_tock(period_ms=period_ms)) for tree in trees
+    ]
+    await asyncio.sleep(seconds)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return time.process_time() - start, sum(tree.ticks for tree in trees)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--period-ms", type=int, default=100)
+    args = parser.parse_args()
+    py_trees.logging.level = py_trees.logging.Level.WARN
+
+    for name, period_ms in [("periodic", args.period_ms), ("event driven", None)]:
+        cpu, ticks = asyncio.run(run(args.conversations, args.seconds, period_ms))
+        per_conversation_ms = 1000 * cpu / args.conversations / args.seconds
+        print(
+            f"{name:>13}: {ticks:>8} ticks, "
+            f"{per_conversation_ms:.4f} CPU ms per idle conversation per second"
+        )
+
+
+if __name__ == "__main__":
+    main()
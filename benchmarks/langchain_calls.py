@@ -0,0 +1,105 @@
+"""Per call overhead of `ainvoke()` against a fake chat model.
+
+Compares building the chain on every call and sending the stringified message
+list, like before chains were cached, with `ainvoke()`, which reuses the bound
+chain and sends typed messages. Also reports the characters sent per call.
+The two are timed in alternating rounds, keeping the fastest round of each,
+so that noise from the rest of the machine affects both alike.
+
+Usage (after `pip install -e .`):
+    python benchmarks/langchain_calls.py --calls 200 --rounds 10 --history 20
+"""
+
+import argparse
+import asyncio
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.tools import tool
+
+from behavioral.conversation import ChatMessage
+from behavioral.utils import ainvoke
+from behavioral.utils.langchain_utils import to_langchain_messages
+
+
+class FakeToolChatModel(FakeListChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[t.name for t in tools], **kwargs)
+
+
+@tool
+def add(a: int, b: int) -> int:
+    """Add two numbers."""
+    return a + b
+
+
+async def ainvoke_uncached(
+    chat_model, conversation_goal_prompt, prompt, chat_history, tools
+):
+    model_prompt = [{"role": "system", "content": conversation_goal_prompt}]
+    model_prompt.append(chat_history)
+    model_prompt.append({"role": "system", "content": prompt})
+    chain = chat_model.bind_tools(tools)
+    return await chain.ainvoke(str(model_prompt)), len(str(model_prompt))
+
+
+async def timeit(function, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        await function()
+    return (time.perf_counter() - start) / calls
+
+
+async def fastest_rounds(functions, calls: int, rounds: int) -> list:
+    """The fastest per call time of each function, timed in alternating rounds."""
+    for function in functions:
+        await timeit(function, calls)
+    times = [float("inf")] * len(functions)
+    for _ in range(rounds):
+        for i, function in enumerate(functions):
+            times[i] = min(times[i], await timeit(function, calls))
+    return times
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--history", type=int, default=20)
+    args = parser.parse_args()
+
+    chat_model = FakeToolChatModel(responses=["ok"])
+    tools = [add]
+    goal = "You are a helpful assistant that books restaurant tables."
+    prompt = "Decide which tool to call next."
+    chat_history = [
+        ChatMessage(
+            role="user" if i % 2 == 0 else "assistant",
+            content=f"Message {i} about the booking of a table for two.",
+            metadata={"time": float(i), "completed": True},
+        )
+        for i in range(args.history)
+    ]
+
+    async def uncached():
+        return await ainvoke_uncached(chat_model, goal, prompt, chat_history, tools)
+
+    async def cached():
+        return await ainvoke(chat_model, goal, prompt, chat_history, tools=tools)
+
+    uncached_time, cached_time = await fastest_rounds(
+        [uncached, cached], args.calls, args.rounds
+    )
+    _, uncached_chars = await uncached()
+    cached_chars = len(goal) + len(prompt)
+    cached_chars += sum(len(m.content) for m in to_langchain_messages(chat_history))
+    print(
+        f"{args.history} messages: rebuilt chain and str(messages) "
+        f"{1e6 * uncached_time:7.1f} us, {uncached_chars} chars; "
+        f"cached chain and typed messages {1e6 * cached_time:7.1f} us, "
+        f"{cached_chars} chars"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""Repeated `Behavior.format_prompt()` calls on a large blackboard.
+
+Compares formatting from the blackboard dicts, like before prompts were
+compiled, with rendering a compiled `PromptTemplate` while nothing changes and
+after a write to a referenced key.
+
+Usage (after `pip install -e .`):
+    python benchmarks/prompt_templates.py --keys 1000 --repeat 1000
+"""
+
+import argparse
+import time
+from typing import List
+
+from pydantic import BaseModel
+
+from behavioral.base import Behavior
+from behavioral.blackboard import BlackBoard
+from behavioral.utils import PartialPromptParams
+
+PROMPT = (
+    "You are helping {user_name} with their order of {order.quantity} "
+    "{order.name}. Known topics: {conversation_state.topics}. {eval_goal_key}"
+)
+
+
+class Order(BaseModel):
+    name: str
+    quantity: int
+
+
+class ConversationState(BaseModel):
+    topics: List[str] = []
+
+
+class FormatBehavior(Behavior):
+    def update(self):
+        pass
+
+
+def timeit(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    bb = BlackBoard()
+    for i in range(args.keys):
+        bb.set_value(f"key_{i}", Order(name=f"item {i}", quantity=i), f"ns_{i % 10}")
+    namespace = "/conversation"
+    bb.set_value("user_name", "Alice", namespace)
+    bb.set_value("order", Order(name="pizza", quantity=2), namespace)
+    bb.set_value("conversation_state", ConversationState(topics=["food"]), namespace)
+    bb.set_value("goal", "Confirm the delivery address.")
+    bb.set_value("goal_key", "goal", namespace)
+
+    behavior = FormatBehavior("format")
+
+    class Tree:
+        pass
+
+    behavior.conversation_tree = Tree()
+    behavior.conversation_tree.bb = bb
+    behavior.namespace = namespace
+
+    def format_from_dicts():
+        params = PartialPromptParams(bb.to_dict())
+        params.update(bb.to_dict(namespace))
+        params.update(behavior.prompt_params)
+        return params.format_with_eval(PROMPT)
+
+    assert format_from_dicts() == behavior.format_prompt(PROMPT)
+    old_time = timeit(format_from_dicts, args.repeat)
+    compiled_time = timeit(lambda: behavior.format_prompt(PROMPT), args.repeat)
+
+    def write_and_format():
+        bb.set_value("order", Order(name="pizza", quantity=3), namespace)
+        behavior.format_prompt(PROMPT)
+
+    write_time = timeit(write_and_format, args.repeat)
+    print(
+        f"{args.keys} keys: dicts {1e6 * old_time:8.1f} us, "
+        f"compiled {1e6 * compiled_time:6.1f} us, "
+        f"compiled after a write {1e6 * write_time:6.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
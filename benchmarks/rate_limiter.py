@@ -0,0 +1,56 @@
+"""Queue wait of the responses to the user behind background model calls.
+
+Starts a burst of background calls, like the state captures of many
+conversations, through a `RateLimiter` with a few slots, and then the
+responses to the user. Compares the queue wait of the responses when every
+call has the same priority with the wait when the responses go first.
+
+Usage (after `pip install -e .`):
+    python benchmarks/rate_limiter.py --background 200 --responses 10
+"""
+
+import argparse
+import asyncio
+
+from behavioral.utils import Priority, RateLimiter
+
+
+async def run(args, respond_priority: Priority) -> list:
+    limiter = RateLimiter(max_in_flight=args.max_in_flight)
+
+    async def call(priority: Priority):
+        async with limiter.limit("model", priority) as wait:
+            await asyncio.sleep(args.latency)
+        return wait
+
+    background = [
+        asyncio.create_task(call(Priority.BACKGROUND)) for _ in range(args.background)
+    ]
+    await asyncio.sleep(args.latency)
+    responses = [
+        asyncio.create_task(call(respond_priority)) for _ in range(args.responses)
+    ]
+    await asyncio.gather(*background)
+    return await asyncio.gather(*responses)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--background", type=int, default=200)
+    parser.add_argument("--responses", type=int, default=10)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    fifo = await run(args, Priority.BACKGROUND)
+    prioritized = await run(args, Priority.RESPOND)
+    print(
+        f"{args.responses} responses behind {args.background} background calls: "
+        f"same priority mean wait {1e3 * sum(fifo) / len(fifo):7.1f} ms; "
+        f"responses first mean wait "
+        f"{1e3 * sum(prioritized) / len(prioritized):7.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
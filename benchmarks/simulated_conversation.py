@@ -0,0 +1,75 @@
+"""Simulate an idle conversation with inactivity nudges on a virtual clock.
+
+Usage (after `pip install -e .`):
+    python benchmarks/simulated_conversation.py --minutes 30
+"""
+
+import argparse
+import asyncio
+import time
+
+import py_trees
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from behavioral.behaviors import ConversationMessage
+from behavioral.checks import is_user_active
+from behavioral.composites import Sequence
+from behavioral.conversation import ConversationBehaviourTree, VirtualClock
+from behavioral.guards import BehaviorGuard, Guard
+
+
+def create_tree(clock: VirtualClock, inactivity_seconds: float):
+    nudge = ConversationMessage(
+        "nudge",
+        "The user was inactive in the conversation.",
+        respond_without_user_message=True,
+        guard=BehaviorGuard(
+            guard_on_tick_enter=Guard(
+                success_check=is_user_active,
+                success_check_kwargs={"time_since_last_message": inactivity_seconds},
+            ),
+        ),
+    )
+    respond = ConversationMessage("respond", "Respond to the user.")
+    root = Sequence("root", memory=False, children=[nudge, respond])
+    tree = ConversationBehaviourTree(
+        root=root,
+        conversation_goal_prompt="",
+        chat_model=FakeListChatModel(responses=["Are you still there?"]),
+        clock=clock,
+    )
+    tree.setup()
+    return tree
+
+
+async def simulate(clock: VirtualClock, minutes: float, inactivity_seconds: float):
+    tree = create_tree(clock, inactivity_seconds)
+    tree.add_user_message("hello")
+    task = asyncio.create_task(tree.atick_tock(period_ms=None))
+    await clock.sleep(minutes * 60)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=30.0)
+    parser.add_argument("--inactivity-seconds", type=float, default=60.0)
+    args = parser.parse_args()
+    py_trees.logging.level = py_trees.logging.Level.WARN
+
+    start = time.perf_counter()
+    clock = VirtualClock()
+    tree = clock.run(simulate(clock, args.minutes, args.inactivity_seconds))
+    elapsed = time.perf_counter() - start
+    nudges = sum(message.role == "assistant" for message in tree.chat_history)
+    print(
+        f"Simulated {args.minutes} minutes in {elapsed:.3f} s "
+        f"({args.minutes * 60 / elapsed:.0f}x real time): "
+        f"{tree.ticks} ticks, {nudges} assistant messages"
+    )
+
+
+if __name__ == "__main__":
+    main()
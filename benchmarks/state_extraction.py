@@ -0,0 +1,127 @@
+"""Per turn latency of the state captures of a conversation.
+
+Runs a tree of parallel `CaptureConversationState` behaviors, like a tree
+that captures the state of several goals after every user message, against a
+fake chat model with a fixed latency per call plus a cost per captured state.
+The number of concurrent calls is limited by the `default_rate_limiter`, like
+the concurrency limit of a model provider. Compares a call per capture with
+the captures combined by a `StateExtractionBatcher`, timing each turn from the
+user message until every state is on the blackboard.
+
+Usage (after `pip install -e .`):
+    python benchmarks/state_extraction.py --captures 4 --turns 20 --max-in-flight 2
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+import py_trees
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, create_model
+
+from behavioral.behaviors import CaptureConversationState
+from behavioral.composites import Parallel
+from behavioral.conversation import ConversationBehaviourTree
+from behavioral.utils import StateExtractionBatcher, default_rate_limiter
+
+
+class LatencyChatModel(FakeListChatModel):
+    latency: float = 0.02
+    latency_per_state: float = 0.005
+    calls: int = 0
+
+    def with_structured_output(self, schema, **kwargs):
+        async def capture(messages):
+            self.calls += 1
+            fields = schema.model_fields
+            if "topics" in fields:
+                await asyncio.sleep(self.latency + self.latency_per_state)
+                return schema(topics=["booking"])
+            await asyncio.sleep(self.latency + self.latency_per_state * len(fields))
+            return schema(
+                **{
+                    name: field.annotation(topics=["booking"])
+                    for name, field in fields.items()
+                }
+            )
+
+        return RunnableLambda(lambda messages: None, afunc=capture)
+
+
+async def run(args, batcher) -> tuple:
+    chat_model = LatencyChatModel(
+        responses=["ok"],
+        latency=args.latency,
+        latency_per_state=args.latency_per_state,
+    )
+    # A state type per capture, like the states of different goals.
+    captures = [
+        CaptureConversationState(
+            f"capture_{i}",
+            capture_state_type=create_model(
+                f"State{i}", topics=(List[str], []), __base__=BaseModel
+            ),
+            state_key=f"state_{i}",
+        )
+        for i in range(args.captures)
+    ]
+    root = Parallel(
+        "captures",
+        policy=py_trees.common.ParallelPolicy.SuccessOnAll(synchronise=False),
+        children=captures,
+    )
+    tree = ConversationBehaviourTree(
+        root=root,
+        conversation_goal_prompt="",
+        chat_model=chat_model,
+        state_extractor=batcher,
+    )
+    tree.setup()
+    written = set()
+    captured = asyncio.Event()
+
+    def on_change(event):
+        written.update(event.keys)
+        if len(written) >= args.captures:
+            captured.set()
+
+    tree.bb.subscribe(on_change)
+    task = asyncio.create_task(tree.atick_tock(period_ms=None))
+    latencies = []
+    for turn in range(args.turns):
+        written.clear()
+        captured.clear()
+        start = time.perf_counter()
+        tree.add_user_message(f"I would like to book a table, turn {turn}.")
+        await captured.wait()
+        latencies.append(time.perf_counter() - start)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return sum(latencies) / len(latencies), chat_model.calls / args.turns
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--captures", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--max-in-flight", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--latency-per-state", type=float, default=0.005)
+    args = parser.parse_args()
+    py_trees.logging.level = py_trees.logging.Level.WARN
+    default_rate_limiter.max_in_flight = args.max_in_flight
+
+    separate, separate_calls = await run(args, None)
+    batched, batched_calls = await run(args, StateExtractionBatcher())
+    print(
+        f"{args.captures} captures per turn, {args.max_in_flight} calls in flight: "
+        f"a call per capture {1e3 * separate:6.1f} ms, {separate_calls:.1f} calls; "
+        f"batched {1e3 * batched:6.1f} ms, {batched_calls:.1f} calls per turn"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -11,6 +11,8 @@ from langchain.chat_models import init_chat_model
 from pydantic import BaseModel
 from tree_library import tree_creators, tree_descriptions
 
+from behavioral.conversation import TreeScheduler, aggregate_profiles
+
 load_dotenv()
 
 app = FastAPI()
@@ -46,8 +48,9 @@ class ThreadManager:
         # Set py_trees logging level
         py_trees.logging.level = py_trees.logging.Level.DEBUG
 
-        # Tasks dictionary to keep track of running tasks
-        self.tasks: Dict[str, asyncio.Task] = {}
+        # A single scheduler ticks the trees of all threads
+        self.scheduler = TreeScheduler(period_ms=30000)
+        self.scheduler_task: Optional[asyncio.Task] = None
 
     async def create_thread(
         self, tree_type: str, model_name: str = DEFAULT_MODEL
@@ -63,11 +66,12 @@ class ThreadManager:
         model = init_chat_model(model=model_name)
         tree = await tree_creators[tree_type](model)
         tree.setup()
-        tree.visitors.append(py_trees.visitors.DebugVisitor())
+        tree.enable_profiling()
 
-        # Start periodic ticking for this tree as an asyncio task
-        task = asyncio.create_task(tree.atick_tock(period_ms=30000))
-        self.tasks[thread_id] = task
+        # Start ticking this tree with the shared scheduler
+        if self.scheduler_task is None:
+            self.scheduler_task = asyncio.create_task(self.scheduler.run())
+        self.scheduler.add_tree(tree)
 
         self.threads[thread_id] = {
             "tree": tree,
@@ -128,14 +132,8 @@ class ThreadManager:
         if thread_id not in self.threads:
             return False
 
-        # Cancel the associated task if it exists
-        if thread_id in self.tasks:
-            self.tasks[thread_id].cancel()
-            try:
-                await self.tasks[thread_id]
-            except asyncio.CancelledError:
-                pass
-            del self.tasks[thread_id]
+        # Stop ticking the tree
+        self.scheduler.remove_tree(self.threads[thread_id]["tree"])
 
         # Remove the thread
         del self.threads[thread_id]
@@ -219,6 +217,41 @@ async def change_model(thread_id: str, request: ModelChange):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.get("/api/scheduler")
+async def get_scheduler_metrics():
+    """Get the metrics of the scheduler ticking all threads"""
+    return thread_manager.scheduler.metrics()
+
+
+@app.get("/api/profile")
+async def get_profile(thread_id: Optional[str] = None):
+    """Get the tick timings of a thread, or aggregated across all threads"""
+    if thread_id is None:
+        return aggregate_profiles(
+            thread["tree"].profiler for thread in thread_manager.threads.values()
+        )
+    try:
+        tree = thread_manager.get_thread(thread_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return tree.profiler.to_dict() if tree.profiler is not None else {}
+
+
+@app.get("/api/blackboard_metrics")
+async def get_blackboard_metrics(thread_id: Optional[str] = None):
+    """Get the blackboard size of a thread by namespace, or the size of every thread"""
+    if thread_id is None:
+        return {
+            tid: thread["tree"].bb.memory_usage()
+            for tid, thread in thread_manager.threads.items()
+        }
+    try:
+        tree = thread_manager.get_thread(thread_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return tree.bb.namespace_metrics()
+
+
 @app.get("/api/models")
 async def get_models():
     """Get available models"""